@@ -1,45 +1,74 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS, cross_origin
-from watermarking.generator import generate_watermark
+from watermarking.generator import generate_watermark, generate_watermarks, decode_watermark, is_keyed_watermark
+from watermarking.bloom import watermark_bloom
+from watermarking.index import WatermarkIndex
 from honeytokens.schema import generate_honeytoken
+from honeytokens.scanner import honeytoken_scanner, payload_text
+from honeytokens.recipients import RecipientTrapIndex
+from honeytokens.injector import TRAP_PATTERNS, StreamingRedactor, inject_batch, make_trap_value, redact
 from policy.metadata_format import generate_policy
+from policy.access_decision import AccessRequest, ConsentCache, check_user, DENY_REGION, DENY_RESTRICTED
 from api.auth import check_api_key
 from datetime import datetime, date, UTC
-from risk_engine import calculate_risk_score, update_risk_score, partner_scores, partner_traits, restricted_partners, deception_state, detailed_access_log, alert_log, trap_hits, trap_impact_log
+from risk_engine import RISK_WEIGHTS, activate_deception_mode, calculate_risk_score, recompute_jobs, update_risk_score, restrict_partner, restricted_users, restricted_for_user, partner_scores, partner_traits, restricted_partners, deception_state, detailed_access_log, alert_log, trap_hits, trap_impact_log
 import random
-from uuid import uuid4
-from time import sleep
-from random import randint
 from utils.synthetic import generate_synthetic_data
-import re
-import hashlib
+from utils.deception import simulate_latency
+from utils.bulk import BULK_STREAM_HEARTBEAT, group_by_partner, run_by_partner, bulk_jobs
+from utils.state import user_locks
+from utils.leak_scan import LeakReport, iter_chunks, scan_chunks, start_pool as start_leak_scan_pool
+import codecs
+import math
+import threading
+import json
+from bisect import bisect_left, bisect_right, insort
+from storage.event_store import get_event_store, normalize_ts, parse_range_cursor
+from storage.state_store import get_state_store
+from storage.summaries import activity_summaries
+from storage.export import EXPORT_COLUMNS, export_stream
+from storage.push import push_hub, with_event_id
+from storage.records import (FieldAccess, HttpAccess, Level, Notification, NotificationType, Record,
+                             Source, TrapLog, UserAccess, WatermarkGrant)
+from flask.json.provider import DefaultJSONProvider
+
+class RecordJSONProvider(DefaultJSONProvider):
+    """jsonify() support for the slotted log records"""
+    @staticmethod
+    def default(o):
+        if isinstance(o, Record):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
 
 app = Flask(__name__)
+app.json = RecordJSONProvider(app)
 CORS(app, 
      resources={r"/*": {"origins": "*"}}, 
      supports_credentials=True,
      allow_headers=["Content-Type", "X-API-Key"],
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
 
-# 1️⃣ Global log store
-access_logs = []
-user_notifications = []
+# 1️⃣ Global log store (durable, see storage/event_store.py)
+event_store = get_event_store()
+access_logs = event_store.log("access_logs")
+user_notifications = event_store.log("user_notifications")
 # --- NEW: User Access History Tracker ---
-user_access_history = []  # For tracking partner access to users
+user_access_history = event_store.log("user_access_history")  # For tracking partner access to users
 # --- END NEW ---
 # --- STEP 1: Multi-User Consent Management ---
-consent_state = {
+consent_state = get_state_store().map("consent_state")
+consent_state.seed({
     "user1": {"watermark": True, "policy": True, "honeytoken": True, "expiry_date": "2025-07-30"},
     "user2": {"watermark": True, "policy": True, "honeytoken": True, "expiry_date": "2025-07-30"},
     "user3": {"watermark": True, "policy": True, "honeytoken": False, "expiry_date": "2025-07-30"}
-}
+})
 # --- END STEP 1 ---
 # Simulated last shared policy (for partner access checks)
 last_policy = {"expiry_date": "2099-12-31", "geo_restriction": "IN"}
-alerts = []
-restriction_requests = []
+alerts = event_store.log("alerts")
+restriction_requests = event_store.log("restriction_requests")
 # --- STEP 3: Trap logs ---
-trap_logs = []
+trap_logs = event_store.log("trap_logs")
 # --- END STEP 3 ---
 # --- STEP 4: Risk scoring system ---
 # partner_scores is imported from risk_engine
@@ -47,20 +76,118 @@ trap_logs = []
 # --- STEP 5: Blocked partner-user combos ---
 blocked_partner_user = set()  # (partner_id, user_id)
 # --- END STEP 5 ---
-decode_log = []
+decode_log = event_store.log("decode_log")
+# Per-recipient trap rows, persisted so attribution survives restarts and is shared by workers
+recipient_traps = RecipientTrapIndex(event_store.log("recipient_traps"))
+# One worker pool for every /leak_scan, kept for the life of the process
+start_leak_scan_pool()
+
+# Legacy watermark hash -> grant, indexed by the event store as grants are written
+watermark_index = WatermarkIndex(access_logs)
+
+def _bloom_watermark(seq, record):
+    # Keyed watermarks decode on their own; only legacy hashes need the bloom filter
+    watermark = record.get("watermark")
+    if watermark and not is_keyed_watermark(watermark):
+        watermark_bloom.add(watermark)
+
+access_logs.subscribe(_bloom_watermark, replay=False)
+# The bloom snapshot trails the index only if it was lost or a worker died
+# between snapshots; refill it from the index then, never from the log
+if len(watermark_bloom) < len(watermark_index):
+    for watermark in watermark_index.values():
+        watermark_bloom.add(watermark)
+# Secondary indexes for per-user / per-partner queries
+user_notifications.add_index("user")
+alerts.add_index("user")
+alerts.add_index("to")
+user_access_history.add_index("user")
+user_access_history.add_index("partner")
+trap_logs.add_index("user")
+trap_logs.add_index("partner")
+# Materialized counters for the admin activity summaries, resumed from their snapshot
+activity_summaries.attach(event_store, user_access_history, trap_logs, detailed_access_log, user_notifications)
+
+# Push channels: "user:<id>" gets that user's notifications and alerts, "admin" every alert
+def _user_channels(*user_ids):
+    return [f"user:{user_id}" for user_id in dict.fromkeys(user_ids) if user_id is not None]
+
+push_hub.attach(user_notifications, "notification", lambda record: _user_channels(record.get("user")))
+push_hub.attach(alerts, "alert", lambda record: ["admin", *_user_channels(record.get("user"), record.get("to"))])
+push_hub.attach(alert_log, "risk_alert", lambda record: ["admin"])
 
 # 2️⃣ Logging function
 
 def log_access(request, endpoint, status_code):
-    log_entry = {
-        "ip": request.remote_addr,
-        "method": request.method,
-        "endpoint": endpoint,
-        "timestamp": datetime.now(UTC).isoformat(),
-        "status": status_code,
-        "user_agent": request.headers.get("User-Agent", "unknown")
+    access_logs.append(HttpAccess(
+        request.remote_addr,
+        request.method,
+        endpoint,
+        datetime.now(UTC).isoformat(),
+        status_code,
+        request.headers.get("User-Agent", "unknown")
+    ))
+
+# Pagination for log endpoints: ?since=&until=&limit=&cursor=
+DEFAULT_PAGE_LIMIT = 500
+MAX_PAGE_LIMIT = 5000
+PAGE_PARAMS = ("since", "until", "limit", "cursor")
+
+def page_args(value_cursor=False):
+    """
+    Parse pagination query args; returns None when the request is unpaginated.
+    since/until come back normalized to UTC. The cursor is a commit position,
+    the opaque string from a time-range page when since/until are given, or
+    the raw string when value_cursor is set. Raises ValueError on bad input.
+    """
+    if not any(param in request.args for param in PAGE_PARAMS):
+        return None
+    limit = int(request.args.get('limit', DEFAULT_PAGE_LIMIT))
+    since, until = request.args.get('since'), request.args.get('until')
+    if value_cursor:
+        cursor = request.args.get('cursor') or None
+    elif since or until:
+        cursor = request.args.get('cursor') or None
+        if cursor is not None:
+            parse_range_cursor(cursor)
+    else:
+        cursor = max(0, int(request.args.get('cursor', 0)))
+    return {
+        "since": normalize_ts(since) if since else None,
+        "until": normalize_ts(until) if until else None,
+        "limit": max(1, min(limit, MAX_PAGE_LIMIT)),
+        "cursor": cursor
     }
-    access_logs.append(log_entry)
+
+def log_items(log, rows):
+    """Records of (seq, record) rows, each tagged with the event_id its pushed event carries."""
+    return [with_event_id(log.name, seq, record) for seq, record in rows]
+
+def log_response(log, streamed=False):
+    """
+    One {items, next_cursor, has_more} page of a log. Without pagination args
+    it holds the newest DEFAULT_PAGE_LIMIT records; next_cursor then polls
+    for later ones, and ?cursor=0 pages from the start. For a streamed log
+    the page also carries stream_cursor, read before the page: open
+    /events/... with it as last_event_id to receive everything committed
+    since, then drop pushed events whose event_id is already listed.
+    """
+    try:
+        args = page_args()
+    except ValueError:
+        return jsonify({"error": "limit must be an integer, cursor one returned by this endpoint,"
+                                 " since and until ISO 8601 timestamps"}), 400
+    stream_cursor = push_hub.cursor() if streamed else None
+    if args is None:
+        rows, next_cursor = log.latest(DEFAULT_PAGE_LIMIT)
+        has_more = False
+    else:
+        rows, next_cursor = log.page(args["cursor"], args["since"], args["until"], args["limit"])
+        has_more = len(rows) == args["limit"]
+    body = {"items": log_items(log, rows), "next_cursor": next_cursor, "has_more": has_more}
+    if streamed:
+        body["stream_cursor"] = stream_cursor
+    return jsonify(body), 200
 
 @app.route('/health')
 def health():
@@ -88,9 +215,13 @@ def api_generate_watermark():
     # Consent check
     if not consent_state.get(user_id, {}).get("watermark", True):
         return jsonify({"error": "Consent denied for watermarking"}), 403
-    hash_value = generate_watermark(partner_id, timestamp, user_id)
+    try:
+        watermark = generate_watermark(partner_id, timestamp, user_id)
+    except ValueError as e:
+        log_access(request, "/generate_watermark", 400)
+        return jsonify({"error": f"Invalid watermark input: {e}"}), 400
     log_access(request, "/generate_watermark", 200)
-    return jsonify({"watermark": hash_value, "partner_id": partner_id, "user_id": user_id, "timestamp": timestamp})
+    return jsonify({"watermark": watermark, "partner_id": partner_id, "user_id": user_id, "timestamp": timestamp})
 
 @app.route('/generate_honeytoken', methods=['GET'])
 def api_generate_honeytoken():
@@ -133,7 +264,8 @@ def api_generate_policy():
         return jsonify({"error": "days_valid must be an integer"}), 400
     policy = generate_policy(purpose, days_valid, region)
     # Update user's expiry_date
-    consent_state[user_id]["expiry_date"] = policy["expiry_date"]
+    with user_locks(user_id):
+        consent_state.mutate(user_id, lambda consent: {**consent, "expiry_date": policy["expiry_date"]})
     log_access(request, "/generate_policy", 200)
     return jsonify(policy)
 
@@ -141,7 +273,7 @@ def api_generate_policy():
 @app.route('/access_log', methods=['GET'])
 def get_access_log():
     log_access(request, "/access_log", 200)
-    return jsonify(access_logs), 200
+    return log_response(access_logs)
 
 # 5️⃣ User notifications endpoint
 @app.route('/user_notifications', methods=['GET'])
@@ -149,9 +281,11 @@ def get_user_notifications():
     user_id = request.args.get('user_id')
     log_access(request, "/user_notifications", 200)
     if user_id:
-        filtered = [n for n in user_notifications if n['user'] == user_id]
-        return jsonify(filtered), 200
-    return jsonify(user_notifications), 200
+        # Cursor first: a notification committed during the lookup is pushed too, never lost
+        stream_cursor = push_hub.cursor()
+        rows = user_notifications.find_rows("user", user_id)
+        return jsonify({"items": log_items(user_notifications, rows), "stream_cursor": stream_cursor}), 200
+    return log_response(user_notifications)
 
 # --- STEP 1: Consent Endpoints ---
 @app.route('/get_consent/<user_id>', methods=['GET'])
@@ -166,10 +300,71 @@ def update_consent(user_id):
     data = request.get_json()
     if user_id not in consent_state:
         return jsonify({"error": "User not found"}), 404
-    consent_state[user_id].update(data)
-    return jsonify(consent_state[user_id]), 200
+    with user_locks(user_id):
+        consent = consent_state.mutate(user_id, lambda consent: {**consent, **data})
+    return jsonify(consent), 200
 # --- END STEP 1 ---
 
+# --- Shared access-decision pipeline (partner_request_data and bulk requests) ---
+consent_cache = ConsentCache(consent_state)
+# Drop a user's compiled consent whenever it changes, here or in another worker
+consent_state.subscribe(lambda user_id, old, new: consent_cache.invalidate(user_id), replay=False)
+
+def log_user_access(ctx, requested_users, ip, trap_triggered):
+    """Record one user_access_history entry per requested user"""
+    timestamp = datetime.utcnow().isoformat()
+    request_type = ctx.request_type or None
+    for user_id in requested_users:
+        user_access_history.append(UserAccess(
+            ctx.partner_id, user_id, timestamp, ip, trap_triggered, ctx.purpose, ctx.region, request_type
+        ))
+
+def access_notification(partner_id, user_id, risk_score, high_threat, timestamp, request_type=None):
+    """Threat-levelled notification for a granted access (message text is rendered on output)"""
+    if high_threat:
+        # RED notification - High threat level
+        return Notification(user_id, partner_id, NotificationType.HIGH_RISK, Level.THREAT, timestamp, risk_score, request_type)
+    if risk_score >= 50:
+        # YELLOW notification - Medium risk
+        return Notification(user_id, partner_id, NotificationType.MEDIUM_RISK, Level.WARNING, timestamp, risk_score, request_type)
+    # GREEN notification - Normal access
+    return Notification(user_id, partner_id, NotificationType.ACCESS, Level.NORMAL, timestamp, risk_score, request_type)
+
+def run_access_pipeline(ctx, requested_users):
+    """Decide, watermark and record access for each user; returns {user_id: response}"""
+    partner_id = ctx.partner_id
+    response = {}
+    grants = []  # (user_id, expiry, access_time, risk_score, high_threat)
+    for user_id in requested_users:
+        denial, expiry = check_user(ctx, user_id, consent_cache, restricted_partners.get(partner_id))
+        if denial is not None:
+            if denial is DENY_REGION:
+                update_risk_score(partner_id, "region_mismatch", user_id)
+            response[user_id] = denial
+            continue
+        update_risk_score(partner_id, "high_frequency", user_id)
+        update_risk_score(partner_id, "late_access", user_id)
+        # Final restriction check (risk updates may have blocked the partner)
+        restricted = restricted_partners.get(partner_id)
+        if restricted is not None and user_id in restricted:
+            response[user_id] = DENY_RESTRICTED
+            continue
+        risk_score = partner_scores.get(partner_id, 0)
+        high_threat = risk_score >= 80 or deception_state.get(partner_id) or restricted is not None
+        grants.append((user_id, expiry, datetime.utcnow().isoformat(), risk_score, high_threat))
+    
+    # Seal partner, user and access time into keyed watermarks, one batch per request
+    watermarks = generate_watermarks([(partner_id, access_time, user_id) for user_id, _, access_time, _, _ in grants])
+    request_type = ctx.request_type or None
+    for (user_id, expiry, access_time, risk_score, high_threat), watermark in zip(grants, watermarks):
+        # Log real data access
+        detailed_access_log.append(FieldAccess(partner_id, user_id, "all", "real_data", access_time, Source.REAL, request_type))
+        # Store in access_logs for tracing
+        access_logs.append(WatermarkGrant(partner_id, user_id, access_time, watermark))
+        user_notifications.append(access_notification(partner_id, user_id, risk_score, high_threat, access_time, request_type))
+        response[user_id] = {"status": "granted", "expiry": expiry, "watermark": watermark}
+    return response
+
 # --- STEP 2: Multi-user partner data request ---
 @app.route('/partner_request_data', methods=['POST'])
 def partner_request_data():
@@ -184,134 +379,27 @@ def partner_request_data():
     if not partner_id or not region or not requested_users:
         return jsonify({"error": "Missing partner_id, region, or requested_users"}), 400
     # --- Trap Detection: Check if partner is using honeytokens ---
-    trap_triggered = detect_trap_usage(partner_id, data)
+    trap_triggered = bool(detect_trap_usage(partner_id, data))
+    ctx = AccessRequest(partner_id, region, last_policy.get("geo_restriction", "IN"), purpose)
     response = {}
     
     # --- Log access for each requested user ---
-    for user_id in requested_users:
-        user_access_history.append({
-            "partner": partner_id,
-            "user": user_id,
-            "timestamp": datetime.utcnow().isoformat(),
-            "ip": request.remote_addr,
-            "trap_triggered": trap_triggered,
-            "purpose": purpose,
-            "region": region
-        })
+    log_user_access(ctx, requested_users, request.remote_addr, trap_triggered)
     
     # --- Deception Mode: Return synthetic data if active ---
     if deception_state.get(partner_id):
+        # Simulate delay once per request (bounded, see utils.deception)
+        simulate_latency(partner_id, len(requested_users))
         for user_id in requested_users:
-            # Simulate delay
-            sleep(randint(1, 2))
-            fake = generate_synthetic_data(partner_id)
+            fake = generate_synthetic_data(partner_id, user_id)
+            timestamp = datetime.utcnow().isoformat()
             for field, value in fake.items():
-                detailed_access_log.append({
-                    "partner": partner_id,
-                    "user": user_id,
-                    "field": field,
-                    "value": value,
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "source": "synthetic"
-                })
+                detailed_access_log.append(FieldAccess(partner_id, user_id, field, value, timestamp, Source.SYNTHETIC))
             response[user_id] = {**fake, "source": "synthetic"}
         log_access(request, "/partner_request_data", 200)
         return jsonify(response), 200
-    # --- Normal logic below ---
-    for user_id in requested_users:
-        if partner_id in restricted_partners and user_id in restricted_partners[partner_id]:
-            response[user_id] = {"status": "denied", "reason": "Access permanently revoked due to misuse"}
-            continue
-        consent = consent_state.get(user_id)
-        if not consent:
-            response[user_id] = {"status": "denied", "reason": "User not found"}
-            continue
-        if not consent.get("policy", True):
-            response[user_id] = {"status": "denied", "reason": "Consent revoked for policy"}
-            continue
-        if not consent.get("watermark", True):
-            response[user_id] = {"status": "denied", "reason": "Consent revoked for watermark"}
-            continue
-        if not consent.get("honeytoken", True):
-            response[user_id] = {"status": "denied", "reason": "Consent revoked for honeytoken"}
-            continue
-        expiry = consent.get("expiry_date", "2099-12-31")
-        if date.today().isoformat() > expiry:
-            response[user_id] = {"status": "denied", "reason": "Policy expired"}
-            continue
-        if region != last_policy.get("geo_restriction", "IN"):
-            update_risk_score(partner_id, "region_mismatch", user_id)
-            response[user_id] = {"status": "denied", "reason": "Region mismatch"}
-            continue
-        update_risk_score(partner_id, "high_frequency", user_id)
-        update_risk_score(partner_id, "late_access", user_id)
-        if partner_id in restricted_partners and user_id in restricted_partners[partner_id]:
-            response[user_id] = {"status": "denied", "reason": "Access permanently revoked due to misuse"}
-            continue
-        # Log real data access
-        detailed_access_log.append({
-            "partner": partner_id,
-            "user": user_id,
-            "field": "all",
-            "value": "real_data",
-            "timestamp": datetime.utcnow().isoformat(),
-            "source": "real"
-        })
-        response[user_id] = {"status": "granted", "expiry": expiry}
-        if response[user_id]["status"] == "granted":
-            risk_score = partner_scores.get(partner_id, 0)
-            # Generate a timestamp for this access
-            access_time = datetime.utcnow().isoformat()
-            # Generate watermark as SHA-256 of 'partner|timestamp|user'
-            raw = f"{partner_id}|{access_time}|{user_id}"
-            watermark = hashlib.sha256(raw.encode()).hexdigest()
-            response[user_id]["watermark"] = watermark
-            # Store in access_logs for tracing
-            access_logs.append({
-                "partner": partner_id,
-                "user": user_id,
-                "timestamp": access_time,
-                "watermark": watermark
-            })
-            # Enhanced notification system with threat levels
-            if risk_score >= 80 or deception_state.get(partner_id) or partner_id in restricted_partners:
-                # RED notification - High threat level
-                user_notifications.append({
-                    "user": user_id,
-                    "partner": partner_id,
-                    "type": "high_risk",
-                    "level": "threat",  # Red notification
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "message": f"🚨 THREAT ALERT: Partner {partner_id} accessed your data! Risk score: {risk_score}",
-                    "risk": risk_score,
-                    "can_escalate": True,  # User can request admin action
-                    "escalation_reason": f"High risk partner ({risk_score}) accessing data"
-                })
-            elif risk_score >= 50:
-                # YELLOW notification - Medium risk
-                user_notifications.append({
-                    "user": user_id,
-                    "partner": partner_id,
-                    "type": "medium_risk",
-                    "level": "warning",  # Yellow notification
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "message": f"⚠️ WARNING: Partner {partner_id} accessed your data. Risk score: {risk_score}",
-                    "risk": risk_score,
-                    "can_escalate": True,
-                    "escalation_reason": f"Medium risk partner ({risk_score}) accessing data"
-                })
-            else:
-                # GREEN notification - Normal access
-                user_notifications.append({
-                    "user": user_id,
-                    "partner": partner_id,
-                    "type": "access",
-                    "level": "normal",  # Green notification
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "message": f"✅ Normal access: Partner {partner_id} accessed your data.",
-                    "risk": risk_score,
-                    "can_escalate": False
-                })
+    # --- Normal logic: shared access-decision pipeline ---
+    response = run_access_pipeline(ctx, requested_users)
     log_access(request, "/partner_request_data", 200)
     return jsonify(response), 200
 # --- END STEP 2 ---
@@ -327,26 +415,11 @@ def simulate_trap_hit():
     trap_hit = random.random() < 0.3
     if trap_hit:
         score = update_risk_score(partner_id, "trap", user_id)
-        trap_logs.append({
-            "partner": partner_id,
-            "user": user_id,
-            "timestamp": datetime.utcnow().isoformat(),
-            "ip": request.remote_addr,
-            "trigger": "honeytoken",
-            "risk_score": score
-        })
-        # Notify the user
-        user_notifications.append({
-            "user": user_id,
-            "partner": partner_id,
-            "type": "trap_hit",
-            "level": "threat",  # Red notification for trap hits
-            "timestamp": datetime.utcnow().isoformat(),
-            "message": f"🚨 TRAP ALERT: Partner {partner_id} triggered a security trap on your data! Risk score: {score}",
-            "risk": score,
-            "can_escalate": True,  # User can request admin action
-            "escalation_reason": f"Trap triggered by partner {partner_id}"
-        })
+        trap_logs.append(TrapLog(partner_id, user_id, datetime.utcnow().isoformat(), request.remote_addr, "honeytoken", score))
+        # Notify the user (red notification for trap hits)
+        user_notifications.append(Notification(
+            user_id, partner_id, NotificationType.TRAP_HIT, Level.THREAT, datetime.utcnow().isoformat(), score
+        ))
         return jsonify({"trap_hit": True, "risk_score": score})
     else:
         score = update_risk_score(partner_id, "high_frequency", user_id)
@@ -364,9 +437,29 @@ def get_risk_score(partner_id):
 @app.route('/alerts/<user_id>', methods=['GET'])
 def get_alerts(user_id):
     if user_id == "admin":
-        return jsonify(alerts), 200
-    user_alerts = [a for a in alerts if a.get("user") == user_id or a.get("to") == user_id]
-    return jsonify(user_alerts), 200
+        return log_response(alerts, streamed=True)
+    stream_cursor = push_hub.cursor()
+    rows = dict(alerts.find_rows("user", user_id))
+    rows.update(alerts.find_rows("to", user_id))
+    items = log_items(alerts, sorted(rows.items()))
+    return jsonify({"items": items, "stream_cursor": stream_cursor}), 200
+
+def event_stream(channel):
+    """SSE response for one push channel; resumes from Last-Event-ID (or ?last_event_id=)"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    body = push_hub.stream(channel, last_event_id)
+    if body is None:
+        # Every stream slot in this process is taken; the client retries later
+        return jsonify({"error": "Too many open event streams, retry later"}), 503, {"Retry-After": "5"}
+    return Response(body, mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/events/<user_id>', methods=['GET'])
+def stream_user_events(user_id):
+    """Push a user's new notifications and alerts as they are appended (replaces polling)"""
+    if user_id == "admin":
+        return event_stream("admin")
+    return event_stream(f"user:{user_id}")
 
 @app.route('/request_restriction', methods=['POST'])
 def request_restriction():
@@ -386,7 +479,7 @@ def request_restriction():
 
 @app.route('/pending_restrictions', methods=['GET'])
 def pending_restrictions():
-    return jsonify(restriction_requests), 200
+    return log_response(restriction_requests)
 
 @app.route('/restrict_access', methods=['POST'])
 def restrict_access():
@@ -398,9 +491,7 @@ def restrict_access():
         return jsonify({"error": "Missing partner_id or user_id"}), 400
     if action == 'block':
         # Add to restricted_partners
-        if partner_id not in restricted_partners:
-            restricted_partners[partner_id] = set()
-        restricted_partners[partner_id].add(user_id)
+        restrict_partner(partner_id, user_id)
         blocked_partner_user.add((partner_id, user_id))
         alerts.append({
             "user": user_id,
@@ -410,7 +501,8 @@ def restrict_access():
         })
     elif action == 'expire':
         if user_id in consent_state:
-            consent_state[user_id]["expiry_date"] = date.today().isoformat()
+            with user_locks(user_id):
+                consent_state.mutate(user_id, lambda consent: {**consent, "expiry_date": date.today().isoformat()})
     alerts.append({
                 "user": user_id,
         "partner": partner_id,
@@ -427,14 +519,61 @@ def get_risk_score_traits(partner_id):
     traits = list(partner_traits.get(partner_id, []))
     return jsonify({"partner_id": partner_id, "score": score, "traits": traits}), 200
 
+def _reason_numbers(value, positive=False):
+    """True when value maps known risk reasons to finite numbers (above zero when positive is set)"""
+    return isinstance(value, dict) and all(
+        reason in RISK_WEIGHTS and not isinstance(number, bool) and isinstance(number, (int, float))
+        and math.isfinite(number) and (number > 0 or not positive)
+        for reason, number in value.items())
+
+@app.route('/admin/risk/recompute', methods=['POST'])
+def recompute_risk():
+    """
+    What-if scoring: queue a replay of every risk event under other weights
+    or half-lives, without touching live state. Returns the job immediately;
+    poll /admin/risk/recompute/<job_id> for the scores.
+    """
+    if not check_api_key(request):
+        return jsonify({"error": "Unauthorized"}), 401
+    data = request.get_json(silent=True) or {}
+    weights = data.get('weights', {})
+    half_lives = data.get('half_lives', {})
+    if not _reason_numbers(weights):
+        return jsonify({"error": f"weights must map {sorted(RISK_WEIGHTS)} to finite numbers"}), 400
+    if not _reason_numbers(half_lives, positive=True):
+        return jsonify({"error": f"half_lives must map {sorted(RISK_WEIGHTS)} to positive numbers of seconds"}), 400
+    job = recompute_jobs.submit(weights, half_lives)
+    return jsonify(job.progress()), 202
+
+@app.route('/admin/risk/recompute/<job_id>', methods=['GET'])
+def get_recompute_job(job_id):
+    """Job progress and, once done, a page of recomputed partner scores: ?cursor=&limit="""
+    if not check_api_key(request):
+        return jsonify({"error": "Unauthorized"}), 401
+    job = recompute_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    try:
+        cursor = max(0, int(request.args.get('cursor', 0)))
+        limit = max(1, min(int(request.args.get('limit', DEFAULT_PAGE_LIMIT)), MAX_PAGE_LIMIT))
+    except ValueError:
+        return jsonify({"error": "limit and cursor must be integers"}), 400
+    partners, next_cursor = job.results_page(cursor, limit)
+    return jsonify({
+        **job.progress(),
+        "partners": partners,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor < len(job.results)
+    }), 200
+
 @app.route('/trap_logs', methods=['GET'])
 def get_trap_logs():
-    return jsonify(trap_logs), 200
+    return log_response(trap_logs)
 
 @app.route('/restricted_partners', methods=['GET'])
 def get_restricted_partners():
     # Return as {partner_id: [user_id, ...]}
-    return jsonify({k: list(v) for k, v in restricted_partners.items()}), 200
+    return jsonify({partner_id: restricted_users(partner_id) for partner_id in list(restricted_partners)}), 200
 
 @app.route('/partner_traits/<partner_id>', methods=['GET'])
 def get_partner_traits(partner_id):
@@ -444,15 +583,50 @@ def get_partner_traits(partner_id):
 # --- Admin endpoints for deception/field logs and alerts ---
 @app.route('/deception_logs', methods=['GET'])
 def get_deception_logs():
-    return jsonify(detailed_access_log), 200
+    return log_response(detailed_access_log)
 
 @app.route('/alert_logs', methods=['GET'])
 def get_alert_logs():
-    return jsonify(alert_log), 200
+    return log_response(alert_log)
 
 @app.route('/trap_impact_logs', methods=['GET'])
 def get_trap_impact_logs():
-    return jsonify(trap_impact_log), 200
+    return log_response(trap_impact_log)
+
+# --- Streaming forensic export (NDJSON / CSV, optional gzip) ---
+EXPORTABLE_LOGS = {
+    "detailed_access_log": detailed_access_log,
+    "trap_impact_log": trap_impact_log,
+    "alert_log": alert_log,
+    "access_log": access_logs,
+    "trap_logs": trap_logs,
+    "decode_log": decode_log,
+}
+
+@app.route('/export/<log_name>', methods=['GET'])
+def export_log(log_name):
+    if not check_api_key(request):
+        log_access(request, "/export", 401)
+        return jsonify({"error": "Unauthorized"}), 401
+    log = EXPORTABLE_LOGS.get(log_name)
+    if log is None:
+        return jsonify({"error": "Unknown log", "available": list(EXPORTABLE_LOGS)}), 404
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    try:
+        since, until = (normalize_ts(request.args[param]) if request.args.get(param) else None
+                        for param in ('since', 'until'))
+    except ValueError:
+        return jsonify({"error": "since and until must be ISO 8601 timestamps"}), 400
+    body = export_stream(log, fmt, compress, since, until, EXPORT_COLUMNS.get(log_name))
+    filename = f"{log_name}.{'csv' if fmt == 'csv' else 'ndjson'}"
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    log_access(request, "/export", 200)
+    return Response(body, mimetype="text/csv" if fmt == 'csv' else "application/x-ndjson", headers=headers)
 
 # --- NEW: User Access History Tracker Endpoint ---
 @app.route('/user_access_history/<user_id>', methods=['GET'])
@@ -462,29 +636,66 @@ def get_user_access_history(user_id):
         return jsonify({"error": "Unauthorized"}), 401
     
     # Filter logs for the specific user
-    user_logs = [log for log in user_access_history if log["user"] == user_id]
+    user_logs = user_access_history.find("user", user_id)
     log_access(request, "/user_access_history", 200)
     return jsonify(user_logs), 200
 # --- END NEW ---
 
 # --- Document Trap Injection ---
-known_honeytokens = {}  # trap_value: {type, created_at, partner_id}
+known_honeytokens = get_state_store().map("known_honeytokens")  # trap_value: {type, created_at, partner_id}
+honeytoken_order = []  # (normalized created_at, trap_value), sorted, for paging known_honeytokens
+honeytoken_lock = threading.RLock()
+
+def _track_honeytoken(trap_value, old, new):
+    # New traps, from this process or another worker, become detectable and pageable
+    if old is not None or new is None:
+        return
+    with honeytoken_lock:
+        insort(honeytoken_order, (normalize_ts(new["created_at"]), trap_value))
+        honeytoken_scanner.add(trap_value)
+
+known_honeytokens.subscribe(_track_honeytoken)
+
+def register_honeytoken(trap_value, trap_type):
+    """Store a new trap for future detection"""
+    register_honeytokens([(trap_value, trap_type)])
+
+def register_honeytokens(traps):
+    """Store many (trap_value, trap_type) pairs as one update: all share created_at and become visible together"""
+    with honeytoken_lock:
+        created_at = datetime.utcnow().isoformat()
+        entries = {
+            trap_value: {
+                "type": trap_type,
+                "created_at": created_at,
+                "partner_id": None  # Will be set when trap is hit
+            }
+            for trap_value, trap_type in traps
+        }
+        known_honeytokens.update(entries)
 
 def detect_trap_usage(partner_id, data):
-    """Detect if partner is using any known honeytokens"""
-    if isinstance(data, str):
-        for trap_value in known_honeytokens:
-            if trap_value in data:
-                # Mark trap as used by this partner
-                known_honeytokens[trap_value]["partner_id"] = partner_id
-                # Trigger trap hit
-                update_risk_score(partner_id, "trap", None)
-                return True
-    elif isinstance(data, dict):
-        for value in data.values():
-            if detect_trap_usage(partner_id, str(value)):
-                return True
-    return False
+    """Detect every known honeytoken in a partner payload; returns the trap values hit"""
+    # Pulls in traps registered by other workers before scanning
+    known_honeytokens.store.refresh()
+    text = payload_text(data)
+    hits = sorted(honeytoken_scanner.scan(text)) if len(honeytoken_scanner) else []
+    for trap_value in hits:
+        # Mark trap as used by this partner
+        known_honeytokens.mutate(trap_value, lambda trap: {**trap, "partner_id": partner_id})
+        # Trigger trap hit
+        update_risk_score(partner_id, "trap", None)
+    # Per-recipient traps keep their original recipient; the hit is charged to it
+    # Always checked: traps minted by other workers or before a restart are not counted locally
+    recipient_hits = recipient_traps.find(text)
+    for trap_value, record in recipient_hits.items():
+        update_risk_score(record["partner"], "trap", None)
+    return hits + sorted(recipient_hits)
+
+def valid_trap_types(trap_types):
+    """A non-empty list of known trap type names (JSON may hold lists or objects here)"""
+    return (isinstance(trap_types, list) and bool(trap_types)
+            and all(isinstance(t, str) and t in TRAP_PATTERNS for t in trap_types))
 
 @app.route('/trap_inject', methods=['POST'])
 def trap_inject():
@@ -494,42 +705,140 @@ def trap_inject():
     data = request.get_json()
     document = data.get('document')
     trap_type = data.get('trap_type', 'email')
-    if not document:
+    recipients = data.get('recipients')
+    if not document or not isinstance(document, str):
         return jsonify({"error": "Missing document"}), 400
     # Generate trap value based on type
-    if trap_type == 'email':
-        trap_value = f"trap_{uuid4().hex[:8]}@honeytoken.org"
-        pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    elif trap_type == 'phone':
-        trap_value = f"+1-555-{uuid4().hex[:3]}-{uuid4().hex[:4]}"
-        pattern = r'\+?[\d\s\-\(\)]{10,}'
-    elif trap_type == 'name':
-        trap_value = f"John {uuid4().hex[:6]}"
-        pattern = r'\b[A-Z][a-z]+ [A-Z][a-z]+\b'
-    elif trap_type == 'id':
-        trap_value = f"ID{uuid4().hex[:8].upper()}"
-        pattern = r'\b\d{5,}\b'
-    else:
+    if not valid_trap_types([trap_type]):
         return jsonify({"error": "Invalid trap type"}), 400
-    # Replace sensitive values with trap
-    redacted_document = re.sub(pattern, trap_value, document)
+    if recipients is not None:
+        # Per-recipient mode: one copy per partner, a distinct trap value per replaced field
+        if not isinstance(recipients, list) or not recipients or not all(isinstance(r, str) and r for r in recipients):
+            return jsonify({"error": "recipients must be a list of partner ids"}), 400
+        copies = {}
+        for partner_id in dict.fromkeys(recipients):
+            redacted_document, trap_values = recipient_traps.inject(document, partner_id, [trap_type])
+            copies[partner_id] = {"redacted_document": redacted_document, "trap_values": trap_values}
+        log_access(request, "/trap_inject", 200)
+        return jsonify({"copies": copies, "trap_type": trap_type}), 200
+    trap_value = make_trap_value(trap_type)
+    # Replace sensitive values with trap (patterns are precompiled)
+    redacted_document = redact(document, {trap_type: trap_value})
     # Store trap for future detection
-    known_honeytokens[trap_value] = {
-        "type": trap_type,
-        "created_at": datetime.utcnow().isoformat(),
-        "partner_id": None  # Will be set when trap is hit
-    }
+    register_honeytoken(trap_value, trap_type)
     log_access(request, "/trap_inject", 200)
     return jsonify({
         "redacted_document": redacted_document,
         "trap_value": trap_value,
         "trap_type": trap_type
     }), 200
+
+# Upper bound on documents in one /trap_inject/batch request
+MAX_TRAP_BATCH = 10000
+
+@app.route('/trap_inject/batch', methods=['POST'])
+def trap_inject_batch():
+    """
+    Inject traps into many documents at once. Redaction is spread over a
+    process pool; every document gets its own trap values, and all of them
+    are registered in known_honeytokens in a single update.
+    """
+    if not check_api_key(request):
+        log_access(request, "/trap_inject/batch", 401)
+        return jsonify({"error": "Unauthorized"}), 401
+    data = request.get_json() or {}
+    documents = data.get('documents')
+    trap_types = data.get('trap_types') or [data.get('trap_type', 'email')]
+    if not isinstance(documents, list) or not documents:
+        return jsonify({"error": "Missing documents"}), 400
+    if len(documents) > MAX_TRAP_BATCH:
+        return jsonify({"error": f"At most {MAX_TRAP_BATCH} documents per batch"}), 400
+    if not all(isinstance(document, str) for document in documents):
+        return jsonify({"error": "Documents must be strings"}), 400
+    if not valid_trap_types(trap_types):
+        return jsonify({"error": "Invalid trap type"}), 400
+    injected = inject_batch(documents, trap_types)
+    register_honeytokens([
+        (trap_value, trap_type)
+        for _, trap_values in injected
+        for trap_type, trap_value in trap_values.items()
+    ])
+    log_access(request, "/trap_inject/batch", 200)
+    return jsonify({
+        "results": [
+            {"redacted_document": redacted_document, "trap_values": trap_values}
+            for redacted_document, trap_values in injected
+        ]
+    }), 200
+
+# Raw uploads are read and redacted in chunks of this many bytes
+TRAP_STREAM_CHUNK = 64 * 1024
+
+@app.route('/trap_inject/stream', methods=['POST'])
+def trap_inject_stream():
+    """
+    Streaming trap injection for large documents.
+    Body is the raw document; ?trap_types=email,phone picks the types
+    (one pass for all). The redacted document streams back and the trap
+    values are returned in the X-Trap-Values header.
+    """
+    if not check_api_key(request):
+        log_access(request, "/trap_inject/stream", 401)
+        return jsonify({"error": "Unauthorized"}), 401
+    trap_types = [t for t in request.args.get('trap_types', request.args.get('trap_type', 'email')).split(',') if t]
+    if not valid_trap_types(trap_types):
+        return jsonify({"error": "Invalid trap type"}), 400
+    trap_values = {trap_type: make_trap_value(trap_type) for trap_type in dict.fromkeys(trap_types)}
+    register_honeytokens([(trap_value, trap_type) for trap_type, trap_value in trap_values.items()])
+    stream = request.stream
+
+    def generate():
+        redactor = StreamingRedactor(trap_values)
+        # surrogateescape keeps non-UTF-8 bytes intact through the round trip
+        decoder = codecs.getincrementaldecoder("utf-8")("surrogateescape")
+        while True:
+            chunk = stream.read(TRAP_STREAM_CHUNK)
+            if not chunk:
+                break
+            out = redactor.feed(decoder.decode(chunk))
+            if out:
+                yield out.encode("utf-8", "surrogateescape")
+        out = redactor.feed(decoder.decode(b"", final=True)) + redactor.close()
+        if out:
+            yield out.encode("utf-8", "surrogateescape")
+
+    log_access(request, "/trap_inject/stream", 200)
+    return Response(stream_with_context(generate()), mimetype=request.mimetype or "text/plain",
+                    headers={"X-Trap-Values": json.dumps(trap_values)})
 # --- END Document Trap Injection ---
 
 @app.route('/known_honeytokens', methods=['GET'])
 def get_known_honeytokens():
-    return jsonify(known_honeytokens), 200
+    try:
+        args = page_args(value_cursor=True)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer, since and until ISO 8601 timestamps"}), 400
+    if args is None:
+        return jsonify(known_honeytokens.snapshot()), 200
+    known_honeytokens.store.refresh()
+    # The cursor is the last (created_at, trap_value) returned, so traps
+    # registered between pages never shift the next page
+    after = ("",)
+    if args["cursor"]:
+        created_at, _, trap_value = args["cursor"].partition("|")
+        after = (created_at, trap_value)
+    if args["since"]:
+        after = max(after, (args["since"],))
+    with honeytoken_lock:
+        start = bisect_right(honeytoken_order, after)
+        end = bisect_left(honeytoken_order, (args["until"],)) if args["until"] else len(honeytoken_order)
+        page = honeytoken_order[start:min(end, start + args["limit"])]
+    next_cursor = "|".join(page[-1]) if page else args["cursor"]
+    return jsonify({
+        "items": {trap_value: known_honeytokens.get(trap_value) for _, trap_value in page},
+        "next_cursor": next_cursor,
+        "has_more": start + len(page) < end
+    }), 200
 
 @app.route('/test_trap_value', methods=['POST'])
 def test_trap_value():
@@ -540,9 +849,13 @@ def test_trap_value():
     value = data.get('value')
     if not partner_id or not value:
         return jsonify({"error": "Missing partner_id or value"}), 400
-    hit = detect_trap_usage(partner_id, value)
-    if hit:
-        return jsonify({"result": f"Trap hit detected for {partner_id}!"}), 200
+    hits = detect_trap_usage(partner_id, value)
+    if hits:
+        response = {"result": f"Trap hit detected for {partner_id}!", "traps": hits}
+        recipients = {trap_value: recipient_traps.lookup(trap_value) for trap_value in hits if trap_value not in known_honeytokens}
+        if recipients:
+            response["recipients"] = recipients
+        return jsonify(response), 200
     else:
         return jsonify({"result": "No trap detected."}), 200
 
@@ -570,7 +883,7 @@ def request_admin_action():
         "status": "pending"  # pending, reviewed, actioned
     }
     
-    alerts.append(escalation_alert)
+    alert_seq = alerts.append(escalation_alert)
     
     # Also add to restriction requests for admin review
     restriction_requests.append({
@@ -583,29 +896,25 @@ def request_admin_action():
     
     return jsonify({
         "status": "Escalation sent to admin",
-        "alert_id": len(alerts) - 1,
+        "alert_id": alert_seq - 1,
         "message": f"Your request for admin action on {partner_id} has been sent and is under review."
     }), 200
 
 @app.route('/activate_deception/<partner_id>', methods=['POST'])
 def activate_deception(partner_id):
-    from risk_engine import deception_state
-    deception_state[partner_id] = True
+    activate_deception_mode(partner_id)
     return jsonify({"status": "deception mode activated for partner", "partner_id": partner_id}), 200
 
 @app.route('/user_trap_logs/<user_id>', methods=['GET'])
 def get_user_trap_logs(user_id):
     log_access(request, "/user_trap_logs", 200)
-    user_traps = [t for t in trap_logs if t.get('user') == user_id]
+    user_traps = trap_logs.find("user", user_id)
     return jsonify(user_traps), 200
 
 @app.route('/user_restricted_partners/<user_id>', methods=['GET'])
 def get_user_restricted_partners(user_id):
     log_access(request, "/user_restricted_partners", 200)
-    # Handle case where restricted_partners might be empty or not a dict
-    if not restricted_partners or not isinstance(restricted_partners, dict):
-        return jsonify([]), 200
-    restricted = [p for p, users in restricted_partners.items() if user_id in users]
+    restricted = restricted_for_user(user_id)
     return jsonify(restricted), 200
 
 # --- Enhanced Admin Endpoints for Better Monitoring ---
@@ -635,8 +944,8 @@ def get_admin_restricted_partners_detailed():
         return jsonify({"error": "Unauthorized"}), 401
     
     detailed_restrictions = []
-    for partner_id, users in restricted_partners.items():
-        for user_id in users:
+    for partner_id in list(restricted_partners):
+        for user_id in restricted_users(partner_id):
             detailed_restrictions.append({
                 "partner_id": partner_id,
                 "user_id": user_id,
@@ -655,34 +964,21 @@ def get_admin_partner_activity_summary():
         return jsonify({"error": "Unauthorized"}), 401
     
     partner_summary = {}
+    activity_summaries.refresh()
     
-    # Get all unique partners from various logs
-    all_partners = set()
-    for log in user_access_history:
-        all_partners.add(log.get('partner'))
-    for trap in trap_logs:
-        all_partners.add(trap.get('partner'))
-    for log in detailed_access_log:
-        all_partners.add(log.get('partner'))
-    
-    for partner_id in all_partners:
-        if partner_id:
-            # Count access attempts
-            access_count = len([log for log in user_access_history if log.get('partner') == partner_id])
-            # Count trap hits
-            trap_count = len([trap for trap in trap_logs if trap.get('partner') == partner_id])
-            # Count restricted users
-            restricted_users = list(restricted_partners.get(partner_id, []))
-            
-            partner_summary[partner_id] = {
-                "risk_score": partner_scores.get(partner_id, 0),
-                "traits": list(partner_traits.get(partner_id, [])),
-                "access_attempts": access_count,
-                "trap_hits": trap_count,
-                "restricted_users": restricted_users,
-                "is_restricted": partner_id in restricted_partners,
-                "deception_active": deception_state.get(partner_id, False)
-            }
+    for partner_id, activity in list(activity_summaries.partners.items()):
+        # Count restricted users
+        blocked_users = restricted_users(partner_id)
+        
+        partner_summary[partner_id] = {
+            "risk_score": partner_scores.get(partner_id, 0),
+            "traits": list(partner_traits.get(partner_id, [])),
+            "access_attempts": activity.access_attempts,
+            "trap_hits": activity.trap_hits,
+            "restricted_users": blocked_users,
+            "is_restricted": partner_id in restricted_partners,
+            "deception_active": deception_state.get(partner_id, False)
+        }
     
     return jsonify(partner_summary), 200
 
@@ -693,34 +989,40 @@ def get_admin_user_activity_summary():
         return jsonify({"error": "Unauthorized"}), 401
     
     user_summary = {}
+    activity_summaries.refresh()
     
     for user_id in consent_state.keys():
-        # Count notifications
-        notification_count = len([n for n in user_notifications if n.get('user') == user_id])
-        # Count threat notifications
-        threat_count = len([n for n in user_notifications if n.get('user') == user_id and n.get('level') == 'threat'])
-        # Count access history
-        access_count = len([log for log in user_access_history if log.get('user') == user_id])
+        activity = activity_summaries.user(user_id)
         # Get restricted partners for this user
-        user_restricted = [p for p, users in restricted_partners.items() if user_id in users]
+        user_restricted = restricted_for_user(user_id)
         
         user_summary[user_id] = {
             "consent_state": consent_state.get(user_id, {}),
-            "total_notifications": notification_count,
-            "threat_notifications": threat_count,
-            "access_attempts": access_count,
+            "total_notifications": activity.total_notifications,
+            "threat_notifications": activity.threat_notifications,
+            "access_attempts": activity.access_attempts,
             "restricted_partners": user_restricted,
-            "last_access": None
+            "last_access": activity.last_access
         }
-        
-        # Get last access time
-        user_accesses = [log for log in user_access_history if log.get('user') == user_id]
-        if user_accesses:
-            user_summary[user_id]["last_access"] = max(user_accesses, key=lambda x: x.get('timestamp', '')).get('timestamp')
     
     return jsonify(user_summary), 200
 
 # --- Bulk Partner Data Request for Multiple Partners/Users ---
+def process_bulk_partner(partner_id, entries, ip, today):
+    """Run one partner's bulk entries in order; returns the response for its last entry"""
+    partner_response = {}
+    allowed_region = last_policy.get("geo_restriction", "IN")
+    for req in entries:
+        ctx = AccessRequest(partner_id, req.get('region', 'IN'), allowed_region,
+                            req.get('purpose', 'bulk_request'), "bulk", today)
+        # Check for trap usage
+        trap_triggered = bool(detect_trap_usage(partner_id, req))
+        requested_users = req.get('users', [])
+        # Log access for each requested user
+        log_user_access(ctx, requested_users, ip, trap_triggered)
+        partner_response = run_access_pipeline(ctx, requested_users)
+    return partner_response
+
 @app.route('/bulk_partner_request', methods=['POST'])
 def bulk_partner_request():
     """Handle multiple partners requesting data from multiple users efficiently"""
@@ -734,180 +1036,198 @@ def bulk_partner_request():
     if not requests_list:
         return jsonify({"error": "No requests provided"}), 400
     
-    bulk_response = {}
-    
-    for req in requests_list:
-        partner_id = req.get('partner_id')
-        requested_users = req.get('users', [])
-        region = req.get('region', 'IN')
-        purpose = req.get('purpose', 'bulk_request')
-        
-        if not partner_id or not requested_users:
-            continue
-            
-        # Process each partner's request
-        partner_response = {}
-        
-        # Check for trap usage
-        trap_triggered = detect_trap_usage(partner_id, req)
-        
-        # Log access for each requested user
-        for user_id in requested_users:
-            user_access_history.append({
-                "partner": partner_id,
-                "user": user_id,
-                "timestamp": datetime.utcnow().isoformat(),
-                "ip": request.remote_addr,
-                "trap_triggered": trap_triggered,
-                "purpose": purpose,
-                "region": region,
-                "request_type": "bulk"
-            })
-        
-        # Process each user for this partner
-        for user_id in requested_users:
-            # Check restrictions
-            if partner_id in restricted_partners and user_id in restricted_partners[partner_id]:
-                partner_response[user_id] = {"status": "denied", "reason": "Access permanently revoked due to misuse"}
-                continue
-                
-            # Check consent
-            consent = consent_state.get(user_id)
-            if not consent:
-                partner_response[user_id] = {"status": "denied", "reason": "User not found"}
-                continue
-            if not consent.get("policy", True):
-                partner_response[user_id] = {"status": "denied", "reason": "Consent revoked for policy"}
-                continue
-            if not consent.get("watermark", True):
-                partner_response[user_id] = {"status": "denied", "reason": "Consent revoked for watermark"}
-                continue
-            if not consent.get("honeytoken", True):
-                partner_response[user_id] = {"status": "denied", "reason": "Consent revoked for honeytoken"}
-                continue
-                
-            # Check expiry
-            expiry = consent.get("expiry_date", "2099-12-31")
-            if date.today().isoformat() > expiry:
-                partner_response[user_id] = {"status": "denied", "reason": "Policy expired"}
-                continue
-                
-            # Check region
-            if region != last_policy.get("geo_restriction", "IN"):
-                update_risk_score(partner_id, "region_mismatch", user_id)
-                partner_response[user_id] = {"status": "denied", "reason": "Region mismatch"}
-                continue
-                
-            # Update risk scores
-            update_risk_score(partner_id, "high_frequency", user_id)
-            update_risk_score(partner_id, "late_access", user_id)
-            
-            # Final restriction check
-            if partner_id in restricted_partners and user_id in restricted_partners[partner_id]:
-                partner_response[user_id] = {"status": "denied", "reason": "Access permanently revoked due to misuse"}
-                continue
-                
-            # Grant access and create notifications
-            detailed_access_log.append({
-                "partner": partner_id,
-                "user": user_id,
-                "field": "all",
-                "value": "real_data",
-                "timestamp": datetime.utcnow().isoformat(),
-                "source": "real",
-                "request_type": "bulk"
-            })
-            
-            partner_response[user_id] = {"status": "granted", "expiry": expiry}
-            # Generate a timestamp for this access
-            access_time = datetime.utcnow().isoformat()
-            # Generate watermark as SHA-256 of 'partner|timestamp|user'
-            raw = f"{partner_id}|{access_time}|{user_id}"
-            watermark = hashlib.sha256(raw.encode()).hexdigest()
-            partner_response[user_id]["watermark"] = watermark
-            # Store in access_logs for tracing
-            access_logs.append({
-                "partner": partner_id,
-                "user": user_id,
-                "timestamp": access_time,
-                "watermark": watermark
-            })
-            
-            # Create notifications with threat levels
-            if partner_response[user_id]["status"] == "granted":
-                risk_score = partner_scores.get(partner_id, 0)
-                if risk_score >= 80 or deception_state.get(partner_id) or partner_id in restricted_partners:
-                    user_notifications.append({
-                        "user": user_id,
-                        "partner": partner_id,
-                        "type": "high_risk",
-                        "level": "threat",
-                        "timestamp": datetime.utcnow().isoformat(),
-                        "message": f"🚨 THREAT ALERT: Partner {partner_id} accessed your data! Risk score: {risk_score}",
-                        "risk": risk_score,
-                        "can_escalate": True,
-                        "escalation_reason": f"High risk partner ({risk_score}) accessing data",
-                        "request_type": "bulk"
-                    })
-                elif risk_score >= 50:
-                    user_notifications.append({
-                        "user": user_id,
-                        "partner": partner_id,
-                        "type": "medium_risk",
-                        "level": "warning",
-                        "timestamp": datetime.utcnow().isoformat(),
-                        "message": f"⚠️ WARNING: Partner {partner_id} accessed your data. Risk score: {risk_score}",
-                        "risk": risk_score,
-                        "can_escalate": True,
-                        "escalation_reason": f"Medium risk partner ({risk_score}) accessing data",
-                        "request_type": "bulk"
-                    })
-                else:
-                    user_notifications.append({
-                        "user": user_id,
-                        "partner": partner_id,
-                        "type": "access",
-                        "level": "normal",
-                        "timestamp": datetime.utcnow().isoformat(),
-                        "message": f"✅ Normal access: Partner {partner_id} accessed your data.",
-                        "risk": risk_score,
-                        "can_escalate": False,
-                        "request_type": "bulk"
-                    })
-        
-        bulk_response[partner_id] = partner_response
+    # Partners run in parallel; each partner's entries stay in request order
+    groups = group_by_partner(requests_list)
+    ip = request.remote_addr
+    today = date.today().isoformat()
+    bulk_response = run_by_partner(
+        groups, lambda partner_id, entries: process_bulk_partner(partner_id, entries, ip, today))
     
     log_access(request, "/bulk_partner_request", 200)
     return jsonify(bulk_response), 200
 
-@app.route('/verify_watermark', methods=['POST'])
-def verify_watermark():
+# --- Asynchronous bulk jobs: submit / poll / stream ---
+@app.route('/bulk_jobs', methods=['POST'])
+def submit_bulk_job():
+    """Queue a bulk partner request and return its job id immediately"""
+    if not check_api_key(request):
+        log_access(request, "/bulk_jobs", 401)
+        return jsonify({"error": "Unauthorized"}), 401
     data = request.get_json()
-    leaked = data.get('watermark')
-    for record in access_logs:
-        sample = f"{record['partner']}|{record['timestamp']}|{record['user']}"
-        generated = hashlib.sha256(sample.encode()).hexdigest()
-        if leaked == generated:
-            decode_log.append({
-                "leaked": leaked,
-                "matched": True,
-                "culprit": record["partner"],
-                "timestamp": record["timestamp"]
-            })
-            return jsonify({
-                "culprit": record["partner"],
-                "timestamp": record["timestamp"]
-            })
+    requests_list = data.get('requests', [])
+    if not requests_list:
+        return jsonify({"error": "No requests provided"}), 400
+    groups = group_by_partner(requests_list)
+    ip = request.remote_addr
+    today = date.today().isoformat()
+    job = bulk_jobs.submit(
+        groups, lambda partner_id, entries: process_bulk_partner(partner_id, entries, ip, today))
+    log_access(request, "/bulk_jobs", 202)
+    return jsonify(job.progress()), 202
+
+@app.route('/bulk_jobs/<job_id>', methods=['GET'])
+def get_bulk_job(job_id):
+    if not check_api_key(request):
+        return jsonify({"error": "Unauthorized"}), 401
+    job = bulk_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.progress()), 200
+
+@app.route('/bulk_jobs/<job_id>/results', methods=['GET'])
+def get_bulk_job_results(job_id):
+    """Partner results in completion order: ?cursor=&limit="""
+    if not check_api_key(request):
+        return jsonify({"error": "Unauthorized"}), 401
+    job = bulk_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    try:
+        cursor = max(0, int(request.args.get('cursor', 0)))
+        limit = max(1, min(int(request.args.get('limit', 50)), MAX_PAGE_LIMIT))
+    except ValueError:
+        return jsonify({"error": "limit and cursor must be integers"}), 400
+    items, next_cursor = job.results_page(cursor, limit)
+    return jsonify({
+        "status": job.status,
+        "items": items,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor < job.total_partners
+    }), 200
+
+@app.route('/bulk_jobs/<job_id>/stream', methods=['GET'])
+def stream_bulk_job_results(job_id):
+    """
+    NDJSON stream of partner results as they finish, ending with a progress
+    line. While no partner finishes, a {"heartbeat": progress} line is written
+    every BULK_STREAM_HEARTBEAT seconds so proxies keep the connection open.
+    """
+    if not check_api_key(request):
+        return jsonify({"error": "Unauthorized"}), 401
+    job = bulk_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    cursor = max(0, request.args.get('cursor', 0, type=int))
+
+    def generate():
+        nonlocal cursor
+        while True:
+            finished = job.finished
+            items, cursor = job.results_page(cursor, MAX_PAGE_LIMIT)
+            for item in items:
+                yield json.dumps(item) + "\n"
+            if finished and not items:
+                yield json.dumps({"progress": job.progress()}) + "\n"
+                return
+            if not items and not job.wait_for_results(cursor, timeout=BULK_STREAM_HEARTBEAT):
+                yield json.dumps({"heartbeat": job.progress()}) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+def trace_watermark(leaked):
+    """
+    Resolve a leaked watermark and record the attempt in decode_log. Keyed
+    watermarks decode on their own; legacy SHA-256 hashes go through the index.
+    Definite misses (a bad tag, or a hash the bloom filter has never seen)
+    return None without being logged.
+    """
+    if not isinstance(leaked, str):
+        return None
+    if is_keyed_watermark(leaked):
+        record = decode_watermark(leaked)
+        if record is None:
+            return None  # bad tag: not one of ours
+    elif leaked in watermark_bloom:
+        record = watermark_index.lookup(leaked)
+    else:
+        return None  # never issued: rejected without touching the index or decode_log
+    if record:
+        decode_log.append({
+            "leaked": leaked,
+            "matched": True,
+            "culprit": record["partner"],
+            "timestamp": record["timestamp"]
+        })
+        return record
     decode_log.append({
         "leaked": leaked,
         "matched": False,
         "timestamp": datetime.utcnow().isoformat()
     })
+    return None
+
+@app.route('/verify_watermark', methods=['POST'])
+def verify_watermark():
+    data = request.get_json()
+    leaked = data.get('watermark')
+    record = trace_watermark(leaked)
+    if record:
+        return jsonify({
+            "culprit": record["partner"],
+            "timestamp": record["timestamp"]
+        })
     return jsonify({"result": "No match"}), 404
 
+@app.route('/verify_watermarks', methods=['POST'])
+def verify_watermarks():
+    """Batch trace: {"watermarks": [...]} -> per-hash culprit or null"""
+    data = request.get_json()
+    leaked_list = data.get('watermarks')
+    if not isinstance(leaked_list, list) or not leaked_list:
+        return jsonify({"error": "Missing watermarks list"}), 400
+    if not all(isinstance(w, str) for w in leaked_list):
+        return jsonify({"error": "watermarks must be strings"}), 400
+    results = {}
+    matched = 0
+    for leaked in leaked_list:
+        record = trace_watermark(leaked)
+        if record:
+            matched += 1
+            results[leaked] = {"culprit": record["partner"], "timestamp": record["timestamp"]}
+        else:
+            results[leaked] = None
+    return jsonify({"results": results, "checked": len(leaked_list), "matched": matched}), 200
+
+@app.route('/leak_scan', methods=['POST'])
+def leak_scan():
+    """
+    Scan a raw text/CSV dump, streamed as the request body, in one pass for
+    watermarks (keyed tokens and legacy SHA-256 hashes), known honeytokens
+    and recipient traps. Returns distinct hits aggregated per partner.
+    Scanning is read-only: no risk scores, trap hits or decode_log entries change.
+    """
+    if not check_api_key(request):
+        log_access(request, "/leak_scan", 401)
+        return jsonify({"error": "Unauthorized"}), 401
+    report = LeakReport()
+
+    def resolve(hits):
+        # Called per chunk, so only resolved values outlive the chunk
+        report.candidates += hits.candidates
+        for watermark, record in hits.keyed.items():
+            report.attribute(record["partner"], "watermarks", watermark, record["user"])
+        for watermark in sorted(hits.legacy):
+            record = watermark_index.lookup(watermark)
+            if record:  # None only for a bloom false positive
+                report.attribute(record["partner"], "watermarks", watermark, record["user"])
+        for trap_value in sorted(hits.traps):
+            trap = known_honeytokens.get(trap_value) or {}
+            if trap.get("partner_id"):
+                report.attribute(trap["partner_id"], "traps", trap_value)
+            else:
+                report.unattributed_trap(trap_value)
+        for trap_value in sorted(hits.recipients):
+            record = recipient_traps.lookup(trap_value)
+            if record:
+                report.attribute(record["partner"], "traps", trap_value)
+
+    scan_chunks(iter_chunks(request.stream), honeytoken_scanner, watermark_bloom, resolve)
+    log_access(request, "/leak_scan", 200)
+    return jsonify(report.to_dict()), 200
+
 @app.route('/decode_log', methods=['GET'])
 def get_decode_log():
-    return jsonify(decode_log)
+    return log_response(decode_log)
 
 if __name__ == '__main__':
     app.run(port=5000, debug=True) 
\ No newline at end of file
@@ -0,0 +1,18 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# pytest imports this before collecting any test module, so the stores are
+# configured before the first `import app` or `import storage.event_store`,
+# whatever order the tests are collected in. Nothing a test run writes lands
+# in backend/data, where the dev server would replay it.
+_data = tempfile.mkdtemp(prefix="canarahack-tests-")
+atexit.register(shutil.rmtree, _data, ignore_errors=True)
+
+os.environ["EVENT_STORE_BACKEND"] = "memory"
+os.environ["STATE_BACKEND"] = "memory"
+os.environ["EVENT_STORE_PATH"] = os.path.join(_data, "events.db")
+os.environ["STATE_STORE_PATH"] = os.path.join(_data, "state.db")
+os.environ["WATERMARK_BLOOM_PATH"] = os.path.join(_data, "watermarks.bloom")
+os.environ["WATERMARK_KEY_FILE"] = os.path.join(_data, "watermark.key")
@@ -0,0 +1,152 @@
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from uuid import uuid4
+
+from utils.pools import pool_context
+
+# Sensitive-value patterns, compiled once per process
+TRAP_PATTERNS = {
+    "email": r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+    "phone": r'\+?[\d\s\-\(\)]{10,}',
+    "name": r'\b[A-Z][a-z]+ [A-Z][a-z]+\b',
+    "id": r'\b\d{5,}\b',
+}
+COMPILED_PATTERNS = {trap_type: re.compile(pattern) for trap_type, pattern in TRAP_PATTERNS.items()}
+
+# Streaming: a match may only be committed once this many characters follow
+# it, so a value split across two chunks is still seen whole. Tokens longer
+# than this are the only ones that can be missed at a boundary.
+STREAM_OVERLAP = 256
+# Hard cap on carried-over text while waiting for a very long match to end
+STREAM_MAX_CARRY = 64 * 1024
+
+# Worker processes for batch injection; smaller batches are redacted in-process
+INJECT_WORKERS = int(os.environ.get("TRAP_INJECT_WORKERS", str(os.cpu_count() or 1)))
+INJECT_INLINE_MAX = 16
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def make_trap_value(trap_type):
+    """Generate a fresh trap value of the given type."""
+    if trap_type == 'email':
+        return f"trap_{uuid4().hex[:8]}@honeytoken.org"
+    if trap_type == 'phone':
+        return f"+1-555-{uuid4().hex[:3]}-{uuid4().hex[:4]}"
+    if trap_type == 'name':
+        return f"John {uuid4().hex[:6]}"
+    if trap_type == 'id':
+        return f"ID{uuid4().hex[:8].upper()}"
+    raise ValueError(f"Invalid trap type: {trap_type}")
+
+
+@lru_cache(maxsize=None)
+def combined_pattern(trap_types):
+    """One alternation over several trap types, so a document is redacted in a single pass."""
+    if len(trap_types) == 1:
+        return COMPILED_PATTERNS[trap_types[0]]
+    return re.compile("|".join(f"(?P<{t}>{TRAP_PATTERNS[t]})" for t in trap_types))
+
+
+def redact(document, trap_values):
+    """Replace every sensitive value in document; trap_values maps trap_type -> trap value."""
+    trap_types = tuple(trap_values)
+    pattern = combined_pattern(trap_types)
+    if len(trap_types) == 1:
+        return pattern.sub(trap_values[trap_types[0]].replace('\\', r'\\'), document)
+    return pattern.sub(lambda m: trap_values[m.lastgroup], document)
+
+
+class StreamingRedactor:
+    """
+    Incremental form of redact(): feed() text chunks, get redacted text back.
+    Matches that straddle a chunk boundary are held back until enough of the
+    following text has arrived to decide them.
+    """
+
+    def __init__(self, trap_values, overlap=STREAM_OVERLAP, max_carry=STREAM_MAX_CARRY):
+        self.trap_values = trap_values
+        self.trap_types = tuple(trap_values)
+        self.pattern = combined_pattern(self.trap_types)
+        self.overlap = overlap
+        self.max_carry = max_carry
+        self.replacements = 0
+        self._buf = ""
+        # Characters at the start of _buf that were already emitted; kept
+        # only so \b at the first new character sees its real neighbour
+        self._ctx = 0
+
+    def _replacement(self, match):
+        if len(self.trap_types) == 1:
+            return self.trap_values[self.trap_types[0]]
+        return self.trap_values[match.lastgroup]
+
+    def _drain(self, final):
+        buf = self._buf
+        cut = len(buf) if final else len(buf) - self.overlap
+        if cut <= self._ctx:
+            return ""
+        out = []
+        pos = self._ctx
+        for match in self.pattern.finditer(buf, self._ctx):
+            if match.end() > cut:
+                if len(buf) - match.start() <= self.max_carry:
+                    # Could still grow with the next chunk; decide it later
+                    cut = max(match.start(), pos)
+                    break
+                # Too long to keep holding back: commit it as it stands
+                cut = match.end()
+            out.append(buf[pos:match.start()])
+            out.append(self._replacement(match))
+            self.replacements += 1
+            pos = match.end()
+            if pos >= cut:
+                break
+        out.append(buf[pos:cut])
+        keep_from = max(cut - 1, 0)
+        self._ctx = cut - keep_from
+        self._buf = buf[keep_from:]
+        return "".join(out)
+
+    def feed(self, text):
+        self._buf += text
+        if len(self._buf) - self._ctx <= self.overlap:
+            return ""
+        return self._drain(final=False)
+
+    def close(self):
+        return self._drain(final=True)
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=INJECT_WORKERS, mp_context=pool_context())
+    return _pool
+
+
+def _inject_one(task):
+    # Runs in a worker process; patterns are compiled once there at import
+    document, trap_types = task
+    trap_values = {trap_type: make_trap_value(trap_type) for trap_type in trap_types}
+    return redact(document, trap_values), trap_values
+
+
+def inject_batch(documents, trap_types):
+    """
+    Redact many documents, each with its own fresh trap values.
+    Returns [(redacted_document, {trap_type: trap_value}), ...] in input order.
+    Nothing is registered here; the caller registers all trap values at once.
+    """
+    trap_types = tuple(dict.fromkeys(trap_types))
+    tasks = [(document, trap_types) for document in documents]
+    if len(tasks) <= INJECT_INLINE_MAX or INJECT_WORKERS <= 1:
+        return [_inject_one(task) for task in tasks]
+    chunksize = max(1, len(tasks) // (INJECT_WORKERS * 4))
+    return list(_get_pool().map(_inject_one, tasks, chunksize=chunksize))
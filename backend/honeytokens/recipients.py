@@ -0,0 +1,152 @@
+import re
+import threading
+import time
+from array import array
+from datetime import datetime, UTC
+from uuid import uuid4
+
+from honeytokens.injector import combined_pattern
+
+# Recipient traps carry a 48-bit random key in a type-specific frame, so a
+# payload is scanned once with RECIPIENT_TRAP_PATTERN and every candidate is
+# resolved with a dict lookup, however many traps are outstanding.
+KEY_BITS = 48
+TRAP_FORMATS = {
+    "email": lambda key: f"rcpt_{key:012x}@honeytoken.org",
+    "phone": lambda key: f"+1-555-{key >> 32:04x}-{(key >> 16) & 0xffff:04x}-{key & 0xffff:04x}",
+    "name": lambda key: f"John {key:012x}",
+    "id": lambda key: f"RID{key:012X}",
+}
+TRAP_TYPES = tuple(TRAP_FORMATS)
+# The lookahead on each frame's first character lets the scan skip most
+# positions without trying all four alternatives
+RECIPIENT_TRAP_PATTERN = re.compile(
+    r'(?=[r+JR])'
+    r'(?:\brcpt_(?P<email>[0-9a-f]{12})@honeytoken\.org\b'
+    r'|\+1-555-(?P<phone>[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4})\b'
+    r'|\bJohn (?P<name>[0-9a-f]{12})\b'
+    r'|\bRID(?P<id>[0-9A-F]{12})\b)'
+)
+
+
+class RecipientTrapIndex:
+    """
+    Trap values minted per (partner, field occurrence) so a leaked copy names
+    its original recipient. Rows minted by this process live in parallel
+    arrays; the only per-trap Python objects are the dict's int key and row
+    number. Every row is also appended to `log` (an EventLog indexed by key),
+    so traps minted before a restart or by another worker still resolve.
+    """
+
+    def __init__(self, log=None):
+        self._log = log
+        if log is not None:
+            log.add_index("key")
+        self._rows = {}  # key: row
+        self._partner = array('I')
+        self._type = array('B')
+        self._document = array('q')
+        self._occurrence = array('I')
+        self._minted = array('d')
+        self._partner_ids = []
+        self._partner_codes = {}
+        self._lock = threading.Lock()
+
+    def _partner_code(self, partner_id):
+        code = self._partner_codes.get(partner_id)
+        if code is None:
+            code = self._partner_codes[partner_id] = len(self._partner_ids)
+            self._partner_ids.append(partner_id)
+        return code
+
+    def _mint(self, partner_code, type_code, document, occurrence, minted):
+        # Caller holds the lock; a repeated key is simply drawn again
+        while True:
+            key = uuid4().int >> (128 - KEY_BITS)
+            if key not in self._rows:
+                break
+        self._rows[key] = len(self._partner)
+        self._partner.append(partner_code)
+        self._type.append(type_code)
+        self._document.append(document)
+        self._occurrence.append(occurrence)
+        self._minted.append(minted)
+        return key
+
+    def inject(self, document, partner_id, trap_types):
+        """
+        Redact document for one recipient, minting a distinct trap value for
+        every replaced field. Returns (redacted_document, [trap values]).
+        """
+        trap_types = tuple(dict.fromkeys(trap_types))
+        pattern = combined_pattern(trap_types)
+        minted = []
+        rows = []
+        with self._lock:
+            partner_code = self._partner_code(partner_id)
+            # Random rather than counted, so document numbers stay unique across workers and restarts
+            document_no = uuid4().int >> 65
+            now = time.time()
+
+            def replace(match):
+                trap_type = match.lastgroup if len(trap_types) > 1 else trap_types[0]
+                key = self._mint(partner_code, TRAP_TYPES.index(trap_type), document_no, len(minted), now)
+                rows.append((key, self._rows[key]))
+                minted.append(TRAP_FORMATS[trap_type](key))
+                return minted[-1]
+
+            redacted = pattern.sub(replace, document)
+        if self._log is not None:
+            for key, row in rows:
+                self._log.append({"key": _key_hex(key), **self._record(row)})
+        return redacted, minted
+
+    def _record(self, row):
+        return {
+            "partner": self._partner_ids[self._partner[row]],
+            "trap_type": TRAP_TYPES[self._type[row]],
+            "document": self._document[row],
+            "occurrence": self._occurrence[row],
+            "created_at": datetime.fromtimestamp(self._minted[row], UTC).isoformat(),
+        }
+
+    def _resolve(self, trap_type, token):
+        key = int(token.replace("-", ""), 16)
+        row = self._rows.get(key)
+        if row is not None:
+            record = self._record(row)
+        elif self._log is not None:
+            # Minted before a restart or by another worker
+            found = self._log.find("key", _key_hex(key))
+            if not found:
+                return None
+            record = {field: value for field, value in found[0].items() if field != "key"}
+        else:
+            return None
+        return record if record["trap_type"] == trap_type else None
+
+    def lookup(self, trap_value):
+        """Return the recipient record for one trap value, else None."""
+        match = RECIPIENT_TRAP_PATTERN.fullmatch(trap_value)
+        if match is None:
+            return None
+        return self._resolve(match.lastgroup, match.group(match.lastgroup))
+
+    def find(self, text):
+        """Return {trap_value: record} for every recipient trap in text."""
+        hits = {}
+        for match in RECIPIENT_TRAP_PATTERN.finditer(text):
+            trap_value = match.group(0)
+            if trap_value not in hits:
+                record = self._resolve(match.lastgroup, match.group(match.lastgroup))
+                if record is not None:
+                    hits[trap_value] = record
+        return hits
+
+    def __len__(self):
+        """Traps minted by this process (the log holds every worker's)."""
+        return len(self._rows)
+
+
+def _key_hex(key):
+    return f"{key:012x}"
@@ -0,0 +1,146 @@
+import threading
+from collections import deque
+
+# Automata are immutable once built, so scans never lock. New patterns are
+# queued and folded in by the next scan: they become a new small automaton,
+# merged with each smaller neighbour it outgrows, so an add never rebuilds
+# more than a small fraction of the set and a scan walks only a few levels.
+MERGE_RATIO = 8
+MIN_PENDING = 64
+
+
+class _Automaton:
+    """Aho-Corasick automaton over a fixed set of patterns; read-only once built."""
+
+    def __init__(self, patterns=()):
+        self.goto = [{}]
+        self.fail = [0]
+        self.own = [()]  # patterns ending exactly at each state
+        self.out = [()]  # own patterns plus those of the failure chain
+        self.patterns = []
+        for pattern in patterns:
+            self._insert(pattern)
+        self._link()
+
+    def _insert(self, pattern):
+        state = 0
+        for ch in pattern:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.own.append(())
+                self.out.append(())
+                self.goto[state][ch] = nxt
+            state = nxt
+        if pattern not in self.own[state]:
+            self.own[state] = self.own[state] + (pattern,)
+        self.patterns.append(pattern)
+
+    def _link(self):
+        """Compute failure links breadth-first and fold suffix outputs into each state."""
+        goto, fail, own, out = self.goto, self.fail, self.own, self.out
+        queue = deque()
+        for child in goto[0].values():
+            fail[child] = 0
+            out[child] = own[child]
+            queue.append(child)
+        while queue:
+            state = queue.popleft()
+            for ch, child in goto[state].items():
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[child] = goto[f].get(ch, 0)
+                queue.append(child)
+                out[child] = own[child] + out[fail[child]] if own[child] else out[fail[child]]
+
+    def scan(self, text, hits, skip=0):
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        # The first skip characters only advance the automaton; nothing ending there is reported
+        for ch in text[:skip]:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+        for ch in text[skip:] if skip else text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                hits.update(out[state])
+
+
+class HoneytokenScanner:
+    """
+    Multi-pattern matcher over every known trap value.
+    Scans a payload once per level and reports every trap it contains.
+    Safe to add from one thread while others scan: a scan reads one
+    published tuple of automata, which is replaced, never modified.
+    """
+
+    def __init__(self, patterns=()):
+        self._known = set(patterns)
+        self._levels = (_Automaton(self._known),) if self._known else ()  # largest first
+        self._queued = []
+        self._lock = threading.Lock()
+
+    def add(self, pattern):
+        if not pattern:
+            return
+        with self._lock:
+            if pattern in self._known:
+                return
+            self._known.add(pattern)
+            self._queued.append(pattern)
+
+    def _publish(self):
+        """Build automata for queued patterns off to the side, then swap them in."""
+        with self._lock:
+            if self._queued:
+                levels = list(self._levels)
+                patterns = self._queued
+                while levels and len(levels[-1].patterns) < max(MIN_PENDING, len(patterns) * MERGE_RATIO):
+                    patterns = levels.pop().patterns + patterns
+                levels.append(_Automaton(patterns))
+                # Cleared only now: until the swap, other scans see a non-empty
+                # queue and wait here instead of reading the old levels
+                self._levels = tuple(levels)
+                self._queued = []
+            return self._levels
+
+    def scan(self, text, skip=0):
+        """Return the set of trap values found in text, ignoring any that end within its first skip characters."""
+        levels = self._publish() if self._queued else self._levels
+        hits = set()
+        for automaton in levels:
+            automaton.scan(text, hits, skip)
+        return hits
+
+    def patterns(self):
+        """Every pattern added so far, queued ones included."""
+        with self._lock:
+            return list(self._known)
+
+    def __len__(self):
+        return len(self._known)
+
+
+def payload_text(data):
+    """Flatten every leaf value of a request payload into one scannable string."""
+    parts = []
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif item is not None:
+            parts.append(item if isinstance(item, str) else str(item))
+    # NUL never appears in trap values, so matches cannot span two fields
+    return "\x00".join(parts)
+
+
+honeytoken_scanner = HoneytokenScanner()
@@ -0,0 +1,90 @@
+from datetime import date
+from utils.state import user_locks
+
+DEFAULT_EXPIRY = "2099-12-31"
+
+# Denial responses are shared constants so denied users cost no allocation.
+# They are serialized as-is and must never be mutated.
+DENY_RESTRICTED = {"status": "denied", "reason": "Access permanently revoked due to misuse"}
+DENY_NOT_FOUND = {"status": "denied", "reason": "User not found"}
+DENY_POLICY = {"status": "denied", "reason": "Consent revoked for policy"}
+DENY_WATERMARK = {"status": "denied", "reason": "Consent revoked for watermark"}
+DENY_HONEYTOKEN = {"status": "denied", "reason": "Consent revoked for honeytoken"}
+DENY_EXPIRED = {"status": "denied", "reason": "Policy expired"}
+DENY_REGION = {"status": "denied", "reason": "Region mismatch"}
+
+_NOT_FOUND = (DENY_NOT_FOUND, None)
+
+
+def compile_consent(consent):
+    """Reduce a consent dict to (denial or None, expiry_date)."""
+    if not consent:
+        return _NOT_FOUND
+    expiry = consent.get("expiry_date", DEFAULT_EXPIRY)
+    if not consent.get("policy", True):
+        return (DENY_POLICY, expiry)
+    if not consent.get("watermark", True):
+        return (DENY_WATERMARK, expiry)
+    if not consent.get("honeytoken", True):
+        return (DENY_HONEYTOKEN, expiry)
+    return (None, expiry)
+
+
+class ConsentCache:
+    """
+    Compiled consent per user. Anything that changes consent_state must do so
+    holding user_locks(user_id) and call invalidate(user_id) before releasing it.
+    """
+
+    def __init__(self, consent_state):
+        self._consent_state = consent_state
+        self._compiled = {}
+
+    def get(self, user_id):
+        compiled = self._compiled.get(user_id)
+        if compiled is None:
+            # Compile under the user's lock so a concurrent update + invalidate
+            # can't be overwritten by a result compiled from the old consent
+            with user_locks(user_id):
+                compiled = compile_consent(self._consent_state.get(user_id))
+                # Only users with a consent record are cached: the cache stays
+                # bounded by consent_state however many unknown ids are requested
+                if compiled is not _NOT_FOUND:
+                    self._compiled[user_id] = compiled
+        return compiled
+
+    def invalidate(self, user_id=None):
+        if user_id is None:
+            self._compiled.clear()
+        else:
+            self._compiled.pop(user_id, None)
+
+
+class AccessRequest:
+    """Constants shared by every user decision in one partner request."""
+    __slots__ = ("partner_id", "region", "region_ok", "today", "purpose", "request_type")
+
+    def __init__(self, partner_id, region, allowed_region, purpose=None, request_type=None, today=None):
+        self.partner_id = partner_id
+        self.region = region
+        self.region_ok = region == allowed_region
+        self.today = today or date.today().isoformat()
+        self.purpose = purpose
+        self.request_type = request_type
+
+
+def check_user(ctx, user_id, consents, restricted):
+    """
+    Consent, expiry, region and restriction checks for one user, without risk updates.
+    Returns (denial or None, expiry). `restricted` is the partner's restricted user set (or None).
+    """
+    if restricted and user_id in restricted:
+        return (DENY_RESTRICTED, None)
+    denial, expiry = consents.get(user_id)
+    if denial is not None:
+        return (denial, expiry)
+    if ctx.today > expiry:
+        return (DENY_EXPIRED, expiry)
+    if not ctx.region_ok:
+        return (DENY_REGION, expiry)
+    return (None, expiry)
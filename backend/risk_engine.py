@@ -1,95 +1,555 @@
+import atexit
+import heapq
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, UTC
+from operator import attrgetter
+from typing import NamedTuple
+from uuid import uuid4
+from storage.event_store import get_event_store
+from storage.state_store import get_state_store
+from utils.state import partner_locks
 
 # Suspicious hours (e.g., 0-6 AM)
 suspicious_hours = set(range(0, 7))
-partner_scores = {}
-partner_access_times = {}
-partner_trap_counts = {}  # partner_id: count
-partner_traits = {}  # partner_id: [traits]
-restricted_partners = {}  # partner_id: [user_id, ...]
-# --- Deception Engine State ---
-deception_state = {}  # partner_id: bool
-detailed_access_log = []  # field-level logs
-alert_log = []  # admin alerts
-trap_hits = {}  # partner_id: int
-trap_impact_log = []  # for escalation/forensics
+# Sliding window (seconds) for a partner's access frequency
+HIGH_FREQUENCY_WINDOW = 600
+# Points added per event reason; recompute() replays history under other weights
+RISK_WEIGHTS = {"trap": 80, "late_access": 10, "high_frequency": 10, "region_mismatch": 20}
+RISK_REASONS = tuple(RISK_WEIGHTS)
+# Seconds for each reason's contribution to a score to halve (0 never decays)
+RISK_HALF_LIVES = {
+    reason: float(os.environ.get(f"RISK_HALF_LIFE_{reason.upper()}", default))
+    for reason, default in {
+        "trap": 14 * 86400,
+        "late_access": 86400,
+        "high_frequency": 3600,
+        "region_mismatch": 7 * 86400,
+    }.items()
+}
+DECEPTION_THRESHOLD = 80
+# Deception started by a score lapses once the decayed score is below this;
+# the gap keeps a partner sitting at the threshold from flapping in and out
+DECEPTION_RELEASE = float(os.environ.get("RISK_DECEPTION_RELEASE", "60"))
+TRAP_BLOCK_HITS = 3
+BURSTY_ACCESSES = 5
+STEALTHY_ACCESSES = 10
+# A snapshot of every partner's risk state is taken after this many risk
+# events, so a restart loads it and replays only the events committed since
+RISK_SNAPSHOT_INTERVAL = int(os.environ.get("RISK_SNAPSHOT_INTERVAL", "1000"))
 
-# --- Deception Mode Activation ---
-def activate_deception_mode(partner_id):
-    if not deception_state.get(partner_id):
-        deception_state[partner_id] = True
-        alert_log.append({
-            "partner": partner_id,
-            "event": "deception_mode_activated",
-            "timestamp": datetime.now(UTC).isoformat()
-        })
+# Deception mode is AUTO when a score crossed DECEPTION_THRESHOLD (it lapses
+# once the decayed score falls below DECEPTION_RELEASE) and MANUAL when an admin set it
+AUTO = "auto"
+MANUAL = "manual"
 
-# Adaptive risk scoring and trait assignment
 
-def update_risk_score(partner_id, reason, user_id=None):
-    score = 0
-    trait = None
-    now = datetime.now(UTC)
-    hour = now.hour
-    # Frequency tracking
-    if partner_id not in partner_access_times:
-        partner_access_times[partner_id] = []
-    partner_access_times[partner_id].append(now)
-    partner_access_times[partner_id] = [t for t in partner_access_times[partner_id] if (now-t).total_seconds() < 600]
-    freq = len(partner_access_times[partner_id])
-    # Trap count
-    if partner_id not in partner_trap_counts:
-        partner_trap_counts[partner_id] = 0
-    # Scoring logic
+def _decay(value, elapsed, half_life):
+    if not value or elapsed <= 0 or half_life <= 0:
+        return value
+    return value * 2 ** (-elapsed / half_life)
+
+
+def _total(scores, at, half_lives):
+    return sum(_decay(value, at - updated, half_lives[reason])
+               for reason, (value, updated) in zip(RISK_REASONS, scores))
+
+
+class PartnerRisk(NamedTuple):
+    """
+    One partner's risk state: the fold of that partner's risk events.
+    Scores are kept per reason as (value, last_update) and decayed only
+    when read, so a read costs one power per reason and nothing sweeps.
+    """
+    scores: tuple = ((0.0, 0.0),) * len(RISK_REASONS)  # (value, epoch seconds) per RISK_REASONS entry
+    traits: frozenset = frozenset()
+    trap_hits: int = 0
+    recent: tuple = ()  # epoch seconds of the latest accesses inside HIGH_FREQUENCY_WINDOW
+    restricted: frozenset | None = None  # users blocked for; frozenset() blocks none yet
+    deception: str | None = None  # AUTO, MANUAL or None
+    version: int = 0  # risk events folded into this partner's state
+
+    def score_at(self, at=None, half_lives=RISK_HALF_LIVES):
+        """Decayed total score at epoch seconds `at` (default: now)."""
+        return _total(self.scores, time.time() if at is None else at, half_lives)
+
+    def deceiving(self, at=None, half_lives=RISK_HALF_LIVES):
+        """Whether deception mode is in force at `at` (default: now)."""
+        if self.deception == MANUAL:
+            return True
+        return self.deception == AUTO and self.score_at(at, half_lives) >= DECEPTION_RELEASE
+
+
+NEW_PARTNER = PartnerRisk()
+
+
+def encode_risk(state):
+    return [[list(pair) for pair in state.scores], sorted(state.traits), state.trap_hits, list(state.recent),
+            None if state.restricted is None else sorted(state.restricted), state.deception, state.version]
+
+
+def decode_risk(data):
+    scores, traits, hits, recent, restricted, deception, version = data
+    return PartnerRisk(tuple(map(tuple, scores)), frozenset(traits), hits, tuple(recent),
+                       None if restricted is None else frozenset(restricted), deception, version)
+
+
+def _event_time(event):
+    moment = datetime.fromisoformat(event["timestamp"])
+    return moment if moment.tzinfo else moment.replace(tzinfo=UTC)
+
+
+def apply(state, event, weights=RISK_WEIGHTS, half_lives=RISK_HALF_LIVES):
+    """
+    Fold one risk event into a partner's state. Pure: time comes from the
+    event, nothing is read or written elsewhere. Returns (new_state, effects),
+    where effects are (log name, record) pairs the live engine appends and a
+    replay ignores, since those records were appended the first time round.
+    """
+    kind = event.get("type", "score")
+    if kind == "restrict":
+        added = frozenset([event["user"]]) if event.get("user") else frozenset()
+        return state._replace(restricted=(state.restricted or frozenset()) | added), []
+    if kind == "deception":
+        return state._replace(deception=MANUAL), []
+    partner_id = event["partner"]
+    reason = event["reason"]
+    moment = _event_time(event)
+    ts = moment.timestamp()
+    recent = tuple(t for t in state.recent if ts - t < HIGH_FREQUENCY_WINDOW) + (ts,)
+    recent = recent[-(STEALTHY_ACCESSES + 1):]
+    freq = len(recent)
+    traits = set()
+    effects = []
+    hits = state.trap_hits
+    restricted = state.restricted
     if reason == "trap":
-        score = 80
-        partner_trap_counts[partner_id] += 1
-        trait = "reckless"
-        # Track trap hits for escalation
-        trap_hits[partner_id] = trap_hits.get(partner_id, 0) + 1
-        trap_impact_log.append({
+        hits += 1
+        traits.add("reckless")
+        effects.append(("trap_impact_log", {
             "partner": partner_id,
-            "user": user_id,
-            "timestamp": now.isoformat(),
+            "user": event.get("user"),
+            "timestamp": event["timestamp"],
             "event": "trap_hit",
-            "trap_hits": trap_hits[partner_id]
-        })
-        if trap_hits[partner_id] >= 3:
-            if partner_id not in restricted_partners:
-                restricted_partners[partner_id] = set()
-            if user_id:
-                restricted_partners[partner_id].add(user_id)
-            alert_log.append({
+            "trap_hits": hits
+        }))
+        if hits >= TRAP_BLOCK_HITS:
+            user_id = event.get("user")
+            restricted = (restricted or frozenset()) | (frozenset([user_id]) if user_id else frozenset())
+            effects.append(("alert_log", {
                 "partner": partner_id,
                 "event": "blocked_after_3_trap_hits",
-                "timestamp": now.isoformat()
-            })
+                "timestamp": event["timestamp"]
+            }))
     elif reason == "late_access":
-        score = 10
-        if hour in suspicious_hours:
-            trait = "nocturnal"
+        if moment.astimezone(UTC).hour in suspicious_hours:
+            traits.add("nocturnal")
     elif reason == "high_frequency":
-        score = 10
-        if freq > 5:
-            trait = "bursty"
-    elif reason == "region_mismatch":
-        score = 20
-    else:
-        score = 0
-    # Update score
-    partner_scores[partner_id] = partner_scores.get(partner_id, 0) + score
-    # Assign traits
-    if partner_id not in partner_traits:
-        partner_traits[partner_id] = set()
-    if trait:
-        partner_traits[partner_id].add(trait)
+        if freq > BURSTY_ACCESSES:
+            traits.add("bursty")
     # Stealthy: many accesses, no traps
-    if freq > 10 and partner_trap_counts[partner_id] == 0:
-        partner_traits[partner_id].add("stealthy")
-    # Activate deception mode if risk >= 80
-    if partner_scores[partner_id] >= 80:
-        activate_deception_mode(partner_id)
-    return partner_scores[partner_id]
+    if freq > STEALTHY_ACCESSES and hits == 0:
+        traits.add("stealthy")
+    scores = state.scores
+    weight = weights.get(reason, 0)
+    if weight and reason in RISK_REASONS:
+        i = RISK_REASONS.index(reason)
+        value, updated = scores[i]
+        if ts >= updated:
+            component = (_decay(value, ts - updated, half_lives[reason]) + weight, ts)
+        else:
+            # An event older than the last update: add its weight as decayed since then
+            component = (value + _decay(weight, updated - ts, half_lives[reason]), updated)
+        scores = scores[:i] + (component,) + scores[i + 1:]
+    was_deceiving = state.deceiving(ts, half_lives)
+    deception = state.deception
+    if deception != MANUAL:
+        score = _total(scores, ts, half_lives)
+        floor = DECEPTION_RELEASE if was_deceiving else DECEPTION_THRESHOLD
+        deception = AUTO if score >= floor else None
+    if deception and not was_deceiving:
+        effects.append(("alert_log", {
+            "partner": partner_id,
+            "event": "deception_mode_activated",
+            "timestamp": event["timestamp"]
+        }))
+    return PartnerRisk(scores, state.traits | traits, hits, recent, restricted, deception, state.version), effects
+
+
+# Risk events are the source of truth; risk_state is their fold per partner,
+# kept in the state store so every worker process sees the same scores,
+# restrictions and deception flags (STATE_BACKEND=sqlite to share them)
+_state = get_state_store()
+risk_events = get_event_store().log("risk_events")
+risk_state = _state.map("risk_state", encode=encode_risk, decode=decode_risk)  # partner_id: PartnerRisk
+detailed_access_log = get_event_store().log("detailed_access_log")  # field-level logs
+alert_log = get_event_store().log("alert_log")  # admin alerts
+trap_impact_log = get_event_store().log("trap_impact_log")  # for escalation/forensics
+_effect_logs = {"alert_log": alert_log, "trap_impact_log": trap_impact_log}
+# risk_state entries are only changed while holding partner_locks(partner_id),
+# by folding an event in and then appending it (_record)
+
+
+_MISSING = object()
+
+
+class RiskView:
+    """
+    Read-only per-partner view of one value read(state) of a PartnerRisk, so
+    readers keep using partner_scores.get(partner_id, 0) and friends. A
+    partner is only present when present(value) holds (e.g. trap_hits once
+    it has one). Values are read, and scores decayed, at call time.
+    """
+
+    def __init__(self, read, present=bool):
+        self.read = read
+        self.present = present
+
+    def get(self, partner_id, default=None):
+        state = risk_state.get(partner_id)
+        if state is None:
+            return default
+        value = self.read(state)
+        return value if self.present(value) else default
+
+    def __getitem__(self, partner_id):
+        value = self.get(partner_id, _MISSING)
+        if value is _MISSING:
+            raise KeyError(partner_id)
+        return value
+
+    def __contains__(self, partner_id):
+        return self.get(partner_id, _MISSING) is not _MISSING
+
+    def items(self):
+        values = ((partner_id, self.read(state)) for partner_id, state in risk_state.items())
+        return [(partner_id, value) for partner_id, value in values if self.present(value)]
+
+    def keys(self):
+        return [partner_id for partner_id, _ in self.items()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.items())
+
+
+partner_scores = RiskView(lambda state: round(state.score_at(), 1), present=lambda score: True)  # partner_id: decayed score
+partner_traits = RiskView(attrgetter("traits"))  # partner_id: {traits}
+trap_hits = RiskView(attrgetter("trap_hits"))  # partner_id: int
+restricted_partners = RiskView(attrgetter("restricted"), present=lambda users: users is not None)  # partner_id: {user_id, ...}
+deception_state = RiskView(lambda state: state.deceiving())  # partner_id: True while in force
+# user_id: {partner_id, ...}, reverse of restricted_partners, rebuilt from risk_state in each process
+restricted_by_user = {}
+_restricted_lock = threading.Lock()
+
+
+def _index_restrictions(partner_id, old, new):
+    before = (old.restricted if old else None) or frozenset()
+    after = (new.restricted if new else None) or frozenset()
+    if before == after:
+        return
+    with _restricted_lock:
+        for user_id in after - before:
+            restricted_by_user.setdefault(user_id, set()).add(partner_id)
+        for user_id in before - after:
+            restricted_by_user.get(user_id, set()).discard(partner_id)
+
+risk_state.subscribe(_index_restrictions)
+
+# --- Event recording, snapshots and replay ---
+_since_snapshot = 0
+_snapshot_lock = threading.Lock()  # guards _since_snapshot
+_snapshot_running = threading.Lock()  # held by the one thread taking a snapshot
+RISK_SNAPSHOT = "risk_state"
+
+
+def _record(event):
+    """Fold a risk event into its partner's state, then append it; returns the new state."""
+    global _since_snapshot
+    partner_id = event["partner"]
+    effects = []
+    with partner_locks(partner_id):
+
+        def step(state):
+            new, fx = apply(state, event)
+            effects[:] = fx
+            return new._replace(version=state.version + 1)
+
+        state = risk_state.mutate(partner_id, step, NEW_PARTNER)
+        # Appended after the fold and stamped with the version it produced: a
+        # replay applies each partner's events in the order they were folded,
+        # whichever worker wrote them and whenever they were committed
+        risk_events.append({**event, "version": state.version})
+        for log_name, record in effects:
+            _effect_logs[log_name].append(record)
+    with _snapshot_lock:
+        _since_snapshot += 1
+        due = RISK_SNAPSHOT_INTERVAL and _since_snapshot >= RISK_SNAPSHOT_INTERVAL
+    if due:
+        take_snapshot()
+    return state
+
+
+def take_snapshot():
+    """
+    Save every partner's risk state with the commit position it covers,
+    replacing the previous snapshot. Returns the snapshot, or None when
+    another thread is taking one or there is nothing to save.
+    """
+    global _since_snapshot
+    if not _snapshot_running.acquire(blocking=False):
+        return None  # another thread is taking one
+    try:
+        with _snapshot_lock:
+            _since_snapshot = 0
+        # Read the position first: every event committed by then was folded
+        # before it was appended, so the copy taken after it includes that
+        # event. Later ones are replayed, and skipped by version if the copy
+        # already has them, so no partner lock is needed.
+        position = risk_events.position()
+        states = risk_state.snapshot()
+        if not states:
+            return None
+        snapshot = {
+            "position": position,
+            "timestamp": datetime.now(UTC).isoformat(),
+            "partners": {partner_id: encode_risk(state) for partner_id, state in states.items()}
+        }
+        get_event_store().save_snapshot(RISK_SNAPSHOT, snapshot)
+    finally:
+        _snapshot_running.release()
+    return snapshot
+
+
+def _snapshot_at_exit():
+    if _since_snapshot:
+        take_snapshot()
+
+
+def _replay(rows, states, weights=RISK_WEIGHTS, half_lives=RISK_HALF_LIVES):
+    """
+    Fold (seq, event) rows into states ({partner_id: PartnerRisk}, updated in
+    place); returns the number of events applied. Each partner's events are
+    applied in version order, whatever order workers committed them in: an
+    event ahead of a missing version waits for it, and any still waiting at
+    the end are applied in order. Events at or below a partner's version are
+    already in its state and skipped.
+    """
+    waiting = {}  # partner_id: heap of (version, seq, event)
+    applied = 0
+
+    def fold(partner_id, version, event):
+        nonlocal applied
+        state = states.get(partner_id, NEW_PARTNER)
+        if version > state.version:
+            states[partner_id] = apply(state, event, weights, half_lives)[0]._replace(version=version)
+            applied += 1
+
+    for seq, event in rows:
+        partner_id = event["partner"]
+        # Events logged before versions were stamped fold in seq order
+        version = event.get("version", seq)
+        heap = waiting.get(partner_id)
+        if not heap and ("version" not in event or version <= states.get(partner_id, NEW_PARTNER).version + 1):
+            fold(partner_id, version, event)
+            continue
+        heap = waiting.setdefault(partner_id, [])
+        heapq.heappush(heap, (version, seq, event))
+        while heap and heap[0][0] <= states.get(partner_id, NEW_PARTNER).version + 1:
+            version, _, event = heapq.heappop(heap)
+            fold(partner_id, version, event)
+    for partner_id, heap in waiting.items():
+        while heap:
+            version, _, event = heapq.heappop(heap)
+            fold(partner_id, version, event)
+    return applied
+
+
+def load_risk_state():
+    """
+    Bring risk_state up to date on startup: start from the latest snapshot
+    and replay only the events committed after it. Partners whose stored
+    state is already newer (a shared state store) are left as they are.
+    Returns the number of events replayed.
+    """
+    stored = risk_state.snapshot()
+    states = dict(stored)
+    position = 0
+    snapshot = get_event_store().load_snapshot(RISK_SNAPSHOT)
+    if snapshot:
+        position = snapshot["position"]
+        for partner_id, data in snapshot["partners"].items():
+            state = decode_risk(data)
+            if state.version > states.get(partner_id, NEW_PARTNER).version:
+                states[partner_id] = state
+    replayed = _replay(((seq, event) for _, seq, event in risk_events.scan_committed(position)), states)
+    changed = {partner_id: state for partner_id, state in states.items() if stored.get(partner_id) != state}
+    if changed:
+        # Another worker may have moved a partner on since the read above
+        risk_state.merge(changed, lambda new, current: current is None or new.version > current.version)
+    return replayed
+
+
+def recompute(weights=None, half_lives=None):
+    """
+    Replay the whole risk history offline under different weights and
+    half-lives (merged over RISK_WEIGHTS / RISK_HALF_LIVES).
+    Returns {partner_id: PartnerRisk}; live state is untouched.
+    """
+    weights = {**RISK_WEIGHTS, **(weights or {})}
+    half_lives = {**RISK_HALF_LIVES, **(half_lives or {})}
+    states = {}
+    _replay(((seq, event) for _, seq, event in risk_events.scan_committed()), states, weights, half_lives)
+    return states
+
+
+# --- What-if recompute jobs ---
+MAX_RETAINED_RECOMPUTES = 20
+
+
+class RecomputeJob:
+    """One recompute() under other weights or half-lives, run in the background."""
+
+    def __init__(self, weights, half_lives):
+        self.id = uuid4().hex
+        self.status = "queued"
+        self.error = None
+        self.created_at = datetime.now(UTC).isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.weights = {**RISK_WEIGHTS, **weights}
+        self.half_lives = {**RISK_HALF_LIVES, **half_lives}
+        self.results = []  # [(partner_id, {score, current_score, traits, deception})] by partner_id
+
+    def _run(self):
+        self.status = "running"
+        self.started_at = datetime.now(UTC).isoformat()
+        try:
+            states = recompute(self.weights, self.half_lives)
+            now = time.time()
+            self.results = [
+                (partner_id, {
+                    "score": round(state.score_at(now, self.half_lives), 1),
+                    "current_score": partner_scores.get(partner_id, 0),
+                    "traits": sorted(state.traits),
+                    "deception": state.deceiving(now, self.half_lives)
+                })
+                for partner_id, state in sorted(states.items())
+            ]
+        except Exception as e:
+            self.error = str(e)
+            self.status = "failed"
+        else:
+            self.status = "done"
+        self.finished_at = datetime.now(UTC).isoformat()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def progress(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "weights": self.weights,
+            "half_lives": self.half_lives,
+            "total_partners": len(self.results),
+        }
+
+    def results_page(self, cursor=0, limit=50):
+        """Partner results after `cursor` (a count of results already read)."""
+        page = self.results[cursor:cursor + limit]
+        return {partner_id: result for partner_id, result in page}, cursor + len(page)
+
+
+class RecomputeJobRegistry:
+    """Recompute jobs run one at a time, so full replays never pile up."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def submit(self, weights, half_lives):
+        job = RecomputeJob(weights, half_lives)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="risk-recompute")
+            self._jobs[job.id] = job
+            self._evict()
+        self._executor.submit(job._run)
+        return job
+
+    def _evict(self):
+        # Drop the oldest finished jobs once more than MAX_RETAINED_RECOMPUTES are held
+        excess = len(self._jobs) - MAX_RETAINED_RECOMPUTES
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished][:excess]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+
+recompute_jobs = RecomputeJobRegistry()
+
+load_risk_state()
+atexit.register(_snapshot_at_exit)
+
+
+def restrict_partner(partner_id, user_id=None):
+    """Block partner_id for user_id (or just mark the partner restricted)."""
+    _record({"partner": partner_id, "type": "restrict", "user": user_id,
+             "timestamp": datetime.now(UTC).isoformat()})
+
+def restricted_users(partner_id):
+    """Copy of the users partner_id is blocked for, safe to iterate while others restrict."""
+    return list(restricted_partners.get(partner_id, ()))
+
+def restricted_for_user(user_id):
+    """Copy of the partners blocked for user_id."""
+    with _restricted_lock:
+        return list(restricted_by_user.get(user_id, ()))
+
+# --- Deception Mode Activation ---
+def activate_deception_mode(partner_id):
+    """
+    Manually put partner_id in deception mode. Unlike activation by score,
+    it stays on however far the score decays.
+    """
+    state = risk_state.get(partner_id)
+    if state is None or state.deception != MANUAL:
+        _record({"partner": partner_id, "type": "deception", "timestamp": datetime.now(UTC).isoformat()})
+
+def access_frequency(partner_id, window=HIGH_FREQUENCY_WINDOW):
+    """
+    Number of scored accesses by partner_id, from any worker, within the last
+    `window` seconds (at most HIGH_FREQUENCY_WINDOW). Read from the same
+    recent accesses the bursty and stealthy traits are folded from, so it
+    counts at most STEALTHY_ACCESSES + 1.
+    """
+    state = risk_state.get(partner_id)
+    if state is None:
+        return 0
+    cutoff = time.time() - min(window, HIGH_FREQUENCY_WINDOW)
+    return sum(1 for t in state.recent if t > cutoff)
+
+# Adaptive risk scoring and trait assignment
+
+def update_risk_score(partner_id, reason, user_id=None):
+    now = datetime.now(UTC)
+    state = _record({"partner": partner_id, "type": "score", "reason": reason, "user": user_id,
+                     "timestamp": now.isoformat()})
+    return round(state.score_at(now.timestamp()), 1)
 
 # For compatibility, keep calculate_risk_score as a wrapper
 
@@ -100,6 +560,6 @@ def calculate_risk_score(partner_id, endpoint, user_id=None):
     hour = now.hour
     if hour in suspicious_hours:
         return update_risk_score(partner_id, "late_access", user_id)
-    if partner_id in partner_access_times and len(partner_access_times[partner_id]) > 5:
+    if access_frequency(partner_id) > 5:
         return update_risk_score(partner_id, "high_frequency", user_id)
     return partner_scores.get(partner_id, 0) 
\ No newline at end of file
@@ -0,0 +1,728 @@
+import atexit
+import base64
+import heapq
+import json
+import logging
+from bisect import bisect_left, bisect_right
+import os
+import sqlite3
+import threading
+from array import array
+from collections import deque
+from datetime import datetime, UTC
+from storage.records import Record, json_default
+
+# Backend selection: "sqlite" (durable, default) or "memory" (process lifetime only)
+EVENT_STORE_BACKEND = os.environ.get("EVENT_STORE_BACKEND", "sqlite")
+EVENT_STORE_PATH = os.environ.get(
+    "EVENT_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "events.db"),
+)
+# Records kept in memory per log; older ones are read back from the backend
+EVENT_LOG_TAIL = int(os.environ.get("EVENT_LOG_TAIL", "1000"))
+# Group commit: pending appends are written together every FLUSH_INTERVAL
+# seconds, or sooner once FLUSH_BATCH records are waiting
+FLUSH_INTERVAL = float(os.environ.get("EVENT_STORE_FLUSH_INTERVAL", "0.05"))
+FLUSH_BATCH = 1000
+SCAN_PAGE = 1000
+# Appends held while the backend is failing; past this the oldest are dropped
+EVENT_STORE_MAX_PENDING = int(os.environ.get("EVENT_STORE_MAX_PENDING", "100000"))
+# Sequence numbers reserved from the backend at a time. Every process sharing
+# a database draws its own blocks, so two workers never write the same seq.
+SEQ_BLOCK = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_ts(value):
+    """
+    ISO 8601 timestamp -> UTC in one fixed format, so stored and queried times
+    compare correctly as text. Naive values are taken as UTC. Raises
+    ValueError for anything that is not ISO 8601.
+    """
+    if not isinstance(value, str):
+        raise ValueError("timestamp must be an ISO 8601 string")
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=UTC)
+    return moment.astimezone(UTC).isoformat(timespec="microseconds")
+
+
+def _record_ts(record):
+    ts = record.get("timestamp") if isinstance(record, (dict, Record)) else None
+    try:
+        return normalize_ts(ts)
+    except ValueError:
+        return normalize_ts(datetime.now(UTC).isoformat())
+
+
+def _stored_ts(value):
+    try:
+        return normalize_ts(value)
+    except ValueError:
+        return value
+
+
+def _normalize_range(since, until):
+    return (None if since is None else normalize_ts(since)), (None if until is None else normalize_ts(until))
+
+
+def format_range_cursor(ts, seq):
+    """Opaque cursor for a time-range page: the (ts, seq) of the last row returned."""
+    return base64.urlsafe_b64encode(f"{seq}|{ts}".encode()).decode().rstrip("=")
+
+
+def parse_range_cursor(value):
+    """(ts, seq) from format_range_cursor(); raises ValueError for anything else."""
+    seq, sep, ts = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode().partition("|")
+    if not sep:
+        raise ValueError("not a time-range cursor")
+    return ts, int(seq)
+
+
+def _index_keys(indexes, name, seq, record):
+    """(log, field, value, seq) rows for the indexes registered on log `name`."""
+    keys = []
+    for field, key in indexes.get(name, {}).items():
+        value = key(record)
+        if isinstance(value, (str, int)):
+            keys.append((name, field, value, seq))
+    return keys
+
+
+class MemoryBackend:
+    """Keeps every event in process memory. Useful for tests and demos."""
+
+    def __init__(self):
+        self._logs = {}  # name: [(seq, ts, record), ...] ordered by seq
+        self._committed = {}  # name: array of seqs in write order; position n is index n - 1
+        self._next = {}  # name: next unreserved seq
+        self._snapshots = {}  # name: latest saved record
+        self._indexes = {}  # name: {field: key(record)}
+        self._keys = {}  # (name, field): {value: array of seqs}
+
+    def reserve(self, name, count):
+        start = self._next.get(name, 1)
+        self._next[name] = start + count
+        return start
+
+    def write(self, batch):
+        for name, seq, ts, record in batch:
+            self._logs.setdefault(name, []).append((seq, ts, record))
+            self._committed.setdefault(name, array("q")).append(seq)
+            self._add_keys(_index_keys(self._indexes, name, seq, record))
+
+    def _add_keys(self, keys):
+        for name, field, value, seq in keys:
+            seqs = self._keys.setdefault((name, field), {}).get(value)
+            if seqs is None:
+                seqs = self._keys[(name, field)][value] = array("q")
+            seqs.append(seq)
+
+    def add_index(self, name, field, key):
+        if field in self._indexes.get(name, {}):
+            return
+        self._indexes.setdefault(name, {})[field] = key
+        self._keys[(name, field)] = {}
+        for seq, _, record in self._logs.get(name, []):
+            self._add_keys(_index_keys({name: {field: key}}, name, seq, record))
+
+    def find(self, name, field, value):
+        return list(self._keys.get((name, field), {}).get(value, ()))
+
+    def count_where(self, name, field, value):
+        return len(self._keys.get((name, field), {}).get(value, ()))
+
+    def count_indexed(self, name, field):
+        return len(self._keys.get((name, field), ()))
+
+    def indexed_values(self, name, field, after=None, limit=SCAN_PAGE):
+        values = sorted(self._keys.get((name, field), {}), key=str)
+        start = 0 if after is None else bisect_right(values, str(after), key=str)
+        return values[start:start + limit]
+
+    def last_seq(self, name):
+        rows = self._logs.get(name)
+        return rows[-1][0] if rows else 0
+
+    def last_position(self, name):
+        return len(self._committed.get(name, ()))
+
+    def page_committed(self, name, after_position=0, limit=SCAN_PAGE):
+        seqs = self._committed.get(name, ())[after_position:after_position + limit]
+        found = self.get(name, seqs)
+        return [(after_position + i + 1, seq, found[seq]) for i, seq in enumerate(seqs)]
+
+    def latest_committed(self, name, limit):
+        return self.page_committed(name, max(0, self.last_position(name) - limit), limit)
+
+    def save_snapshot(self, name, record):
+        self._snapshots[name] = record
+
+    def load_snapshot(self, name):
+        return self._snapshots.get(name)
+
+    def count(self, name):
+        return len(self._logs.get(name, ()))
+
+    def page(self, name, after_seq=0, limit=SCAN_PAGE):
+        rows = self._logs.get(name, [])
+        start = bisect_right(rows, after_seq, key=lambda row: row[0])
+        return [(seq, record) for seq, _, record in rows[start:start + limit]]
+
+    def page_range(self, name, after=None, since=None, until=None, limit=SCAN_PAGE):
+        # No ts index here: every page filters the whole log
+        rows = (
+            (ts, seq, record) for seq, ts, record in self._logs.get(name, [])
+            if (since is None or ts >= since) and (until is None or ts < until)
+            and (after is None or (ts, seq) > after)
+        )
+        return heapq.nsmallest(limit, rows, key=lambda row: row[:2])
+
+    def tail(self, name, n):
+        return [(seq, record) for seq, _, record in self._logs.get(name, [])[-n:]] if n else []
+
+    def get(self, name, seqs):
+        rows = self._logs.get(name, [])
+        found = {}
+        for seq in seqs:
+            i = bisect_left(rows, seq, key=lambda row: row[0])
+            if i < len(rows) and rows[i][0] == seq:
+                found[seq] = rows[i][2]
+        return found
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend:
+    """Append-only event table in a WAL-mode SQLite database."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                " log TEXT NOT NULL, seq INTEGER NOT NULL, ts TEXT NOT NULL, body TEXT NOT NULL,"
+                " PRIMARY KEY (log, seq)) WITHOUT ROWID"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS events_ts ON events (log, ts)")
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+                # Rows written before timestamps were normalized
+                self._conn.create_function("normalize_ts", 1, _stored_ts)
+                self._conn.execute("UPDATE events SET ts = normalize_ts(ts)")
+                self._conn.execute("PRAGMA user_version = 1")
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] < 2:
+                # Commit position: the order rows were written in, across every
+                # process, which seqs drawn from per-process blocks do not follow.
+                # Rows written before it existed keep their seq order.
+                self._conn.execute("BEGIN IMMEDIATE")
+                columns = [row[1] for row in self._conn.execute("PRAGMA table_info(events)")]
+                if "pos" not in columns:
+                    self._conn.execute("ALTER TABLE events ADD COLUMN pos INTEGER")
+                    self._conn.execute("UPDATE events SET pos = seq")
+                self._conn.execute("PRAGMA user_version = 2")
+                self._conn.execute("COMMIT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS events_pos ON events (log, pos)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS event_seqs (log TEXT PRIMARY KEY, next INTEGER NOT NULL)"
+            )
+            # Secondary indexes: written in the same transaction as their events,
+            # so every process sharing the database sees the same index
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS event_keys ("
+                " log TEXT NOT NULL, field TEXT NOT NULL, value NOT NULL, seq INTEGER NOT NULL,"
+                " PRIMARY KEY (log, field, value, seq)) WITHOUT ROWID"
+            )
+            # (log, field) pairs whose keys cover every row written before they were added
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS event_indexes (log TEXT NOT NULL, field TEXT NOT NULL,"
+                " PRIMARY KEY (log, field))"
+            )
+            # Latest snapshot per name, replaced on every save
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots (name TEXT PRIMARY KEY, body TEXT NOT NULL)"
+            )
+        self._indexes = {}  # name: {field: key(record)}
+
+    def reserve(self, name, count):
+        """Claim `count` sequence numbers for name; returns the first. Atomic across processes."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT next FROM event_seqs WHERE log = ?", (name,)).fetchone()
+                if row is None:
+                    # Logs written before seqs were reserved continue after their last row
+                    start = self._conn.execute(
+                        "SELECT COALESCE(MAX(seq), 0) + 1 FROM events WHERE log = ?", (name,)
+                    ).fetchone()[0]
+                else:
+                    start = row[0]
+                self._conn.execute("INSERT OR REPLACE INTO event_seqs VALUES (?, ?)", (name, start + count))
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return start
+
+    def _insert(self, rows):
+        # IMMEDIATE: the write lock is held from the start, so positions are
+        # drawn by one writer at a time
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for row, keys in rows:
+                self._conn.execute(
+                    "INSERT INTO events (log, seq, ts, body, pos) VALUES (?, ?, ?, ?,"
+                    " (SELECT COALESCE(MAX(pos), 0) + 1 FROM events WHERE log = ?))", (*row, row[0])
+                )
+                if keys:
+                    self._conn.executemany("INSERT OR IGNORE INTO event_keys VALUES (?, ?, ?, ?)", keys)
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def write(self, batch):
+        rows = []
+        for name, seq, ts, record in batch:
+            try:
+                rows.append(((name, seq, ts, json.dumps(record, default=json_default)),
+                             _index_keys(self._indexes, name, seq, record)))
+            except (TypeError, ValueError):
+                logger.exception("Dropping unserializable %s event %d", name, seq)
+        with self._lock:
+            try:
+                self._insert(rows)
+            except sqlite3.IntegrityError:
+                # A row already holds one of these seqs: keep it, write the rest, and
+                # drop the conflicting appends instead of retrying them forever
+                for row in rows:
+                    try:
+                        self._insert([row])
+                    except sqlite3.IntegrityError:
+                        logger.error("Dropping %s event %d: sequence number already written", row[0][0], row[0][1])
+
+    def add_index(self, name, field, key):
+        """Index record[field] (or key(record)) for find(); rows written earlier are indexed once."""
+        with self._lock:
+            if field in self._indexes.get(name, {}):
+                return
+            self._indexes.setdefault(name, {})[field] = key
+            done = self._conn.execute(
+                "SELECT 1 FROM event_indexes WHERE log = ? AND field = ?", (name, field)
+            ).fetchone()
+        if done:
+            return
+        indexes = {name: {field: key}}
+        after_seq = 0
+        while True:
+            rows = self.page(name, after_seq)
+            keys = [k for seq, record in rows for k in _index_keys(indexes, name, seq, record)]
+            with self._lock:
+                self._conn.execute("BEGIN")
+                self._conn.executemany("INSERT OR IGNORE INTO event_keys VALUES (?, ?, ?, ?)", keys)
+                if len(rows) < SCAN_PAGE:
+                    self._conn.execute("INSERT OR IGNORE INTO event_indexes VALUES (?, ?)", (name, field))
+                self._conn.execute("COMMIT")
+            if len(rows) < SCAN_PAGE:
+                return
+            after_seq = rows[-1][0]
+
+    def find(self, name, field, value):
+        rows = self._query(
+            "SELECT seq FROM event_keys WHERE log = ? AND field = ? AND value = ? ORDER BY seq", (name, field, value)
+        )
+        return [seq for seq, in rows]
+
+    def count_where(self, name, field, value):
+        return self._query(
+            "SELECT COUNT(*) FROM event_keys WHERE log = ? AND field = ? AND value = ?", (name, field, value)
+        )[0][0]
+
+    def count_indexed(self, name, field):
+        """Distinct values indexed under field."""
+        return self._query(
+            "SELECT COUNT(DISTINCT value) FROM event_keys WHERE log = ? AND field = ?", (name, field)
+        )[0][0]
+
+    def indexed_values(self, name, field, after=None, limit=SCAN_PAGE):
+        sql = "SELECT DISTINCT value FROM event_keys WHERE log = ? AND field = ?"
+        args = [name, field]
+        if after is not None:
+            sql += " AND value > ?"
+            args.append(after)
+        sql += " ORDER BY value LIMIT ?"
+        args.append(limit)
+        return [value for value, in self._query(sql, args)]
+
+    def _query(self, sql, args):
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    def last_seq(self, name):
+        return self._query("SELECT COALESCE(MAX(seq), 0) FROM events WHERE log = ?", (name,))[0][0]
+
+    def last_position(self, name):
+        return self._query("SELECT COALESCE(MAX(pos), 0) FROM events WHERE log = ?", (name,))[0][0]
+
+    def page_committed(self, name, after_position=0, limit=SCAN_PAGE):
+        rows = self._query(
+            "SELECT pos, seq, body FROM events WHERE log = ? AND pos > ? ORDER BY pos LIMIT ?",
+            (name, after_position, limit),
+        )
+        return [(pos, seq, json.loads(body)) for pos, seq, body in rows]
+
+    def latest_committed(self, name, limit):
+        rows = self._query(
+            "SELECT pos, seq, body FROM events WHERE log = ? ORDER BY pos DESC LIMIT ?", (name, limit)
+        )
+        return [(pos, seq, json.loads(body)) for pos, seq, body in reversed(rows)]
+
+    def save_snapshot(self, name, record):
+        body = json.dumps(record, default=json_default)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?)", (name, body))
+
+    def load_snapshot(self, name):
+        rows = self._query("SELECT body FROM snapshots WHERE name = ?", (name,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def count(self, name):
+        return self._query("SELECT COUNT(*) FROM events WHERE log = ?", (name,))[0][0]
+
+    def page(self, name, after_seq=0, limit=SCAN_PAGE):
+        rows = self._query(
+            "SELECT seq, body FROM events WHERE log = ? AND seq > ? ORDER BY seq LIMIT ?", (name, after_seq, limit)
+        )
+        return [(seq, json.loads(body)) for seq, body in rows]
+
+    def page_range(self, name, after=None, since=None, until=None, limit=SCAN_PAGE):
+        # Seeks the events_ts index, whose entries end in the (log, seq) key,
+        # so each page reads only the rows it returns
+        sql = "SELECT ts, seq, body FROM events WHERE log = ?"
+        args = [name]
+        if after is not None and (since is None or after[0] >= since):
+            sql += " AND (ts, seq) > (?, ?)"
+            args.extend(after)
+        elif since is not None:
+            sql += " AND ts >= ?"
+            args.append(since)
+        if until is not None:
+            sql += " AND ts < ?"
+            args.append(until)
+        sql += " ORDER BY ts, seq LIMIT ?"
+        args.append(limit)
+        return [(ts, seq, json.loads(body)) for ts, seq, body in self._query(sql, args)]
+
+    def tail(self, name, n):
+        rows = self._query("SELECT seq, body FROM events WHERE log = ? ORDER BY seq DESC LIMIT ?", (name, n))
+        return [(seq, json.loads(body)) for seq, body in reversed(rows)]
+
+    def get(self, name, seqs):
+        found = {}
+        seqs = list(seqs)
+        for i in range(0, len(seqs), 500):
+            chunk = seqs[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            rows = self._query(f"SELECT seq, body FROM events WHERE log = ? AND seq IN ({marks})", [name, *chunk])
+            found.update((seq, json.loads(body)) for seq, body in rows)
+        return found
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class EventLog:
+    """
+    Append-only, durable replacement for an in-memory list of log dicts.
+    Only the most recent `tail_size` records stay in memory; iteration and
+    lookups of older records go to the backend.
+    """
+
+    def __init__(self, store, name, tail_size):
+        self.store = store
+        self.name = name
+        self._lock = threading.RLock()
+        backend = store.backend
+        self._seq = backend.last_seq(name)
+        self._reserved = self._seq  # last seq of the block this process holds
+        self._count = backend.count(name)
+        self._tail = deque(backend.tail(name, tail_size), maxlen=tail_size)
+        self._subscribers = []
+
+    def append(self, record):
+        with self._lock:
+            if self._seq >= self._reserved:
+                self._seq = self.store.backend.reserve(self.name, SEQ_BLOCK) - 1
+                self._reserved = self._seq + SEQ_BLOCK
+            self._seq += 1
+            seq = self._seq
+            self._count += 1
+            self._tail.append((seq, record))
+            self.store._enqueue(self.name, seq, _record_ts(record), record)
+            for callback in self._subscribers:
+                callback(seq, record)
+        return seq
+
+    def subscribe(self, callback, replay=True):
+        """Call callback(seq, record) for every append; replay existing history first."""
+        with self._lock:
+            if replay:
+                for seq, record in self.scan():
+                    callback(seq, record)
+            self._subscribers.append(callback)
+
+    def add_index(self, field, key=None):
+        """
+        Maintain a secondary index on record[field], or on key(record) when
+        given (records where it returns None are left out). The index lives
+        in the backend and is written with the events, so it needs no replay
+        on startup and covers appends from every process sharing the store.
+        """
+        self.store.backend.add_index(self.name, field, key or (lambda record: record.get(field)))
+
+    def find(self, field, value):
+        """Records whose `field` equals value, in append order. Cost is O(matches)."""
+        return [record for _, record in self.find_rows(field, value)]
+
+    def find_rows(self, field, value):
+        """Like find(), but returns (seq, record) rows."""
+        self.store.flush()
+        return self.get_rows(self.store.backend.find(self.name, field, value))
+
+    def count_where(self, field, value):
+        self.store.flush()
+        return self.store.backend.count_where(self.name, field, value)
+
+    def count_indexed(self, field):
+        """Number of distinct values in the index on field."""
+        self.store.flush()
+        return self.store.backend.count_indexed(self.name, field)
+
+    def indexed_values(self, field):
+        """Yield every distinct value in the index on field, a page at a time."""
+        self.store.flush()
+        after = None
+        while True:
+            values = self.store.backend.indexed_values(self.name, field, after, SCAN_PAGE)
+            yield from values
+            if len(values) < SCAN_PAGE:
+                return
+            after = values[-1]
+
+    def position(self):
+        """
+        Commit position of the newest record written, from any process.
+        Records this process appended so far are written first.
+        """
+        self.store.flush()
+        return self.store.backend.last_position(self.name)
+
+    def scan_committed(self, after_position=0):
+        """
+        Yield (position, seq, record) for records written after after_position,
+        in the order they were committed by every process sharing the store.
+        """
+        self.store.flush()
+        while True:
+            rows = self.store.backend.page_committed(self.name, after_position, SCAN_PAGE)
+            yield from rows
+            if len(rows) < SCAN_PAGE:
+                return
+            after_position = rows[-1][0]
+
+    def scan(self, after_seq=0, since=None, until=None):
+        """
+        Yield (seq, record) in append order, reading the backend page by page.
+        With since/until, yields the records whose own timestamp falls in the
+        range, ordered by (timestamp, seq), through the timestamp index.
+        """
+        since, until = _normalize_range(since, until)
+        self.store.flush()
+        if since is not None or until is not None:
+            after = None
+            while True:
+                rows = self.store.backend.page_range(self.name, after, since, until, SCAN_PAGE)
+                yield from ((seq, record) for _, seq, record in rows)
+                if len(rows) < SCAN_PAGE:
+                    return
+                after = rows[-1][:2]
+        while True:
+            rows = self.store.backend.page(self.name, after_seq, SCAN_PAGE)
+            yield from rows
+            if len(rows) < SCAN_PAGE:
+                return
+            after_seq = rows[-1][0]
+
+    def page(self, cursor=0, since=None, until=None, limit=SCAN_PAGE):
+        """
+        One bounded page of records. Returns ([(seq, record)], next_cursor);
+        pass next_cursor back to continue, or to poll for records written later.
+        Without since/until the cursor is a commit position, so pages follow
+        the order records were written in by every process. With them,
+        records are ordered by (timestamp, seq) and the cursor is an opaque
+        string from format_range_cursor(); a falsy cursor starts either.
+        """
+        if since is None and until is None:
+            self.store.flush()
+            rows = self.store.backend.page_committed(self.name, cursor or 0, limit)
+            return [(seq, record) for _, seq, record in rows], rows[-1][0] if rows else cursor or 0
+        since, until = _normalize_range(since, until)
+        after = parse_range_cursor(cursor) if cursor else None
+        self.store.flush()
+        rows = self.store.backend.page_range(self.name, after, since, until, limit)
+        next_cursor = format_range_cursor(*rows[-1][:2]) if rows else cursor
+        return [(seq, record) for _, seq, record in rows], next_cursor
+
+    def latest(self, limit):
+        """The newest `limit` (seq, record) rows in commit order, and the commit position of the last one."""
+        self.store.flush()
+        rows = self.store.backend.latest_committed(self.name, limit)
+        return [(seq, record) for _, seq, record in rows], rows[-1][0] if rows else 0
+
+    def get(self, seqs):
+        """Return the records for the given sequence numbers, in the order given."""
+        return [record for _, record in self.get_rows(seqs)]
+
+    def get_rows(self, seqs):
+        """(seq, record) for the given sequence numbers that exist, in the order given."""
+        seqs = list(seqs)
+        found = {}
+        with self._lock:
+            # Appends evict from the left, so read the tail only while holding the lock
+            tail = self._tail
+            if tail:
+                first, last = tail[0][0], tail[-1][0]
+                for seq in seqs:
+                    if first <= seq <= last:
+                        i = bisect_left(tail, seq, key=lambda row: row[0])
+                        if tail[i][0] == seq:
+                            found[seq] = tail[i][1]
+        missing = [seq for seq in seqs if seq not in found]
+        if missing:
+            self.store.flush()
+            found.update(self.store.backend.get(self.name, missing))
+        return [(seq, found[seq]) for seq in seqs if seq in found]
+
+    def tail(self, n=None):
+        records = [record for _, record in self._tail]
+        return records if n is None else records[-n:]
+
+    @property
+    def last_seq(self):
+        return self._seq
+
+    def __iter__(self):
+        return (record for _, record in self.scan())
+
+    def __len__(self):
+        return self._count
+
+    def __bool__(self):
+        return self._count > 0
+
+
+class EventStore:
+    """Owns a backend, the group-commit writer thread and one EventLog per name."""
+
+    def __init__(self, backend, tail_size=EVENT_LOG_TAIL, flush_interval=FLUSH_INTERVAL):
+        self.backend = backend
+        self.tail_size = tail_size
+        self.flush_interval = flush_interval
+        self._logs = {}
+        self._logs_lock = threading.Lock()
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer = threading.Thread(target=self._run, name="event-store-writer", daemon=True)
+        self._writer.start()
+
+    def log(self, name, tail_size=None):
+        with self._logs_lock:
+            log = self._logs.get(name)
+            if log is None:
+                log = self._logs[name] = EventLog(self, name, tail_size or self.tail_size)
+            return log
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def save_snapshot(self, name, record):
+        """Store record as the snapshot called name, replacing the previous one."""
+        self.backend.save_snapshot(name, record)
+
+    def load_snapshot(self, name):
+        """The latest snapshot saved under name, else None."""
+        return self.backend.load_snapshot(name)
+
+    def _enqueue(self, name, seq, ts, record):
+        with self._pending_lock:
+            self._pending.append((name, seq, ts, record))
+            if len(self._pending) >= FLUSH_BATCH:
+                self._wake.set()
+
+    def flush(self):
+        """Write every pending append to the backend in one transaction."""
+        with self._write_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if batch:
+                try:
+                    self.backend.write(batch)
+                except Exception:
+                    # Put the batch back so the next flush retries it in order,
+                    # keeping at most EVENT_STORE_MAX_PENDING of the newest appends
+                    with self._pending_lock:
+                        self._pending[:0] = batch
+                        dropped = len(self._pending) - EVENT_STORE_MAX_PENDING
+                        if dropped > 0:
+                            del self._pending[:dropped]
+                    if dropped > 0:
+                        logger.error("Event store backlog full: dropped %d unwritten events", dropped)
+                    raise
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Keep the writer alive; the batch is retried on the next round
+                logger.exception("Event store flush failed")
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._writer.join(timeout=1)
+        self.flush()
+        self.backend.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_event_store():
+    """Process-wide event store, configured from the EVENT_STORE_* environment variables."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if EVENT_STORE_BACKEND == "memory":
+                    backend = MemoryBackend()
+                else:
+                    backend = SQLiteBackend(EVENT_STORE_PATH)
+                _store = EventStore(backend)
+                atexit.register(_store.close)
+    return _store
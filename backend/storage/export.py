@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+import zlib
+
+from storage.records import FieldAccess, HttpAccess, TrapLog, WatermarkGrant, json_default
+
+# Bytes buffered before a chunk is handed to the WSGI server
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# CSV columns per /export log name, covering every record type the log holds.
+# access_log mixes HTTP requests and watermark grants, so it gets the union.
+EXPORT_COLUMNS = {
+    "detailed_access_log": list(FieldAccess.FIELDS),
+    "trap_impact_log": ["partner", "user", "timestamp", "event", "trap_hits"],
+    "alert_log": ["partner", "event", "timestamp"],
+    "access_log": list(dict.fromkeys(HttpAccess.FIELDS + WatermarkGrant.FIELDS)),
+    "trap_logs": list(TrapLog.FIELDS),
+    "decode_log": ["leaked", "matched", "culprit", "timestamp"],
+}
+# Logs without fixed columns take the first record's keys; keys first seen
+# later go into this column as JSON instead of being dropped
+EXTRA_COLUMN = "extra"
+
+
+def ndjson_lines(records):
+    for record in records:
+        yield json.dumps(record, default=json_default) + "\n"
+
+
+def csv_lines(records, columns=None):
+    buffer = io.StringIO()
+    writer = None
+    known = None
+    for record in records:
+        if writer is None:
+            fixed = columns is not None
+            fieldnames = list(columns) if fixed else [*record.keys(), EXTRA_COLUMN]
+            known = set(fieldnames)
+            writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+            writer.writeheader()
+        if not fixed:
+            extra = {key: record[key] for key in record.keys() if key not in known}
+            if extra:
+                record = {**record, EXTRA_COLUMN: json.dumps(extra, default=json_default)}
+        writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def chunked(lines, compress=False):
+    """Group text lines into ~EXPORT_CHUNK_SIZE byte chunks, optionally gzip-compressed on the fly."""
+    gzip = zlib.compressobj(wbits=31) if compress else None
+    parts, size = [], 0
+    for line in lines:
+        data = line.encode()
+        parts.append(data)
+        size += len(data)
+        if size >= EXPORT_CHUNK_SIZE:
+            chunk = b"".join(parts)
+            parts, size = [], 0
+            if gzip:
+                chunk = gzip.compress(chunk)
+            if chunk:
+                yield chunk
+    chunk = b"".join(parts)
+    if gzip:
+        chunk = gzip.compress(chunk) + gzip.flush()
+    if chunk:
+        yield chunk
+
+
+def export_stream(log, fmt="ndjson", compress=False, since=None, until=None, columns=None):
+    """Stream a whole EventLog as NDJSON or CSV without materializing it; `columns` fixes the CSV header."""
+    records = (record for _, record in log.scan(since=since, until=until))
+    if fmt == "csv":
+        lines = csv_lines(records, columns)
+    else:
+        lines = ndjson_lines(records)
+    return chunked(lines, compress)
@@ -0,0 +1,240 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from storage.records import json_default
+
+# Events buffered per connected client; a client that falls further behind
+# is disconnected and catches up from the logs when it reconnects
+SSE_QUEUE_SIZE = int(os.environ.get("SSE_QUEUE_SIZE", "1000"))
+# Seconds between keep-alive comments on an idle stream
+SSE_HEARTBEAT = float(os.environ.get("SSE_HEARTBEAT", "15"))
+# Streams one process serves at once. With the threaded server every open
+# stream holds a thread; past this, new streams get 503 and retry later
+SSE_MAX_SUBSCRIBERS = int(os.environ.get("SSE_MAX_SUBSCRIBERS", "100"))
+# Seconds between polls for records committed by any process sharing the
+# event store; bounds how late a pushed event can arrive
+SSE_POLL_INTERVAL = float(os.environ.get("SSE_POLL_INTERVAL", "0.1"))
+# Client reconnect delay (ms) suggested in the stream
+SSE_RETRY_MS = 1000
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """One connected client: a bounded queue of (log name, position, seq, event type, record)."""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.events = deque()
+        self.overflowed = False
+        self._cond = threading.Condition()
+
+    def push(self, event):
+        with self._cond:
+            if self.overflowed:
+                return
+            if len(self.events) >= SSE_QUEUE_SIZE:
+                # From here on events are dropped; the client resumes from the logs
+                self.overflowed = True
+            else:
+                self.events.append(event)
+            self._cond.notify()
+
+    def drain(self, timeout):
+        """Wait up to timeout for events; return and clear everything queued."""
+        with self._cond:
+            if not self.events and not self.overflowed:
+                self._cond.wait(timeout)
+            events = list(self.events)
+            self.events.clear()
+            return events
+
+
+def event_id(name, seq):
+    """Stable id of one record, shared by log pages and pushed events so clients can de-duplicate."""
+    return f"{name}:{seq}"
+
+
+def with_event_id(name, seq, record):
+    return {**record, "event_id": event_id(name, seq)}
+
+
+def format_cursor(cursors):
+    return ",".join(f"{name}:{position}" for name, position in sorted(cursors.items()))
+
+
+def parse_cursor(value):
+    """Parse a Last-Event-ID ("log:position,log:position") into {log: position}; bad parts are ignored."""
+    cursors = {}
+    for part in (value or "").split(","):
+        name, _, position = part.partition(":")
+        if name and position.isdigit():
+            cursors[name] = int(position)
+    return cursors
+
+
+class _Stream:
+    """SSE body that gives its subscriber slot back when closed, even if never iterated."""
+
+    def __init__(self, hub, subscription, frames):
+        self._hub = hub
+        self._subscription = subscription
+        self._frames = frames
+
+    def __iter__(self):
+        return self._frames
+
+    def close(self):
+        self._frames.close()
+        self._hub._unsubscribe(self._subscription)
+
+
+class PushHub:
+    """
+    Fans EventLog records out to connected SSE clients. Records are read back
+    in commit order once written, so a stream carries every process's appends,
+    not only its own. Each attached log has a route(record) that returns the
+    channels ("admin", "user:<id>") a record belongs to, so a record only
+    touches the clients that want it.
+    """
+
+    def __init__(self, poll_interval=SSE_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._sources = {}  # log name: (log, event type, route)
+        self._positions = {}  # log name: commit position published up to
+        self._channels = {}  # channel: {Subscription}
+        self._subscribers = 0
+        self._lock = threading.Lock()
+        self._active = threading.Event()  # set while anyone is subscribed
+        self._poller = None
+
+    def attach(self, log, event_type, route):
+        self._sources[log.name] = (log, event_type, route)
+
+    def _poll(self):
+        """Publish records committed since the last poll; runs while anyone is subscribed."""
+        while True:
+            self._active.wait()
+            try:
+                with self._lock:
+                    for name, (log, event_type, route) in self._sources.items():
+                        for position, seq, record in log.scan_committed(self._positions[name]):
+                            self._positions[name] = position
+                            for channel in route(record):
+                                for subscription in self._channels.get(channel, ()):
+                                    subscription.push((name, position, seq, event_type, record))
+            except Exception:
+                # Keep polling; the records are picked up again next round
+                logger.exception("Push poll failed")
+            time.sleep(self.poll_interval)
+
+    def _subscribe(self, channel):
+        """
+        A new subscription and the positions published so far, or (None, None)
+        when SSE_MAX_SUBSCRIBERS are already connected. Records after those
+        positions reach the subscription; records up to them never do.
+        """
+        with self._lock:
+            if self._subscribers >= SSE_MAX_SUBSCRIBERS:
+                return None, None
+            if not self._subscribers:
+                # Nobody was listening: start from now, not from where polling stopped
+                self._positions = {name: log.position() for name, (log, _, _) in self._sources.items()}
+                self._active.set()
+                if self._poller is None:
+                    self._poller = threading.Thread(target=self._poll, name="push-poller", daemon=True)
+                    self._poller.start()
+            subscription = Subscription(channel)
+            self._channels.setdefault(channel, set()).add(subscription)
+            self._subscribers += 1
+            return subscription, dict(self._positions)
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is None or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            self._subscribers -= 1
+            if not subscribers:
+                del self._channels[subscription.channel]
+            if not self._subscribers:
+                self._active.clear()
+
+    def __len__(self):
+        """Streams currently connected to this process."""
+        return self._subscribers
+
+    def cursor(self):
+        """
+        Stream cursor at the current end of every source log. Read it before
+        fetching a list, then open the stream with it as Last-Event-ID: every
+        record committed after the read is pushed, none is skipped.
+        """
+        return format_cursor({name: log.position() for name, (log, _, _) in self._sources.items()})
+
+    def _replay(self, channel, name, after, until):
+        """Records in one log committed at positions after < position <= until that belong to channel."""
+        log, event_type, route = self._sources[name]
+        for position, seq, record in log.scan_committed(after):
+            if position > until:
+                return
+            if channel in route(record):
+                yield (name, position, seq, event_type, record)
+
+    def stream(self, channel, last_event_id=None, heartbeat=SSE_HEARTBEAT):
+        """
+        SSE text for one channel. Each event id is the commit position in
+        every source log, so a reconnect with Last-Event-ID resumes exactly
+        where the client stopped; a fresh connection only gets new events.
+        Returns None when this process already serves SSE_MAX_SUBSCRIBERS streams.
+        """
+        subscription, live = self._subscribe(channel)
+        if subscription is None:
+            return None
+        return _Stream(self, subscription, self._frames(subscription, channel, live, last_event_id, heartbeat))
+
+    def _frames(self, subscription, channel, live, last_event_id, heartbeat):
+        # Logs the client is behind on start at its own position, so an id sent
+        # mid-replay still points at the gap that remains
+        resume = {
+            name: position for name, position in parse_cursor(last_event_id).items()
+            if name in live and position < live[name]
+        }
+        cursors = {**live, **resume}
+
+        def frame(event):
+            name, position, seq, event_type, record = event
+            cursors[name] = position
+            data = json.dumps(with_event_id(name, seq, record), default=json_default)
+            return f"id: {format_cursor(cursors)}\nevent: {event_type}\ndata: {data}\n\n"
+
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            # Subscribed before replaying, so nothing committed meanwhile is lost;
+            # live events already covered by the replay are skipped below
+            for name, after in resume.items():
+                for event in self._replay(channel, name, after, live[name]):
+                    yield frame(event)
+                cursors[name] = live[name]
+            while True:
+                events = subscription.drain(heartbeat)
+                if not events and not subscription.overflowed:
+                    yield ": keep-alive\n\n"
+                    continue
+                for event in events:
+                    if event[1] > cursors[event[0]]:
+                        yield frame(event)
+                if subscription.overflowed:
+                    # Too far behind: end the stream; the client reconnects with its
+                    # last id and the gap is replayed from the logs
+                    return
+        finally:
+            self._unsubscribe(subscription)
+
+
+push_hub = PushHub()
@@ -0,0 +1,195 @@
+from enum import StrEnum
+
+# Log and notification entries are slotted records instead of dicts: a few
+# references per entry, shared enum members for level/type/source, and
+# messages rendered only when the record is serialized. They still read like
+# the dicts they replace (record["user"], record.get("partner"), {**record}).
+
+
+class Level(StrEnum):
+    NORMAL = "normal"
+    WARNING = "warning"
+    THREAT = "threat"
+
+
+class NotificationType(StrEnum):
+    ACCESS = "access"
+    MEDIUM_RISK = "medium_risk"
+    HIGH_RISK = "high_risk"
+    TRAP_HIT = "trap_hit"
+
+
+class Source(StrEnum):
+    REAL = "real"
+    SYNTHETIC = "synthetic"
+
+
+_MISSING = object()
+
+
+class Record:
+    __slots__ = ()
+    FIELDS = ()  # serialized keys, in order; may include computed properties
+    OPTIONAL = ()  # keys left out when their value is None
+
+    def get(self, key, default=None):
+        if key not in self.FIELDS:
+            return default
+        value = getattr(self, key)
+        if value is None and key in self.OPTIONAL:
+            return default
+        return value
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def keys(self):
+        return [key for key in self.FIELDS if key in self]
+
+    def to_dict(self):
+        out = {}
+        for key in self.FIELDS:
+            value = getattr(self, key)
+            if value is None and key in self.OPTIONAL:
+                continue
+            out[key] = value
+        return out
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+def json_default(obj):
+    """json.dumps default= hook: records serialize as their dict form."""
+    if isinstance(obj, Record):
+        return obj.to_dict()
+    return str(obj)
+
+
+# message, escalation_reason templates per notification type
+NOTIFICATION_TEXT = {
+    NotificationType.HIGH_RISK: (
+        "🚨 THREAT ALERT: Partner {partner} accessed your data! Risk score: {risk}",
+        "High risk partner ({risk}) accessing data",
+    ),
+    NotificationType.MEDIUM_RISK: (
+        "⚠️ WARNING: Partner {partner} accessed your data. Risk score: {risk}",
+        "Medium risk partner ({risk}) accessing data",
+    ),
+    NotificationType.ACCESS: (
+        "✅ Normal access: Partner {partner} accessed your data.",
+        None,
+    ),
+    NotificationType.TRAP_HIT: (
+        "🚨 TRAP ALERT: Partner {partner} triggered a security trap on your data! Risk score: {risk}",
+        "Trap triggered by partner {partner}",
+    ),
+}
+
+
+class Notification(Record):
+    __slots__ = ("user", "partner", "type", "level", "timestamp", "risk", "request_type")
+    FIELDS = ("user", "partner", "type", "level", "timestamp", "message", "risk",
+              "can_escalate", "escalation_reason", "request_type")
+    OPTIONAL = ("escalation_reason", "request_type")
+
+    def __init__(self, user, partner, type, level, timestamp, risk, request_type=None):
+        self.user = user
+        self.partner = partner
+        self.type = type
+        self.level = level
+        self.timestamp = timestamp
+        self.risk = risk
+        self.request_type = request_type
+
+    @property
+    def message(self):
+        return NOTIFICATION_TEXT[self.type][0].format(partner=self.partner, risk=self.risk)
+
+    @property
+    def escalation_reason(self):
+        template = NOTIFICATION_TEXT[self.type][1]
+        return template.format(partner=self.partner, risk=self.risk) if template else None
+
+    @property
+    def can_escalate(self):
+        return self.type is not NotificationType.ACCESS
+
+
+class FieldAccess(Record):
+    """detailed_access_log entry: one field served to a partner."""
+    __slots__ = ("partner", "user", "field", "value", "timestamp", "source", "request_type")
+    FIELDS = __slots__
+    OPTIONAL = ("request_type",)
+
+    def __init__(self, partner, user, field, value, timestamp, source, request_type=None):
+        self.partner = partner
+        self.user = user
+        self.field = field
+        self.value = value
+        self.timestamp = timestamp
+        self.source = source
+        self.request_type = request_type
+
+
+class UserAccess(Record):
+    """user_access_history entry."""
+    __slots__ = ("partner", "user", "timestamp", "ip", "trap_triggered", "purpose", "region", "request_type")
+    FIELDS = __slots__
+    OPTIONAL = ("request_type",)
+
+    def __init__(self, partner, user, timestamp, ip, trap_triggered, purpose, region, request_type=None):
+        self.partner = partner
+        self.user = user
+        self.timestamp = timestamp
+        self.ip = ip
+        self.trap_triggered = trap_triggered
+        self.purpose = purpose
+        self.region = region
+        self.request_type = request_type
+
+
+class WatermarkGrant(Record):
+    """access_logs entry for a granted user: the watermark handed to the partner."""
+    __slots__ = ("partner", "user", "timestamp", "watermark")
+    FIELDS = __slots__
+
+    def __init__(self, partner, user, timestamp, watermark):
+        self.partner = partner
+        self.user = user
+        self.timestamp = timestamp
+        self.watermark = watermark
+
+
+class HttpAccess(Record):
+    """access_logs entry for one API call."""
+    __slots__ = ("ip", "method", "endpoint", "timestamp", "status", "user_agent")
+    FIELDS = __slots__
+
+    def __init__(self, ip, method, endpoint, timestamp, status, user_agent):
+        self.ip = ip
+        self.method = method
+        self.endpoint = endpoint
+        self.timestamp = timestamp
+        self.status = status
+        self.user_agent = user_agent
+
+
+class TrapLog(Record):
+    """trap_logs entry."""
+    __slots__ = ("partner", "user", "timestamp", "ip", "trigger", "risk_score")
+    FIELDS = __slots__
+
+    def __init__(self, partner, user, timestamp, ip, trigger, risk_score):
+        self.partner = partner
+        self.user = user
+        self.timestamp = timestamp
+        self.ip = ip
+        self.trigger = trigger
+        self.risk_score = risk_score
@@ -0,0 +1,306 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Backend selection: "sqlite" (default, one file shared by every worker
+# process on the host) or "memory" (per process, single-process runs only)
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "sqlite")
+STATE_STORE_PATH = os.environ.get(
+    "STATE_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "state.db"),
+)
+# Seconds a process may serve reads from its cache before checking for
+# writes by other processes; 0 checks on every read
+STATE_REFRESH_INTERVAL = float(os.environ.get("STATE_REFRESH_INTERVAL", "0.05"))
+
+
+def _identity(value):
+    return value
+
+
+class StateMap:
+    """
+    Dict-like shared state (partner scores, deception flags, consent, ...).
+    Reads are served from an in-process cache that the store keeps in step
+    with writes from other processes. Values must be treated as immutable:
+    change them only through set/update/mutate/swap/pop, never in place.
+    Subscribers get callback(key, old, new) for local and remote changes;
+    new is None when the key was removed.
+    """
+
+    def __init__(self, store, name, encode=None, decode=None):
+        self.store = store
+        self.name = name
+        self.encode = encode or _identity
+        self.decode = decode or _identity
+        self.version = 0
+        self._data = {}
+        self._lock = threading.RLock()
+        self._subscribers = []
+
+    def _apply(self, changes):
+        """Apply {key: value or None} to the cache; returns the (key, old, new) events."""
+        events = []
+        for key, value in changes.items():
+            old = self._data.get(key)
+            if value is None:
+                self._data.pop(key, None)
+            else:
+                self._data[key] = value
+            if old != value:
+                events.append((key, old, value))
+        return events
+
+    def _notify(self, events):
+        for callback in self._subscribers:
+            for key, old, new in events:
+                callback(key, old, new)
+
+    def _write(self, compute):
+        self._notify(self.store.transact(self, compute))
+
+    def subscribe(self, callback, replay=True):
+        """Call callback(key, old, new) on every change; replay current entries first."""
+        if replay:
+            for key, value in self.items():
+                callback(key, None, value)
+        self._subscribers.append(callback)
+
+    # --- reads ---
+    def get(self, key, default=None):
+        self.store.refresh()
+        return self._data.get(key, default)
+
+    def __getitem__(self, key):
+        self.store.refresh()
+        return self._data[key]
+
+    def __contains__(self, key):
+        self.store.refresh()
+        return key in self._data
+
+    def __len__(self):
+        self.store.refresh()
+        return len(self._data)
+
+    def keys(self):
+        self.store.refresh()
+        return list(self._data)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        self.store.refresh()
+        return list(self._data.items())
+
+    def snapshot(self):
+        self.store.refresh()
+        return dict(self._data)
+
+    # --- writes (each one is a single atomic transaction) ---
+    def __setitem__(self, key, value):
+        self._write(lambda: {key: value})
+
+    def update(self, mapping):
+        self._write(lambda: dict(mapping))
+
+    def seed(self, mapping):
+        """Insert the entries whose keys are not present yet (first process wins)."""
+        self._write(lambda: {key: value for key, value in mapping.items() if key not in self._data})
+
+    def merge(self, mapping, newer):
+        """Set the entries for which newer(value, current) holds; current is None for a missing key."""
+        self._write(lambda: {key: value for key, value in mapping.items() if newer(value, self._data.get(key))})
+
+    def mutate(self, key, fn, default=None):
+        """Atomically replace the value with fn(current or default); returns the new value."""
+        result = []
+
+        def compute():
+            value = fn(self._data.get(key, default))
+            result.append(value)
+            return {key: value}
+
+        self._write(compute)
+        return result[0]
+
+    def swap(self, key, value):
+        """Atomically set key to value; returns the previous value (or None)."""
+        previous = []
+
+        def compute():
+            previous.append(self._data.get(key))
+            return {key: value}
+
+        self._write(compute)
+        return previous[0]
+
+    def pop(self, key, default=None):
+        previous = []
+
+        def compute():
+            previous.append(self._data.get(key, default))
+            return {key: None}
+
+        self._write(compute)
+        return previous[0]
+
+
+class MemoryStateStore:
+    """Per-process state: the cache is the only copy."""
+
+    def __init__(self):
+        self._maps = {}
+        self._maps_lock = threading.Lock()
+
+    def map(self, name, encode=None, decode=None):
+        with self._maps_lock:
+            state_map = self._maps.get(name)
+            if state_map is None:
+                state_map = self._maps[name] = StateMap(self, name, encode, decode)
+            return state_map
+
+    def refresh(self):
+        pass
+
+    def transact(self, state_map, compute):
+        with state_map._lock:
+            return state_map._apply(compute())
+
+    def close(self):
+        pass
+
+
+class SQLiteStateStore:
+    """
+    State shared by every process that opens the same SQLite file.
+    Each map keeps a version counter; every write stamps its rows with the
+    next version, so a process refreshes its cache by pulling only the rows
+    newer than the version it last saw. PRAGMA data_version tells cheaply
+    whether any other connection has committed since the last check.
+    Reads never wait on the store lock: at most one thread refreshes at a
+    time, at most every refresh_interval, and the others read the cache.
+    Writes run in BEGIN IMMEDIATE transactions, so read-modify-write
+    (mutate, swap) is atomic across processes.
+    """
+
+    def __init__(self, path, refresh_interval=STATE_REFRESH_INTERVAL):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._lock = threading.RLock()
+        self._maps = {}
+        self._data_version = None
+        self._refresh_interval = refresh_interval
+        self._checked = 0.0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS state_entries ("
+                " map TEXT NOT NULL, key TEXT NOT NULL, value TEXT, version INTEGER NOT NULL,"
+                " PRIMARY KEY (map, key)) WITHOUT ROWID"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS state_entries_version ON state_entries (map, version)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS state_maps (map TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+            )
+
+    def map(self, name, encode=None, decode=None):
+        with self._lock:
+            state_map = self._maps.get(name)
+            if state_map is None:
+                state_map = self._maps[name] = StateMap(self, name, encode, decode)
+                self._pull(state_map)
+            return state_map
+
+    def _pull(self, state_map):
+        """Bring one map's cache up to date; caller holds the lock. Returns the change events."""
+        rows = self._conn.execute(
+            "SELECT key, value, version FROM state_entries WHERE map = ? AND version > ? ORDER BY version",
+            (state_map.name, state_map.version),
+        ).fetchall()
+        if not rows:
+            return []
+        changes = {}
+        for key, value, version in rows:
+            changes[key] = None if value is None else state_map.decode(json.loads(value))
+        state_map.version = rows[-1][2]
+        return state_map._apply(changes)
+
+    def refresh(self):
+        now = time.monotonic()
+        if self._refresh_interval and now - self._checked < self._refresh_interval:
+            return
+        # Another thread is refreshing or writing (and pulling) already
+        if not self._lock.acquire(blocking=False):
+            return
+        pending = []
+        try:
+            self._checked = now
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return
+            self._data_version = data_version
+            versions = dict(self._conn.execute("SELECT map, version FROM state_maps").fetchall())
+            for name, state_map in self._maps.items():
+                if versions.get(name, 0) > state_map.version:
+                    pending.append((state_map, self._pull(state_map)))
+        finally:
+            self._lock.release()
+        # Subscribers run outside the store lock so they may take their own locks
+        for state_map, events in pending:
+            state_map._notify(events)
+
+    def transact(self, state_map, compute):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                events = self._pull(state_map)
+                changes = {key: value for key, value in compute().items() if state_map._data.get(key) != value}
+                if changes:
+                    version = state_map.version + 1
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO state_entries VALUES (?, ?, ?, ?)",
+                        [
+                            (state_map.name, key, None if value is None else json.dumps(state_map.encode(value)), version)
+                            for key, value in changes.items()
+                        ],
+                    )
+                    self._conn.execute(
+                        "INSERT INTO state_maps VALUES (?, ?) ON CONFLICT (map) DO UPDATE SET version = excluded.version",
+                        (state_map.name, version),
+                    )
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            if changes:
+                state_map.version = version
+                events += state_map._apply(changes)
+            return events
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_state_store():
+    """Process-wide state store, configured from the STATE_* environment variables."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if STATE_BACKEND == "sqlite":
+                    _store = SQLiteStateStore(STATE_STORE_PATH)
+                else:
+                    _store = MemoryStateStore()
+                atexit.register(_store.close)
+    return _store
@@ -0,0 +1,152 @@
+import atexit
+import os
+import threading
+
+# Rows folded between snapshots of the counters; a restart resumes from the
+# latest snapshot and folds only the rows committed after it
+SUMMARY_SNAPSHOT_INTERVAL = int(os.environ.get("SUMMARY_SNAPSHOT_INTERVAL", "10000"))
+SUMMARY_SNAPSHOT = "activity_summaries"
+
+
+class PartnerActivity:
+    __slots__ = ("access_attempts", "trap_hits")
+
+    def __init__(self):
+        self.access_attempts = 0
+        self.trap_hits = 0
+
+
+class UserActivity:
+    __slots__ = ("access_attempts", "total_notifications", "threat_notifications", "last_access")
+
+    def __init__(self):
+        self.access_attempts = 0
+        self.total_notifications = 0
+        self.threat_notifications = 0
+        self.last_access = None
+
+
+class ActivitySummaries:
+    """
+    Per-partner and per-user counters for the admin dashboard, folded from
+    the logs they summarize in commit order. refresh() folds the rows
+    committed since the last call by any process sharing the store, so
+    every worker reports the same totals.
+    """
+
+    def __init__(self):
+        self.partners = {}  # partner_id: PartnerActivity
+        self.users = {}  # user_id: UserActivity
+        self._store = None
+        self._sources = {}  # log name: (EventLog, handler)
+        self._positions = {}  # log name: commit position folded up to
+        self._since_snapshot = 0
+        self._lock = threading.Lock()
+
+    def _partner(self, partner_id):
+        activity = self.partners.get(partner_id)
+        if activity is None:
+            activity = self.partners[partner_id] = PartnerActivity()
+        return activity
+
+    def _user(self, user_id):
+        activity = self.users.get(user_id)
+        if activity is None:
+            activity = self.users[user_id] = UserActivity()
+        return activity
+
+    def on_access(self, seq, record):
+        partner_id = record.get("partner")
+        if partner_id:
+            self._partner(partner_id).access_attempts += 1
+        user_id = record.get("user")
+        if user_id is not None:
+            user = self._user(user_id)
+            user.access_attempts += 1
+            timestamp = record.get("timestamp")
+            if timestamp and (user.last_access is None or timestamp > user.last_access):
+                user.last_access = timestamp
+
+    def on_trap(self, seq, record):
+        partner_id = record.get("partner")
+        if partner_id:
+            self._partner(partner_id).trap_hits += 1
+
+    def on_field_access(self, seq, record):
+        partner_id = record.get("partner")
+        if partner_id:
+            self._partner(partner_id)
+
+    def on_notification(self, seq, record):
+        user_id = record.get("user")
+        if user_id is None:
+            return
+        user = self._user(user_id)
+        user.total_notifications += 1
+        if record.get("level") == "threat":
+            user.threat_notifications += 1
+
+    def attach(self, store, user_access_history, trap_logs, detailed_access_log, user_notifications):
+        """Resume from the snapshot saved in store, then fold the rows committed after it."""
+        self._store = store
+        for log, handler in ((user_access_history, self.on_access), (trap_logs, self.on_trap),
+                             (detailed_access_log, self.on_field_access), (user_notifications, self.on_notification)):
+            self._sources[log.name] = (log, handler)
+            self._positions[log.name] = 0
+        snapshot = store.load_snapshot(SUMMARY_SNAPSHOT)
+        if snapshot:
+            self._restore(snapshot)
+        self.refresh()
+        atexit.register(self._save_at_exit)
+
+    def refresh(self):
+        """Fold every row committed since the last refresh."""
+        with self._lock:
+            for name, (log, handler) in self._sources.items():
+                for position, seq, record in log.scan_committed(self._positions[name]):
+                    handler(seq, record)
+                    self._positions[name] = position
+                    self._since_snapshot += 1
+            due = SUMMARY_SNAPSHOT_INTERVAL and self._since_snapshot >= SUMMARY_SNAPSHOT_INTERVAL
+        if due:
+            self.save()
+
+    def save(self):
+        """Save the counters with the commit positions they cover, replacing the previous snapshot."""
+        if self._store is None:
+            return
+        with self._lock:
+            if not self._since_snapshot:
+                return
+            snapshot = {
+                "positions": dict(self._positions),
+                "partners": {partner_id: [activity.access_attempts, activity.trap_hits]
+                             for partner_id, activity in self.partners.items()},
+                "users": {user_id: [activity.access_attempts, activity.total_notifications,
+                                    activity.threat_notifications, activity.last_access]
+                          for user_id, activity in self.users.items()},
+            }
+            self._since_snapshot = 0
+        self._store.save_snapshot(SUMMARY_SNAPSHOT, snapshot)
+
+    def _save_at_exit(self):
+        if not self._store.closed:
+            self.save()
+
+    def _restore(self, snapshot):
+        for name, position in snapshot["positions"].items():
+            if name in self._positions:
+                self._positions[name] = position
+        for partner_id, (access_attempts, hits) in snapshot["partners"].items():
+            activity = self._partner(partner_id)
+            activity.access_attempts, activity.trap_hits = access_attempts, hits
+        for user_id, (access_attempts, total, threats, last_access) in snapshot["users"].items():
+            activity = self._user(user_id)
+            activity.access_attempts, activity.total_notifications = access_attempts, total
+            activity.threat_notifications, activity.last_access = threats, last_access
+
+    def user(self, user_id):
+        return self.users.get(user_id) or UserActivity()
+
+
+activity_summaries = ActivitySummaries()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import os
+
+os.environ.setdefault("EVENT_STORE_BACKEND", "memory")
+
+from policy.access_decision import (DENY_EXPIRED, DENY_HONEYTOKEN, DENY_NOT_FOUND, DENY_POLICY, DENY_REGION,
+                                    DENY_RESTRICTED, AccessRequest, ConsentCache, check_user)
+from watermarking.generator import decode_watermark
+
+HEADERS = {"X-API-Key": "SECRET123"}
+
+
+def test_checks_in_order():
+    consents = ConsentCache({
+        "ok": {"policy": True, "watermark": True, "honeytoken": True, "expiry_date": "2030-01-01"},
+        "no-policy": {"policy": False, "honeytoken": False, "expiry_date": "2000-01-01"},
+        "no-honeytoken": {"honeytoken": False},
+        "expired": {"expiry_date": "2025-01-01"},
+    })
+    ctx = AccessRequest("p1", "IN", "IN", today="2026-01-01")
+    elsewhere = AccessRequest("p1", "EU", "IN", today="2026-01-01")
+    assert check_user(ctx, "ok", consents, None) == (None, "2030-01-01")
+    assert check_user(ctx, "ok", consents, {"ok"}) == (DENY_RESTRICTED, None)
+    assert check_user(ctx, "no-policy", consents, None)[0] is DENY_POLICY
+    assert check_user(ctx, "no-honeytoken", consents, None)[0] is DENY_HONEYTOKEN
+    assert check_user(ctx, "expired", consents, None)[0] is DENY_EXPIRED
+    assert check_user(ctx, "nobody", consents, None)[0] is DENY_NOT_FOUND
+    assert check_user(elsewhere, "ok", consents, None)[0] is DENY_REGION
+    assert check_user(elsewhere, "expired", consents, None)[0] is DENY_EXPIRED
+    print("✅ Restriction, consent, expiry and region are checked in that order")
+
+
+def test_consent_cache_follows_changes():
+    state = {"u1": {"policy": True}}
+    consents = ConsentCache(state)
+    assert consents.get("u1")[0] is None
+    state["u1"] = {"policy": False}
+    assert consents.get("u1")[0] is None  # compiled result served until invalidated
+    consents.invalidate("u1")
+    assert consents.get("u1")[0] is DENY_POLICY
+    # A miss is not cached: a user whose consent appears later is seen at once
+    assert consents.get("u2")[0] is DENY_NOT_FOUND
+    state["u2"] = {"policy": True}
+    assert consents.get("u2")[0] is None
+    print("✅ Consent cache recompiles after invalidate and never caches a miss")
+
+
+def test_single_and_bulk_requests_decide_alike():
+    from app import app, consent_state, last_policy
+    consent_state["pipeline-user"] = {"policy": True, "watermark": True, "honeytoken": True, "expiry_date": "2099-01-01"}
+    client = app.test_client()
+    users = ["pipeline-user", "user3", "nobody"]
+
+    def decisions(response):
+        # Watermarks differ per request; keep who they were sealed for
+        return {user_id: {**result, "watermark": decode_watermark(result["watermark"])["user"]}
+                if "watermark" in result else result for user_id, result in response.items()}
+
+    for region, granted in ((last_policy.get("geo_restriction", "IN"), True), ("nowhere", False)):
+        single = client.post("/partner_request_data", json={
+            "partner_id": "pipeline-single", "region": region, "purpose": "test", "requested_users": users,
+        }, headers=HEADERS).get_json()
+        bulk = client.post("/bulk_partner_request", json={"requests": [
+            {"partner_id": "pipeline-bulk", "region": region, "purpose": "test", "users": users},
+        ]}, headers=HEADERS).get_json()["pipeline-bulk"]
+        assert decisions(single) == decisions(bulk)
+        expected = {"status": "granted", "expiry": "2099-01-01", "watermark": "pipeline-user"} if granted else DENY_REGION
+        assert decisions(single)["pipeline-user"] == expected
+        assert single["user3"] == DENY_HONEYTOKEN and single["nobody"] == DENY_NOT_FOUND
+    print("✅ /partner_request_data and /bulk_partner_request share one decision pipeline")
+
+
+if __name__ == "__main__":
+    test_checks_in_order()
+    test_consent_cache_follows_changes()
+    test_single_and_bulk_requests_decide_alike()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import hashlib
+import os
+import tempfile
+import threading
+
+from watermarking.bloom import BloomFilter, WatermarkBloom
+
+
+def _hashes(prefix, n):
+    return [hashlib.sha256(f"{prefix}{i}".encode()).hexdigest() for i in range(n)]
+
+
+def test_no_false_negatives_and_bounded_false_positives():
+    bloom = BloomFilter(capacity=10000, error_rate=0.01)
+    issued = _hashes("issued", 10000)
+    for value in issued:
+        bloom.add(value)
+    assert all(value in bloom for value in issued)
+    false_positives = sum(value in bloom for value in _hashes("never", 20000))
+    assert false_positives / 20000 < 0.02, false_positives
+    print(f"✅ No false negatives; false-positive rate {false_positives / 20000:.4f} at capacity")
+
+
+def test_snapshot_reload_and_corrupt_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "watermarks.bloom")
+        bloom = WatermarkBloom(path, snapshot_interval=0, capacity=1000, error_rate=0.01)
+        for value in _hashes("a", 500):
+            bloom.add(value)
+        bloom.save()
+        reloaded = WatermarkBloom.open(path, capacity=1000, error_rate=0.01)
+        assert len(reloaded) == 500 and all(value in reloaded for value in _hashes("a", 500))
+        resized = WatermarkBloom.open(path, capacity=5000, error_rate=0.01)
+        assert len(resized) == 0
+        with open(path, "wb") as f:
+            f.write(b"WMBF garbage")
+        assert len(WatermarkBloom.open(path, capacity=1000, error_rate=0.01)) == 0
+    print("✅ Snapshot reloads; a resized filter or corrupt file starts empty")
+
+
+def test_concurrent_saves_never_raise():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "watermarks.bloom")
+        bloom = WatermarkBloom(path, snapshot_interval=1e-9, capacity=10000, error_rate=0.01)
+        errors = []
+
+        def adder(prefix):
+            try:
+                for value in _hashes(prefix, 300):
+                    bloom.add(value)
+                    bloom.save()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=adder, args=(f"t{i}",)) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        bloom.save()
+        assert not errors, errors
+        assert not [name for name in os.listdir(tmp) if name.endswith(".tmp")]
+        reloaded = WatermarkBloom.open(path, capacity=10000, error_rate=0.01)
+        assert all(value in reloaded for i in range(6) for value in _hashes(f"t{i}", 300))
+    print("✅ Concurrent snapshots never raise or leave temp files behind")
+
+
+def test_workers_merge_snapshots():
+    # Two filters on one path stand in for two worker processes
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "watermarks.bloom")
+        first = WatermarkBloom.open(path, snapshot_interval=0, capacity=1000, error_rate=0.01)
+        second = WatermarkBloom.open(path, snapshot_interval=0, capacity=1000, error_rate=0.01)
+        for value in _hashes("first", 200):
+            first.add(value)
+        for value in _hashes("second", 200):
+            second.add(value)
+        first.save()
+        second.save()
+        merged = WatermarkBloom.open(path, capacity=1000, error_rate=0.01)
+        assert all(value in merged for value in _hashes("first", 200) + _hashes("second", 200))
+    print("✅ The last worker to save keeps the other workers' watermarks")
+
+
+if __name__ == "__main__":
+    test_no_false_negatives_and_bounded_false_positives()
+    test_snapshot_reload_and_corrupt_file()
+    test_concurrent_saves_never_raise()
+    test_workers_merge_snapshots()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import random
+import threading
+import time
+
+os.environ.setdefault("EVENT_STORE_BACKEND", "memory")
+
+import app as app_module
+from app import app
+from utils import bulk
+from utils.bulk import BulkJobRegistry, group_by_partner, run_by_partner
+from watermarking.generator import decode_watermark
+
+HEADERS = {"X-API-Key": "SECRET123"}
+
+
+def test_partners_match_the_sequential_order():
+    rng = random.Random(11)
+    requests_list = [{"partner_id": f"p{rng.randrange(6)}", "users": [f"u{i}"]} for i in range(60)]
+    requests_list += [{"partner_id": "p0", "users": []}, {"users": ["u0"]}]
+
+    def run(calls):
+        def process_partner(partner_id, entries):
+            for req in entries:
+                time.sleep(rng.random() / 1000)
+                calls.setdefault(partner_id, []).append(req["users"][0])
+            return {"last": entries[-1]["users"][0], "count": len(entries)}
+        return process_partner
+
+    # The old loop: every entry in request order, a partner keeping its last entry's response
+    sequential_calls, expected = {}, {}
+    for req in requests_list:
+        if req.get("partner_id") and req.get("users"):
+            expected[req["partner_id"]] = run(sequential_calls)(req["partner_id"], [req])["last"]
+    calls = {}
+    results = run_by_partner(group_by_partner(requests_list), run(calls))
+    assert calls == sequential_calls
+    assert list(results) == list(expected)
+    assert {partner_id: result["last"] for partner_id, result in results.items()} == expected
+    print(f"✅ {len(results)} partners run in parallel give the sequential per-partner order and results")
+
+
+def test_bulk_endpoint_keeps_each_partners_last_entry():
+    response = app.test_client().post("/bulk_partner_request", json={"requests": [
+        {"partner_id": "bulk-a", "users": ["user1"]},
+        {"partner_id": "bulk-b", "users": ["user2"]},
+        {"partner_id": "bulk-a", "users": ["user2", "user3"]},
+    ]}, headers=HEADERS)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert list(body) == ["bulk-a", "bulk-b"]
+    assert sorted(body["bulk-a"]) == ["user2", "user3"] and list(body["bulk-b"]) == ["user2"]
+    for partner_id, users in body.items():
+        for user_id, result in users.items():
+            if result["status"] == "granted":
+                assert decode_watermark(result["watermark"])["partner"] == partner_id
+    print("✅ /bulk_partner_request answers each partner with its last entry, in request order")
+
+
+def test_stream_heartbeats_while_partners_run():
+    release = threading.Event()
+
+    def slow_partner(partner_id, entries):
+        release.wait(5)
+        return {user: {"ok": True} for req in entries for user in req["users"]}
+
+    job = bulk.bulk_jobs.submit({"slow": [{"users": ["u1"]}]}, slow_partner)
+    heartbeat = app_module.BULK_STREAM_HEARTBEAT
+    app_module.BULK_STREAM_HEARTBEAT = 0.05
+    try:
+        response = app.test_client().get(f"/bulk_jobs/{job.id}/stream", headers=HEADERS, buffered=False)
+        lines = iter(response.response)
+        first = json.loads(next(lines))
+        assert first["heartbeat"]["status"] == "running" and first["heartbeat"]["completed_partners"] == 0
+        release.set()
+        rest = [json.loads(line) for line in lines if b"heartbeat" not in line]
+        assert rest[0] == {"partner_id": "slow", "results": {"u1": {"ok": True}}}
+        assert rest[-1]["progress"]["status"] == "done"
+        response.close()
+    finally:
+        release.set()
+        app_module.BULK_STREAM_HEARTBEAT = heartbeat
+    print("✅ A stream writes heartbeat lines while no partner has finished")
+
+
+def test_finished_jobs_are_capped_by_result_size():
+    limit = bulk.MAX_RETAINED_RESULTS
+    bulk.MAX_RETAINED_RESULTS = 25
+    registry = BulkJobRegistry()
+    try:
+        def per_user(partner_id, entries):
+            return {user: {} for req in entries for user in req["users"]}
+
+        jobs = []
+        for i in range(4):
+            job = registry.submit({f"p{i}": [{"users": [f"u{n}" for n in range(10)]}]}, per_user)
+            # One at a time, so jobs finish in submission order
+            while not job.finished:
+                job.wait_for_results(len(job.results), timeout=5)
+            jobs.append(job)
+        registry._executor.shutdown(wait=True)
+        kept = [job for job in jobs if registry.get(job.id) is not None]
+        # 10 results each: only the newest two fit under 25
+        assert kept == jobs[-2:]
+    finally:
+        bulk.MAX_RETAINED_RESULTS = limit
+    print("✅ Finished jobs are dropped once their results pass MAX_RETAINED_RESULTS")
+
+
+if __name__ == "__main__":
+    test_partners_match_the_sequential_order()
+    test_bulk_endpoint_keeps_each_partners_last_entry()
+    test_stream_heartbeats_while_partners_run()
+    test_finished_jobs_are_capped_by_result_size()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+
+from utils import deception
+from utils.deception import simulate_latency
+
+
+def test_saturated_partner_is_served_without_delay():
+    draw = deception.deception_delay
+    deception.deception_delay = lambda user_count: 0.3
+    try:
+        results = {}
+
+        def request(name, partner_id):
+            results[name] = simulate_latency(partner_id, 1)
+
+        # Fill partner p1's slots
+        threads = [threading.Thread(target=request, args=(f"p1-{i}", "p1")) for i in range(deception.DECEPTION_MAX_DELAYED)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        start = time.monotonic()
+        assert simulate_latency("p1", 1) == 0.0
+        assert time.monotonic() - start < 0.1
+        # Another partner is unaffected by p1's saturation
+        assert simulate_latency("p2", 1) == 0.3
+        for thread in threads:
+            thread.join()
+        assert all(delay == 0.3 for delay in results.values())
+        # Slots are given back once the delays end
+        assert simulate_latency("p1", 1) == 0.3
+        assert not deception._delayed
+    finally:
+        deception.deception_delay = draw
+    print("✅ A partner past DECEPTION_MAX_DELAYED is answered at once, other partners still delayed")
+
+
+def test_saturation_never_refuses_the_request():
+    from app import app
+    from risk_engine import activate_deception_mode
+    activate_deception_mode("deceived-partner")
+    limit = deception.DECEPTION_MAX_DELAYED
+    deception.DECEPTION_MAX_DELAYED = 0
+    try:
+        response = app.test_client().post("/partner_request_data", json={
+            "partner_id": "deceived-partner", "region": "IN", "purpose": "test", "requested_users": ["user1"],
+        }, headers={"X-API-Key": "SECRET123"})
+    finally:
+        deception.DECEPTION_MAX_DELAYED = limit
+    assert response.status_code == 200
+    assert response.get_json()["user1"]["source"] == "synthetic"
+    print("✅ A saturated flagged partner still gets a 200 with synthetic data")
+
+
+if __name__ == "__main__":
+    test_saturated_partner_is_served_without_delay()
+    test_saturation_never_refuses_the_request()
@@ -30,7 +30,7 @@ def test_enhanced_features():
             time.sleep(1)  # Wait for notification processing
             notifications = requests.get(f"{base_url}/user_notifications?user_id=user2")
             if notifications.status_code == 200:
-                user2_notifications = notifications.json()
+                user2_notifications = notifications.json()["items"]
                 print(f"   ✅ User2 notifications: {len(user2_notifications)} found")
                 if user2_notifications:
                     print(f"   📝 Latest notification: {user2_notifications[-1]['message']}")
@@ -124,7 +124,7 @@ def test_enhanced_features():
             time.sleep(1)
             admin_alerts = requests.get(f"{base_url}/alerts/admin")
             if admin_alerts.status_code == 200:
-                alerts = admin_alerts.json()
+                alerts = admin_alerts.json()["items"]
                 print(f"   📢 Admin alerts: {len(alerts)} total alerts")
                 recent_escalations = [a for a in alerts if a.get('type') == 'user_escalation']
                 print(f"   🚨 Recent escalations: {len(recent_escalations)}")
@@ -139,7 +139,7 @@ def test_enhanced_features():
         # Get all notifications to check levels
         all_notifications = requests.get(f"{base_url}/user_notifications")
         if all_notifications.status_code == 200:
-            notifications = all_notifications.json()
+            notifications = all_notifications.json()["items"]
             levels = {}
             for notif in notifications:
                 level = notif.get('level', 'unknown')
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import threading
+
+from storage.event_store import EventStore, MemoryBackend, SQLiteBackend
+
+
+def test_get_during_appends():
+    # get() must never hand back a neighbour's record while appends evict the tail
+    store = EventStore(MemoryBackend(), tail_size=50)
+    log = store.log("notifications")
+    stop = threading.Event()
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            log.append({"user": f"user{i}", "i": i})
+            i += 1
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        for _ in range(2000):
+            last = log.last_seq
+            seqs = [seq for seq in range(max(1, last - 60), last + 1)]
+            for seq, record in zip(seqs, log.get(seqs)):
+                assert record["i"] == seq - 1, (seq, record)
+    finally:
+        stop.set()
+        thread.join()
+        store.close()
+    print("✅ get() is consistent under concurrent appends")
+
+
+def test_workers_never_share_seqs():
+    # Two stores on one database stand in for two worker processes
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.db")
+        stores = [EventStore(SQLiteBackend(path)) for _ in range(2)]
+        logs = [store.log("access_logs") for store in stores]
+        for i in range(1500):
+            for worker, log in enumerate(logs):
+                log.append({"worker": worker, "i": i})
+        for store in stores:
+            store.close()
+        reader = EventStore(SQLiteBackend(path))
+        rows = list(reader.log("access_logs").scan())
+        reader.close()
+        assert len(rows) == 3000, len(rows)
+        assert len({seq for seq, _ in rows}) == 3000
+        print(f"✅ Two writers stored {len(rows)} events without overwriting each other")
+
+
+def test_paging_across_seq_gaps():
+    store = EventStore(MemoryBackend(), tail_size=10)
+    log = store.log("alerts")
+    for i in range(25):
+        log.append({"i": i})
+    # A new block leaves a gap, as after a restart or another worker's block
+    log._reserved = log._seq
+    log.store.backend.reserve("alerts", 500)
+    for i in range(25, 50):
+        log.append({"i": i})
+    seen, cursor = [], 0
+    while True:
+        rows, cursor = log.page(cursor, limit=7)
+        if not rows:
+            break
+        seen.extend(record["i"] for _, record in rows)
+    store.close()
+    assert seen == list(range(50)), seen
+    print("✅ Cursor pages skip seq gaps without losing records")
+
+
+def test_writer_survives_bad_records():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = EventStore(SQLiteBackend(os.path.join(tmp, "events.db")), flush_interval=0.01)
+        log = store.log("decode_log")
+        log.append({"ok": 1})
+        log.append({("tuple", "key"): "not JSON"})
+        log.append({"ok": 2})
+        store.flush()
+        assert store._writer.is_alive()
+        assert [record for _, record in log.scan()] == [{"ok": 1}, {"ok": 2}]
+        store.close()
+    print("✅ An unserializable record is dropped and the writer keeps running")
+
+
+def test_time_range_with_out_of_order_timestamps():
+    # Records are stamped before they are appended, and mix naive and +00:00 times
+    store = EventStore(MemoryBackend(), tail_size=5)
+    log = store.log("user_access_history")
+    stamps = ["2025-01-01T10:00:05", "2025-01-01T10:00:01+00:00", "2025-01-01T10:00:09",
+              "2025-01-01T11:00:03+01:00", "2025-01-01T10:00:07+00:00", "2025-01-01T10:00:02"]
+    for i, ts in enumerate(stamps):
+        log.append({"i": i, "timestamp": ts})
+    rows, _ = log.page(since="2025-01-01T10:00:02", until="2025-01-01T10:00:08+00:00")
+    store.close()
+    assert sorted(record["i"] for _, record in rows) == [0, 3, 4, 5], rows
+    print("✅ since/until filter on each record's timestamp, in any order or offset")
+
+
+def test_indexes_are_shared_and_backfilled():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.db")
+        first = EventStore(SQLiteBackend(path))
+        log = first.log("user_notifications")
+        for i in range(30):
+            log.append({"user": f"user{i % 3}", "level": "threat" if i % 2 else "normal", "i": i})
+        first.flush()
+        # Indexed after the rows were written: the backend backfills them once
+        log.add_index("user")
+        log.add_index("threat_user", key=lambda record: record.get("user") if record.get("level") == "threat" else None)
+        assert [record["i"] for record in log.find("user", "user1")] == list(range(1, 30, 3))
+        assert log.count_where("threat_user", "user1") == 5
+        # A second process sees the first one's appends through the shared index
+        second = EventStore(SQLiteBackend(path))
+        other = second.log("user_notifications")
+        other.add_index("user")
+        log.append({"user": "user1", "i": 30})
+        first.flush()
+        assert [record["i"] for record in other.find("user", "user1")][-1] == 30
+        first.close()
+        second.close()
+    print("✅ Secondary indexes are backfilled once and shared between processes")
+
+
+def test_memory_index_find():
+    store = EventStore(MemoryBackend())
+    log = store.log("trap_logs")
+    log.add_index("partner")
+    for i in range(10):
+        log.append({"partner": f"p{i % 2}", "i": i})
+    assert [record["i"] for record in log.find("partner", "p0")] == [0, 2, 4, 6, 8]
+    assert log.find("partner", "nobody") == []
+    store.close()
+    print("✅ Memory backend index finds records in append order")
+
+
+def test_commit_positions_follow_write_order():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.db")
+        stores = [EventStore(SQLiteBackend(path)) for _ in range(2)]
+        logs = [store.log("risk_events") for store in stores]
+        # Worker 0 draws the lower seqs but commits after worker 1
+        logs[0].append({"worker": 0, "i": 0})
+        for i in range(3):
+            logs[1].append({"worker": 1, "i": i})
+        mark = logs[1].position()
+        stores[0].flush()
+        assert mark == 3 and logs[0].position() == 4
+        rows = list(logs[1].scan_committed())
+        assert [record["worker"] for _, _, record in rows] == [1, 1, 1, 0]
+        assert rows[-1][1] < rows[0][1]
+        assert [(pos, record["worker"]) for pos, _, record in logs[1].scan_committed(mark)] == [(4, 0)]
+        stores[0].save_snapshot("risk_state", {"position": 1})
+        stores[0].save_snapshot("risk_state", {"position": 4})
+        assert stores[1].load_snapshot("risk_state") == {"position": 4}
+        assert stores[1].load_snapshot("nothing") is None
+        for store in stores:
+            store.close()
+    print("✅ Commit positions order rows across workers; snapshots keep only the latest")
+
+
+def test_time_range_pages_seek_the_ts_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in (MemoryBackend(), SQLiteBackend(os.path.join(tmp, "events.db"))):
+            store = EventStore(backend)
+            log = store.log("access_logs")
+            # Two seconds per minute of the hour, appended out of time order
+            for i in range(120):
+                log.append({"i": i, "timestamp": f"2025-01-01T10:{(i * 7) % 60:02d}:{i // 60:02d}"})
+            seen, cursor, pages = [], None, 0
+            while True:
+                rows, cursor = log.page(cursor, since="2025-01-01T10:10:00", until="2025-01-01T10:20:00", limit=7)
+                if not rows:
+                    break
+                pages += 1
+                seen.extend(record["timestamp"] for _, record in rows)
+            assert len(seen) == 20 and seen == sorted(seen) and pages == 3
+            store.close()
+        conn = SQLiteBackend(os.path.join(tmp, "events.db"))._conn
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT ts, seq, body FROM events WHERE log = ? AND (ts, seq) > (?, ?) AND ts < ?"
+            " ORDER BY ts, seq LIMIT ?", ("access_logs", "", 0, "", 1)).fetchall()
+        assert "events_ts" in plan[0][-1] and "TEMP B-TREE" not in str(plan), plan
+    print("✅ Time-range pages follow (timestamp, seq) and seek the ts index")
+
+
+def test_pages_include_other_workers_rows():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.db")
+        first, second = EventStore(SQLiteBackend(path)), EventStore(SQLiteBackend(path))
+        _, cursor = first.log("alerts").latest(10)
+        # Each worker writes from its own seq block
+        first.log("alerts").append({"i": 0})
+        first.flush()
+        second.log("alerts").append({"i": 1})
+        second.flush()
+        first.log("alerts").append({"i": 2})
+        rows, cursor = first.log("alerts").page(cursor)
+        assert [record["i"] for _, record in rows] == [0, 1, 2]
+        second.log("alerts").append({"i": 3})
+        second.flush()
+        rows, cursor = first.log("alerts").page(cursor)
+        assert [record["i"] for _, record in rows] == [3]
+        assert [record["i"] for _, record in first.log("alerts").latest(2)[0]] == [2, 3]
+        first.close()
+        second.close()
+    print("✅ Cursor pages follow commit order, so polls see every worker's rows")
+
+
+if __name__ == "__main__":
+    test_get_during_appends()
+    test_workers_never_share_seqs()
+    test_paging_across_seq_gaps()
+    test_writer_survives_bad_records()
+    test_time_range_with_out_of_order_timestamps()
+    test_indexes_are_shared_and_backfilled()
+    test_memory_index_find()
+    test_commit_positions_follow_write_order()
+    test_time_range_pages_seek_the_ts_index()
+    test_pages_include_other_workers_rows()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+import csv
+import io
+import os
+
+os.environ.setdefault("EVENT_STORE_BACKEND", "memory")
+
+from storage.export import EXPORT_COLUMNS, csv_lines
+from storage.records import HttpAccess, WatermarkGrant
+
+
+def test_csv_keeps_every_record_type():
+    # access_log mixes HTTP requests and watermark grants
+    records = [
+        HttpAccess("10.0.0.1", "GET", "/health", "2025-01-01T00:00:00", 200, "curl"),
+        WatermarkGrant("partner1", "user1", "2025-01-01T00:00:01", "wm1.token"),
+    ]
+    rows = list(csv.DictReader(io.StringIO("".join(csv_lines(records, EXPORT_COLUMNS["access_log"])))))
+    assert rows[0]["endpoint"] == "/health"
+    assert rows[1]["watermark"] == "wm1.token" and rows[1]["partner"] == "partner1"
+    print("✅ Grant rows keep their columns in the access_log CSV")
+
+    rows = list(csv.DictReader(io.StringIO("".join(csv_lines([{"a": 1}, {"a": 2, "b": 3}])))))
+    assert rows[1]["extra"] == '{"b": 3}'
+    print("✅ Keys first seen after the header land in the extra column")
+
+
+def test_endpoint_csv_with_mixed_rows():
+    from app import access_logs, app
+    # An HTTP row first, so a header taken from the first row would lack the grant columns
+    access_logs.append(HttpAccess("10.0.0.1", "GET", "/health", "2099-01-01T00:00:00", 200, "curl"))
+    access_logs.append(WatermarkGrant("partner1", "user1", "2099-01-01T00:00:01", "wm1.token"))
+    response = app.test_client().get("/export/access_log?format=csv&since=2099-01-01T00:00:00",
+                                     headers={"X-API-Key": "SECRET123"})
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row["endpoint"] for row in rows] == ["/health", ""]
+    assert rows[1]["partner"] == "partner1" and rows[1]["user"] == "user1" and rows[1]["watermark"] == "wm1.token"
+    assert "extra" not in rows[1]
+    print("✅ /export/access_log CSV keeps grant columns after an HTTP row")
+
+
+if __name__ == "__main__":
+    test_csv_keeps_every_record_type()
+    test_endpoint_csv_with_mixed_rows()
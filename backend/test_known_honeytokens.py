@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+
+import os
+
+os.environ.setdefault("EVENT_STORE_BACKEND", "memory")
+
+from app import app, register_honeytokens
+
+
+def test_known_honeytokens_cursor():
+    client = app.test_client()
+    headers = {"X-API-Key": "SECRET123"}
+    register_honeytokens([(f"cursor-trap-{i}", "email") for i in range(5)])
+    response = client.get("/known_honeytokens?limit=3", headers=headers)
+    first = response.get_json()
+    print(f"✅ First page: {response.status_code}")
+    # Traps registered between pages must not shift the next page
+    register_honeytokens([(f"cursor-trap-late-{i}", "email") for i in range(3)])
+    cursor = first["next_cursor"]
+    seen = list(first["items"])
+    while True:
+        page = client.get("/known_honeytokens", query_string={"limit": 3, "cursor": cursor}, headers=headers).get_json()
+        seen.extend(page["items"])
+        if not page["has_more"]:
+            break
+        cursor = page["next_cursor"]
+    assert len(seen) == len(set(seen)), seen
+    assert {f"cursor-trap-{i}" for i in range(5)} <= set(seen), seen
+    print(f"📊 Paged {len(seen)} traps without repeats")
+
+    response = client.get("/known_honeytokens?since=yesterday", headers=headers)
+    assert response.status_code == 400
+    print(f"✅ Bad since rejected: {response.status_code}")
+
+
+if __name__ == "__main__":
+    test_known_honeytokens_cursor()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import uuid
+
+os.environ.setdefault("EVENT_STORE_BACKEND", "memory")
+
+from app import app, register_honeytokens
+from honeytokens.scanner import HoneytokenScanner
+from utils import leak_scan
+from watermarking.bloom import BloomFilter
+from watermarking.generator import WATERMARK_MAX_LENGTH, generate_watermark
+
+HEADERS = {"X-API-Key": "SECRET123"}
+
+
+def collect(chunks, scanner, bloom):
+    found = []
+    leak_scan.scan_chunks(chunks, scanner, bloom, found.append)
+    return found
+
+
+def test_overlap_is_not_counted_twice():
+    # One line longer than the carry limit is cut mid-line with an overlap
+    hashes = [f"{i:064x}" for i in range(4000)]
+    line = " ".join(hashes)
+    chunks = list(leak_scan.iter_chunks(io.BytesIO(line.encode()), chunk_size=4096))
+    assert sum(1 for _, skip in chunks if skip) > 1
+    assert "".join(text[skip:] for text, skip in chunks) == line
+    found = collect(chunks, HoneytokenScanner(), BloomFilter(capacity=10))
+    assert sum(hits.candidates for hits in found) == len(hashes)
+    print(f"✅ {len(hashes)} candidates over {len(chunks)} overlapping chunks, each counted once")
+
+
+def test_long_token_on_a_forced_cut():
+    token = generate_watermark("p" * 255, "2025-01-01T00:00:00+00:00", "u" * 255)
+    assert len(token) == WATERMARK_MAX_LENGTH > 256
+    # One line with no break: find where the first forced cut falls, then put the token across it
+    size = 3 * leak_scan.LEAK_SCAN_MAX_CARRY
+    cut = len(next(leak_scan.iter_chunks(io.BytesIO(b"." * size), chunk_size=4096))[0])
+    start = cut - len(token) + 10
+    line = "." * (start - 1) + " " + token + " " + "." * (size - start - len(token) - 1)
+    chunks = list(leak_scan.iter_chunks(io.BytesIO(line.encode()), chunk_size=4096))
+    assert token not in chunks[0][0]
+    found = collect(chunks, HoneytokenScanner(), BloomFilter(capacity=10))
+    keyed = {t: record for hits in found for t, record in hits.keyed.items()}
+    assert keyed[token]["partner"] == "p" * 255
+    print(f"✅ A {len(token)}-char watermark cut by a chunk boundary is still decoded")
+
+
+def test_pool_picks_up_new_honeytokens():
+    first, second = f"trap-{uuid.uuid4().hex}", f"trap-{uuid.uuid4().hex}"
+    scanner = HoneytokenScanner([first])
+    bloom = BloomFilter(capacity=10)
+    dump = "".join(f"row {i} {first} {second}\n" for i in range(2000)).encode()
+    workers = leak_scan.LEAK_SCAN_WORKERS
+    leak_scan.LEAK_SCAN_WORKERS = max(workers, 2)
+    try:
+        found = collect(leak_scan.iter_chunks(io.BytesIO(dump), chunk_size=4096), scanner, bloom)
+        assert len(found) > 2 and set().union(*(hits.traps for hits in found)) == {first}
+        pool = leak_scan._get_pool()
+        scanner.add(second)
+        found = collect(leak_scan.iter_chunks(io.BytesIO(dump), chunk_size=4096), scanner, bloom)
+        assert set().union(*(hits.traps for hits in found)) == {first, second}
+        assert leak_scan._get_pool() is pool
+        assert not any(snapshot.users for snapshot in leak_scan._snapshots.values())
+    finally:
+        leak_scan.LEAK_SCAN_WORKERS = workers
+    print("✅ Shared pool reloads its matchers after a new honeytoken")
+
+
+def test_report_lists_are_capped():
+    traps = [f"trap-{uuid.uuid4().hex}" for _ in range(leak_scan.LEAK_SCAN_EXAMPLES * 3)]
+    register_honeytokens([(trap, "email") for trap in traps])
+    fakes = "".join(f"rcpt_{i:012x}@honeytoken.org\n" for i in range(5000))
+    dump = ("\n".join(traps * 2) + "\n" + fakes).encode()
+    response = app.test_client().post("/leak_scan", data=dump, headers=HEADERS)
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body["unattributed"] == len(traps) and body["matched"] == len(traps)
+    assert len(body["unattributed_traps"]) == leak_scan.LEAK_SCAN_EXAMPLES and body["truncated"]
+    print(f"📊 {body['unattributed']} unattributed traps, {len(body['unattributed_traps'])} listed")
+    print("✅ Report lists are capped and unresolved recipient-format values are dropped")
+
+
+if __name__ == "__main__":
+    test_overlap_is_not_counted_twice()
+    test_long_token_on_a_forced_cut()
+    test_pool_picks_up_new_honeytokens()
+    test_report_lists_are_capped()
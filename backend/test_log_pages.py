@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import os
+
+os.environ.setdefault("EVENT_STORE_BACKEND", "memory")
+
+from app import DEFAULT_PAGE_LIMIT, app, decode_log
+
+HEADERS = {"X-API-Key": "SECRET123"}
+
+
+def test_unpaginated_request_gets_newest_page():
+    for i in range(DEFAULT_PAGE_LIMIT + 5):
+        decode_log.append({"leaked": f"page-{i}", "matched": False, "timestamp": "2098-01-01T00:00:00"})
+    client = app.test_client()
+    body = client.get("/decode_log", headers=HEADERS).get_json()
+    assert len(body["items"]) == DEFAULT_PAGE_LIMIT and not body["has_more"]
+    assert body["items"][-1]["leaked"] == f"page-{DEFAULT_PAGE_LIMIT + 4}"
+    decode_log.append({"leaked": "later", "matched": False, "timestamp": "2098-01-01T00:00:01"})
+    # next_cursor polls for what was written after the page
+    body = client.get(f"/decode_log?cursor={body['next_cursor']}", headers=HEADERS).get_json()
+    assert [record["leaked"] for record in body["items"]] == ["later"]
+    print(f"✅ Without paging args a log endpoint returns the newest {DEFAULT_PAGE_LIMIT} records")
+
+
+def test_time_range_cursor_round_trip():
+    client = app.test_client()
+    seen, cursor = [], ""
+    while True:
+        body = client.get("/decode_log", query_string={"since": "2098-01-01T00:00:01", "limit": 1, "cursor": cursor},
+                          headers=HEADERS).get_json()
+        seen.extend(record["leaked"] for record in body["items"])
+        if not body["has_more"]:
+            break
+        cursor = body["next_cursor"]
+    assert seen == ["later"]
+    assert client.get("/decode_log?since=2098-01-01T00:00:00&cursor=12", headers=HEADERS).status_code == 400
+    print("✅ Time-range pages continue from their opaque cursor; a bad cursor is a 400")
+
+
+if __name__ == "__main__":
+    test_unpaginated_request_gets_newest_page()
+    test_time_range_cursor_round_trip()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import tempfile
+
+os.environ.setdefault("EVENT_STORE_BACKEND", "memory")
+
+from app import app, user_notifications
+from storage import push
+from storage.event_store import EventStore, SQLiteBackend
+from storage.push import PushHub, push_hub
+
+
+def test_stream_delivers_new_events():
+    client = app.test_client()
+    response = client.get("/events/stream-user", buffered=False)
+    assert response.status_code == 200
+    frames = iter(response.response)
+    assert next(frames).startswith(b"retry:")
+    user_notifications.append({"user": "stream-user", "level": "normal", "message": "hello"})
+    frame = next(frames)
+    assert b"event: notification" in frame and b"hello" in frame
+    response.close()
+    print("✅ A new notification is pushed to the user's stream")
+
+
+def test_fetch_then_stream_misses_nothing():
+    client = app.test_client()
+    user_notifications.append({"user": "cursor-user", "message": "listed"})
+    listed = client.get("/user_notifications?user_id=cursor-user").get_json()
+    assert [item["message"] for item in listed["items"]] == ["listed"]
+    # Committed after the fetch but before the stream opens
+    user_notifications.append({"user": "cursor-user", "message": "in between"})
+    response = client.get(f"/events/cursor-user?last_event_id={listed['stream_cursor']}", buffered=False)
+    frames = iter(response.response)
+    next(frames)
+    frame = next(frames).decode()
+    data = json.loads(frame.split("data: ", 1)[1])
+    assert data["message"] == "in between"
+    assert data["event_id"] not in {item["event_id"] for item in listed["items"]}
+    response.close()
+    print("✅ A stream opened from a list's stream_cursor carries what was committed in between")
+
+
+def test_subscriber_cap():
+    client = app.test_client()
+    limit = push.SSE_MAX_SUBSCRIBERS
+    push.SSE_MAX_SUBSCRIBERS = len(push_hub) + 1
+    try:
+        first = client.get("/events/admin", buffered=False)
+        assert first.status_code == 200
+        refused = client.get("/events/admin", buffered=False)
+        assert refused.status_code == 503 and refused.headers["Retry-After"]
+        # Closing a stream, even one never read from, frees its slot
+        first.close()
+        again = client.get("/events/admin", buffered=False)
+        assert again.status_code == 200
+        again.close()
+    finally:
+        push.SSE_MAX_SUBSCRIBERS = limit
+    print("✅ Streams past SSE_MAX_SUBSCRIBERS get 503 until a slot is freed")
+
+
+def test_stream_carries_other_workers_events():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.db")
+        # Two stores on one file stand in for two worker processes
+        serving, writing = EventStore(SQLiteBackend(path)), EventStore(SQLiteBackend(path))
+        hub = PushHub(poll_interval=0.01)
+        hub.attach(serving.log("user_notifications"), "notification", lambda record: [f"user:{record['user']}"])
+        writing.log("user_notifications").append({"user": "u1", "message": "before"})
+        writing.flush()
+        body = hub.stream("user:u1")
+        frames = iter(body)
+        assert next(frames).startswith("retry:")
+        writing.log("user_notifications").append({"user": "u2", "message": "other user"})
+        writing.log("user_notifications").append({"user": "u1", "message": "from the other worker"})
+        writing.flush()
+        frame = next(frames)
+        assert "from the other worker" in frame and frame.startswith("id: user_notifications:3")
+        body.close()
+        # Resuming from the first event id replays what came after it
+        body = hub.stream("user:u1", last_event_id="user_notifications:0")
+        frames = iter(body)
+        next(frames)
+        assert "before" in next(frames) and "from the other worker" in next(frames)
+        body.close()
+        serving.close()
+        writing.close()
+    print("✅ A stream pushes events committed by another worker, in commit order")
+
+
+if __name__ == "__main__":
+    test_stream_delivers_new_events()
+    test_fetch_then_stream_misses_nothing()
+    test_subscriber_cap()
+    test_stream_carries_other_workers_events()
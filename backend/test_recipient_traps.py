@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+
+from honeytokens.recipients import RecipientTrapIndex
+from storage.event_store import EventStore, SQLiteBackend
+
+
+def test_attribution_survives_restart_and_is_shared():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.db")
+        worker = EventStore(SQLiteBackend(path))
+        traps = RecipientTrapIndex(worker.log("recipient_traps"))
+        document = "Contact alice@example.com or bob@example.com"
+        redacted, values = traps.inject(document, "partner1", ["email"])
+        assert len(values) == 2 and all(value in redacted for value in values)
+        assert traps.lookup(values[0])["partner"] == "partner1"
+        print(f"✅ Minted {len(values)} recipient traps")
+
+        # Another worker on the same database resolves them once they are committed
+        worker.flush()
+        other = EventStore(SQLiteBackend(path))
+        shared = RecipientTrapIndex(other.log("recipient_traps"))
+        hits = shared.find(f"leaked: {values[1]} and {values[0]}")
+        assert set(hits) == set(values) and {hit["partner"] for hit in hits.values()} == {"partner1"}
+        assert [hits[value]["occurrence"] for value in values] == [0, 1]
+        print("✅ A second worker attributes the traps")
+        worker.close()
+        other.close()
+
+        # After a restart, with nothing in memory
+        restarted = EventStore(SQLiteBackend(path))
+        fresh = RecipientTrapIndex(restarted.log("recipient_traps"))
+        assert len(fresh) == 0
+        assert fresh.lookup(values[0])["partner"] == "partner1"
+        # Same key in another type's frame is not a hit
+        key = values[0][len("rcpt_"):len("rcpt_") + 12]
+        assert fresh.lookup(f"John {key}") is None
+        assert fresh.lookup("rcpt_000000000000@honeytoken.org") is None
+        restarted.close()
+    print("✅ Attribution survives a restart")
+
+
+if __name__ == "__main__":
+    test_attribution_survives_restart_and_is_shared()
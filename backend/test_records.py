@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import tempfile
+
+os.environ.setdefault("EVENT_STORE_BACKEND", "memory")
+
+from storage.event_store import EventStore, SQLiteBackend
+from storage.records import (FieldAccess, Level, Notification, NotificationType, Source, TrapLog, UserAccess,
+                             json_default)
+
+HEADERS = {"X-API-Key": "SECRET123"}
+
+
+def test_records_read_like_dicts():
+    note = Notification("u1", "p1", NotificationType.HIGH_RISK, Level.THREAT, "2026-01-01T00:00:00", 85)
+    assert note["user"] == "u1" and note.get("partner") == "p1"
+    assert "request_type" not in note and note.get("request_type", "none") == "none"
+    assert note.get("nope") is None and "nope" not in note
+    try:
+        note["request_type"]
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("optional fields left unset must not be readable")
+    assert {**note} == note.to_dict() == {
+        "user": "u1",
+        "partner": "p1",
+        "type": "high_risk",
+        "level": "threat",
+        "timestamp": "2026-01-01T00:00:00",
+        "message": "🚨 THREAT ALERT: Partner p1 accessed your data! Risk score: 85",
+        "risk": 85,
+        "can_escalate": True,
+        "escalation_reason": "High risk partner (85) accessing data",
+    }
+    normal = Notification("u1", "p1", NotificationType.ACCESS, Level.NORMAL, "2026-01-01T00:00:00", 0, "bulk")
+    assert normal["can_escalate"] is False and "escalation_reason" not in normal
+    assert normal["request_type"] == "bulk"
+    print("✅ Records read like the dicts they replace, messages rendered on demand")
+
+
+def test_records_survive_the_event_store():
+    records = [
+        Notification("u1", "p1", NotificationType.TRAP_HIT, Level.THREAT, "2026-01-01T00:00:00", 80),
+        FieldAccess("p1", "u1", "email", "x@example.com", "2026-01-01T00:00:01", Source.SYNTHETIC),
+        UserAccess("p1", "u1", "2026-01-01T00:00:02", "127.0.0.1", False, "test", "IN", "bulk"),
+        TrapLog("p1", "u1", "2026-01-01T00:00:03", "127.0.0.1", "honeytoken", 80),
+    ]
+    expected = [json.loads(json.dumps(record, default=json_default)) for record in records]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.db")
+        store = EventStore(SQLiteBackend(path))
+        for record in records:
+            store.log("records").append(record)
+        store.close()
+        reopened = EventStore(SQLiteBackend(path))
+        assert [record for _, record in reopened.log("records").scan()] == expected
+        reopened.close()
+    print("✅ Records are written and read back as their dict form")
+
+
+def test_endpoints_render_records():
+    from app import app, user_notifications
+    user_notifications.append(Notification("records-user", "p9", NotificationType.MEDIUM_RISK, Level.WARNING,
+                                           "2026-01-01T00:00:00", 55))
+    items = app.test_client().get("/user_notifications?user_id=records-user", headers=HEADERS).get_json()["items"]
+    assert items[-1]["message"] == "⚠️ WARNING: Partner p9 accessed your data. Risk score: 55"
+    assert items[-1]["level"] == "warning" and items[-1]["can_escalate"] is True
+    print("✅ jsonify serializes records with their rendered fields")
+
+
+if __name__ == "__main__":
+    test_records_read_like_dicts()
+    test_records_survive_the_event_store()
+    test_endpoints_render_records()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, UTC
+
+os.environ.setdefault("EVENT_STORE_BACKEND", "memory")
+
+import risk_engine
+from risk_engine import (DECEPTION_RELEASE, HIGH_FREQUENCY_WINDOW, NEW_PARTNER, RISK_HALF_LIVES, _replay,
+                         access_frequency, apply, load_risk_state, recompute, risk_state, take_snapshot,
+                         update_risk_score)
+
+START = datetime(2026, 1, 1, tzinfo=UTC)
+MAX_PAGE_LIMIT = 5000
+
+
+def fold_live(events):
+    """Fold events the way _record does; returns (states, stamped events in fold order)."""
+    states, stamped = {}, []
+    for event in events:
+        state = states.get(event["partner"], NEW_PARTNER)
+        state = states[event["partner"]] = apply(state, event)[0]._replace(version=state.version + 1)
+        stamped.append({**event, "version": state.version})
+    return states, stamped
+
+
+def test_replay_matches_live_in_any_commit_order():
+    rng = random.Random(7)
+    reasons = ["trap", "late_access", "high_frequency", "region_mismatch"]
+    events = [{"partner": f"p{rng.randrange(5)}", "type": "score", "reason": rng.choice(reasons), "user": "u1",
+               "timestamp": (START + timedelta(minutes=i)).isoformat()} for i in range(500)]
+    live, stamped = fold_live(events)
+    # Two workers' group commits interleave, so commit order drifts from fold order
+    committed = sorted(enumerate(stamped), key=lambda row: row[0] + rng.randrange(40))
+    rows = [(seq, event) for seq, (_, event) in enumerate(committed, 1)]
+    replayed = {}
+    assert _replay(rows, replayed) == len(events)
+    assert replayed == live
+    # A snapshot at commit position cut copies every fold done by then: all
+    # events committed up to cut, and some folded but not yet committed
+    cut = len(rows) // 2
+    folded = max(index for index, _ in committed[:cut]) + 10
+    restored, _ = fold_live(events[:folded])
+    _replay(rows[cut:], restored)
+    assert restored == live
+    print(f"✅ {len(events)} events replayed out of commit order match the live fold")
+
+
+def test_restart_from_snapshot():
+    partners = [f"replay-{uuid.uuid4().hex[:8]}" for _ in range(3)]
+    for i in range(30):
+        update_risk_score(partners[i % 3], "high_frequency" if i % 2 else "region_mismatch")
+    assert take_snapshot() is not None
+    for i in range(30):
+        update_risk_score(partners[i % 3], "late_access")
+    live = {partner_id: risk_state.get(partner_id) for partner_id in partners}
+    assert all(state.version == 20 for state in live.values())
+    # Stand in for a restart: forget these partners and load them back
+    for partner_id in partners:
+        risk_state.pop(partner_id)
+    replayed = load_risk_state()
+    assert replayed >= 30
+    assert {partner_id: risk_state.get(partner_id) for partner_id in partners} == live
+    snapshot = risk_engine.get_event_store().load_snapshot(risk_engine.RISK_SNAPSHOT)
+    assert all(partner_id in snapshot["partners"] for partner_id in partners)
+    print(f"📊 Restart replayed {replayed} events after the snapshot")
+    print("✅ Snapshot plus replay restores the live state")
+
+
+def test_scores_decay():
+    half_life = RISK_HALF_LIVES["region_mismatch"]
+    event = {"partner": "decay", "type": "score", "reason": "region_mismatch", "timestamp": START.isoformat()}
+    state = apply(NEW_PARTNER, event)[0]
+    at = START.timestamp()
+    assert state.score_at(at) == 20
+    assert abs(state.score_at(at + half_life) - 10) < 1e-9
+    assert abs(state.score_at(at + 2 * half_life) - 5) < 1e-9
+    assert state.score_at(at + half_life, {**RISK_HALF_LIVES, "region_mismatch": 0}) == 20
+    print("✅ Scores halve every half-life; a half-life of 0 never decays")
+
+
+def test_auto_deception_lapses():
+    event = {"partner": "lapse", "type": "score", "reason": "trap", "timestamp": START.isoformat()}
+    state = apply(NEW_PARTNER, event)[0]
+    at = START.timestamp()
+    assert state.deceiving(at)
+    half_life = RISK_HALF_LIVES["trap"]
+    # 80 decays below the release level after log2(80 / release) half-lives
+    assert state.deceiving(at + 0.3 * half_life) == (80 * 2 ** -0.3 >= DECEPTION_RELEASE)
+    assert not state.deceiving(at + half_life)
+    manual = apply(state, {"partner": "lapse", "type": "deception", "timestamp": START.isoformat()})[0]
+    assert manual.deceiving(at + 10 * half_life)
+    print("✅ Automatic deception lapses with the score; manual deception stays on")
+
+
+def test_access_frequency_reads_the_folded_state():
+    partner_id = f"freq-{uuid.uuid4().hex}"
+    for _ in range(3):
+        update_risk_score(partner_id, "region_mismatch")
+    assert access_frequency(partner_id) == len(risk_state[partner_id].recent) == 3
+    # Whatever worker folded them, accesses older than the window no longer count
+    old = time.time() - HIGH_FREQUENCY_WINDOW - 1
+    risk_state[partner_id] = risk_state[partner_id]._replace(recent=(old, old))
+    assert access_frequency(partner_id) == 0
+    assert access_frequency("never-seen") == 0
+    print("✅ Access frequency is read from the shared risk state")
+
+
+def test_recompute_under_other_half_lives():
+    partner_id = f"recompute-{uuid.uuid4().hex[:8]}"
+    update_risk_score(partner_id, "region_mismatch")
+    states = recompute(half_lives={"region_mismatch": 0})
+    assert states[partner_id].version == risk_state.get(partner_id).version
+    assert states[partner_id].score_at(datetime.now(UTC).timestamp() + 10 ** 9, {**RISK_HALF_LIVES, "region_mismatch": 0}) == 20
+    print("✅ Recompute replays history without touching live state")
+
+
+def test_recompute_endpoint_runs_as_a_job():
+    from app import app
+    client = app.test_client()
+    headers = {"X-API-Key": "SECRET123", "Content-Type": "application/json"}
+    for body in ('{"weights": {"trap": NaN}}', '{"weights": {"trap": Infinity}}',
+                 '{"half_lives": {"trap": 0}}', '{"half_lives": {"trap": -5}}', '{"weights": {"bogus": 1}}'):
+        response = client.post("/admin/risk/recompute", data=body, headers=headers)
+        assert response.status_code == 400, (body, response.status_code)
+    partner_id = f"job-{uuid.uuid4().hex[:8]}"
+    update_risk_score(partner_id, "trap")
+    response = client.post("/admin/risk/recompute", json={"weights": {"trap": 40}}, headers=headers)
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+    deadline = time.monotonic() + 30
+    while True:
+        body = client.get(f"/admin/risk/recompute/{job_id}?limit={MAX_PAGE_LIMIT}", headers=headers).get_json()
+        if body["status"] in ("done", "failed") or time.monotonic() > deadline:
+            break
+        time.sleep(0.01)
+    assert body["status"] == "done", body
+    partners = body["partners"]
+    while body["has_more"]:
+        body = client.get(f"/admin/risk/recompute/{job_id}?cursor={body['next_cursor']}", headers=headers).get_json()
+        partners.update(body["partners"])
+    assert partners[partner_id]["score"] <= 40 and partners[partner_id]["current_score"] > 40
+    assert client.get("/admin/risk/recompute/nope", headers=headers).status_code == 404
+    print("✅ Recompute rejects non-finite weights and non-positive half-lives and runs as a job")
+
+
+if __name__ == "__main__":
+    test_replay_matches_live_in_any_commit_order()
+    test_restart_from_snapshot()
+    test_scores_decay()
+    test_auto_deception_lapses()
+    test_access_frequency_reads_the_folded_state()
+    test_recompute_under_other_half_lives()
+    test_recompute_endpoint_runs_as_a_job()
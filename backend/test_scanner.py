@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import random
+import string
+import threading
+
+from honeytokens.scanner import HoneytokenScanner, payload_text
+
+
+def _naive(patterns, text):
+    return {pattern for pattern in patterns if pattern in text}
+
+
+def test_scanner_matches_substring_search():
+    rng = random.Random(7)
+    # A small alphabet forces overlapping patterns and long failure chains
+    patterns = {"".join(rng.choice("abc") for _ in range(rng.randint(1, 6))) for _ in range(300)}
+    scanner = HoneytokenScanner(list(patterns)[:100])
+    for pattern in list(patterns)[100:]:
+        scanner.add(pattern)
+        if rng.random() < 0.1:
+            scanner.scan("warm up")  # publish part way through, leaving several levels
+    for _ in range(200):
+        text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 80)))
+        assert scanner.scan(text) == _naive(patterns, text), text
+    print(f"✅ Scanner agrees with substring search over {len(patterns)} overlapping patterns")
+
+
+def test_scan_while_adding():
+    scanner = HoneytokenScanner(["seed-trap"])
+    errors = []
+    added = []
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            try:
+                expected = list(added)  # every trap added before this scan started
+                text = "\x00".join(expected[-20:])
+                missing = set(expected[-20:]) - scanner.scan(text)
+                if missing:
+                    errors.append(f"missed {sorted(missing)[:3]}")
+            except Exception as e:
+                errors.append(repr(e))
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    rng = random.Random(3)
+    for i in range(3000):
+        value = f"trap-{i}-" + "".join(rng.choice(string.ascii_lowercase) for _ in range(8))
+        scanner.add(value)
+        added.append(value)
+    done.set()
+    for thread in readers:
+        thread.join()
+    assert not errors, errors[:5]
+    assert len(scanner) == 3001
+    print("✅ Concurrent scans never fail or miss a trap added before them")
+
+
+def test_payload_fields_do_not_join():
+    scanner = HoneytokenScanner(["ab"])
+    assert scanner.scan(payload_text({"x": "a", "y": ["b"]})) == set()
+    assert scanner.scan(payload_text({"x": {"y": "xaby"}})) == {"ab"}
+    print("✅ Matches never span two payload fields")
+
+
+if __name__ == "__main__":
+    test_scanner_matches_substring_search()
+    test_scan_while_adding()
+    test_payload_fields_do_not_join()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import os
+import threading
+import uuid
+
+os.environ.setdefault("EVENT_STORE_BACKEND", "memory")
+
+from risk_engine import restrict_partner, restricted_for_user, restricted_users, risk_state, update_risk_score
+from utils.state import ShardedLocks
+
+HEADERS = {"X-API-Key": "SECRET123"}
+
+
+def run_threads(count, target):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_sharded_locks():
+    locks = ShardedLocks(shards=8)
+    assert locks("p1") is locks("p1")
+    assert len({id(locks(f"p{i}")) for i in range(100)}) == 8
+    with locks("p1"):
+        with locks("p1"):  # re-entrant: nested helpers may take the same lock
+            pass
+    print("✅ A key always maps to the same re-entrant lock")
+
+
+def test_concurrent_updates_are_not_lost():
+    partners = [f"locks-{uuid.uuid4().hex}" for _ in range(4)]
+    per_thread = 25
+
+    def hammer(i):
+        for _ in range(per_thread):
+            update_risk_score(partners[i % len(partners)], "trap", f"user{i}")
+
+    run_threads(16, hammer)
+    for partner_id in partners:
+        state = risk_state[partner_id]
+        assert state.version == state.trap_hits == 4 * per_thread
+    print("✅ 16 threads updating 4 partners lose no risk updates")
+
+
+def test_concurrent_restrictions_are_not_lost():
+    partner_id = f"locks-{uuid.uuid4().hex}"
+    users = [f"locks-user-{uuid.uuid4().hex}" for _ in range(40)]
+    run_threads(len(users), lambda i: restrict_partner(partner_id, users[i]))
+    assert sorted(restricted_users(partner_id)) == sorted(users)
+    assert all(restricted_for_user(user_id) == [partner_id] for user_id in users)
+    print("✅ Concurrent restrictions all land in both restriction indexes")
+
+
+def test_concurrent_consent_updates_merge():
+    from app import app, consent_cache, consent_state
+    user_id = f"locks-user-{uuid.uuid4().hex}"
+    consent_state[user_id] = {"policy": True}
+    client = app.test_client()
+    run_threads(8, lambda i: client.post(f"/update_consent/{user_id}", json={f"field{i}": i}, headers=HEADERS))
+    assert consent_state[user_id] == {"policy": True, **{f"field{i}": i for i in range(8)}}
+    assert consent_cache.get(user_id)[0] is None
+    client.post(f"/update_consent/{user_id}", json={"policy": False}, headers=HEADERS)
+    assert consent_cache.get(user_id)[0]["reason"] == "Consent revoked for policy"
+    print("✅ Concurrent consent updates merge, and the cached decision follows them")
+
+
+if __name__ == "__main__":
+    test_sharded_locks()
+    test_concurrent_updates_are_not_lost()
+    test_concurrent_restrictions_are_not_lost()
+    test_concurrent_consent_updates_merge()
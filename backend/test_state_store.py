@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import threading
+import time
+
+from storage.state_store import MemoryStateStore, SQLiteStateStore
+
+
+def test_mutate_is_atomic_across_workers():
+    # Two stores on one file stand in for two worker processes
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.db")
+        stores = [SQLiteStateStore(path) for _ in range(2)]
+        counters = [store.map("trap_hits") for store in stores]
+
+        def bump(counter):
+            for _ in range(200):
+                counter.mutate("partner1", lambda hits: hits + 1, 0)
+
+        threads = [threading.Thread(target=bump, args=(counter,)) for counter in counters for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert [counter.get("partner1") for counter in counters] == [800, 800]
+        for store in stores:
+            store.close()
+    print("✅ 800 concurrent increments from two workers, none lost")
+
+
+def test_other_workers_writes_reach_subscribers():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.db")
+        first, second = SQLiteStateStore(path, refresh_interval=0), SQLiteStateStore(path, refresh_interval=0)
+        seen = []
+        second.map("consent_state").subscribe(lambda key, old, new: seen.append((key, old, new)), replay=False)
+        first.map("consent_state")["user1"] = {"expiry_date": "2099-01-01"}
+        first.map("consent_state").pop("user1")
+        assert "user1" not in second.map("consent_state")
+        # Set and removed before this worker looked: nothing changed from its point of view
+        assert seen == []
+        first.map("consent_state")["user2"] = {"expiry_date": "2099-01-01"}
+        assert second.map("consent_state").get("user2") == {"expiry_date": "2099-01-01"}
+        assert seen[-1] == ("user2", None, {"expiry_date": "2099-01-01"})
+        first.close()
+        second.close()
+    print("✅ A worker sees, and notifies subscribers of, another worker's writes")
+
+
+def test_reads_do_not_wait_on_the_store():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.db")
+        first, second = SQLiteStateStore(path), SQLiteStateStore(path, refresh_interval=0.05)
+        flags = second.map("deception_state")
+        first.map("deception_state")["p1"] = True
+        # Served from the cache until the refresh interval has passed
+        time.sleep(0.06)
+        assert flags.get("p1") is True
+        first.map("deception_state")["p2"] = True
+        # A writer holding the store lock does not block readers; they get the cache
+        held, release = threading.Event(), threading.Event()
+
+        def hold():
+            with second._lock:
+                held.set()
+                release.wait()
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        held.wait()
+        time.sleep(0.06)
+        start = time.monotonic()
+        assert flags.get("p1") is True and flags.get("p2") is None
+        assert time.monotonic() - start < 0.05
+        release.set()
+        holder.join()
+        assert flags.get("p2") is True
+        first.close()
+        second.close()
+    print("✅ Reads refresh at most every refresh_interval and never wait for the store lock")
+
+
+def test_merge_keeps_newer_values():
+    with tempfile.TemporaryDirectory() as tmp:
+        for store in (MemoryStateStore(), SQLiteStateStore(os.path.join(tmp, "state.db"))):
+            versions = store.map("risk_state")
+            versions.update({"p1": 5, "p2": 1})
+            versions.merge({"p1": 3, "p2": 4, "p3": 1}, lambda new, current: current is None or new > current)
+            assert versions.snapshot() == {"p1": 5, "p2": 4, "p3": 1}
+            store.close()
+    print("✅ merge() only replaces entries with newer values")
+
+
+if __name__ == "__main__":
+    test_mutate_is_atomic_across_workers()
+    test_other_workers_writes_reach_subscribers()
+    test_reads_do_not_wait_on_the_store()
+    test_merge_keeps_newer_values()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+
+from storage.event_store import EventStore, SQLiteBackend
+from storage.summaries import ActivitySummaries
+from watermarking.index import WatermarkIndex
+
+LOGS = ("user_access_history", "trap_logs", "detailed_access_log", "user_notifications")
+
+
+def attach(store):
+    summaries = ActivitySummaries()
+    summaries.attach(store, *(store.log(name) for name in LOGS))
+    return summaries
+
+
+def test_summaries_are_shared_and_resume_from_snapshot():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.db")
+        stores = [EventStore(SQLiteBackend(path)) for _ in range(2)]
+        workers = [attach(store) for store in stores]
+        for i in range(10):
+            store = stores[i % 2]
+            store.log("user_access_history").append({"partner": "p1", "user": "u1", "timestamp": f"2026-01-01T00:00:{i:02d}"})
+            store.log("user_notifications").append({"user": "u1", "level": "threat" if i % 2 else "normal"})
+        stores[1].log("trap_logs").append({"partner": "p1"})
+        for store in stores:
+            store.flush()
+        # Each worker reports both workers' rows
+        for summaries in workers:
+            summaries.refresh()
+            assert summaries.partners["p1"].access_attempts == 10 and summaries.partners["p1"].trap_hits == 1
+            assert summaries.user("u1").threat_notifications == 5
+            assert summaries.user("u1").last_access == "2026-01-01T00:00:09"
+        workers[0].save()
+        stores[1].log("trap_logs").append({"partner": "p1"})
+        for store in stores:
+            store.close()
+        # A restart resumes from the snapshot and folds only the row after it
+        store = EventStore(SQLiteBackend(path))
+        restarted = ActivitySummaries()
+        folded = []
+        restarted.on_trap = lambda seq, record: (folded.append(seq), ActivitySummaries.on_trap(restarted, seq, record))
+        restarted.attach(store, *(store.log(name) for name in LOGS))
+        assert len(folded) == 1 and restarted.partners["p1"].trap_hits == 2
+        assert restarted.partners["p1"].access_attempts == 10
+        store.close()
+    print("✅ Summaries count every worker's rows and resume from their snapshot")
+
+
+def test_watermark_index_is_shared():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.db")
+        first, second = EventStore(SQLiteBackend(path)), EventStore(SQLiteBackend(path))
+        # Every worker registers the index, as app.py does
+        WatermarkIndex(first.log("access_logs"))
+        index = WatermarkIndex(second.log("access_logs"))
+        legacy = "ab" * 32
+        first.log("access_logs").append({"partner": "p1", "user": "u1", "timestamp": "2026-01-01T00:00:00",
+                                         "watermark": legacy})
+        first.log("access_logs").append({"partner": "p1", "user": "u2", "timestamp": "2026-01-01T00:00:01",
+                                         "watermark": "wm2.not-indexed"})
+        first.flush()
+        assert index.lookup(legacy) == {"partner": "p1", "user": "u1", "timestamp": "2026-01-01T00:00:00"}
+        assert legacy in index and "wm2.not-indexed" not in index
+        assert len(index) == 1 and list(index.values()) == [legacy]
+        first.close()
+        second.close()
+    print("✅ Legacy watermarks written by one worker resolve in another, keyed ones are not indexed")
+
+
+if __name__ == "__main__":
+    test_summaries_are_shared_and_resume_from_snapshot()
+    test_watermark_index_is_shared()
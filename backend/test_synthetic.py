@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+import os
+
+os.environ.setdefault("EVENT_STORE_BACKEND", "memory")
+
+from utils import deception
+from utils.synthetic import FIELDS, SyntheticPool
+
+
+def test_same_pair_same_record():
+    # Two pools built from the same seed stand in for two restarts
+    first, second = SyntheticPool(table_size=256, chunk_size=64), SyntheticPool(table_size=256, chunk_size=64)
+    pairs = [(f"partner{p}", f"user{u}") for p in range(3) for u in range(5)]
+    records = [first.record_for(*pair) for pair in pairs]
+    assert records == [second.record_for(*pair) for pair in pairs]
+    assert records == [first.record_for(*pair) for pair in pairs]
+    # Different pairs get different records
+    assert len({record["record_id"] for record in records}) == len(pairs)
+    assert len({tuple(record[field] for field in FIELDS) for record in records}) == len(pairs)
+    print(f"✅ {len(pairs)} (partner, user) pairs each get one stable synthetic record")
+
+
+def test_deceived_partner_sees_stable_records():
+    from app import app
+    from risk_engine import activate_deception_mode
+    draw = deception.deception_delay
+    deception.deception_delay = lambda user_count: 0.0
+    try:
+        client = app.test_client()
+
+        def fetch(partner_id):
+            activate_deception_mode(partner_id)
+            response = client.post("/partner_request_data", json={
+                "partner_id": partner_id, "region": "IN", "purpose": "test", "requested_users": ["user1", "user2"],
+            }, headers={"X-API-Key": "SECRET123"})
+            assert response.status_code == 200
+            return response.get_json()
+
+        once, again, other = fetch("synthetic-a"), fetch("synthetic-a"), fetch("synthetic-b")
+    finally:
+        deception.deception_delay = draw
+    assert once == again
+    assert once["user1"]["source"] == "synthetic" and once["user1"] != once["user2"]
+    assert other["user1"]["record_id"] != once["user1"]["record_id"]
+    print("✅ A deceived partner gets the same fake record for a user on every request")
+
+
+if __name__ == "__main__":
+    test_same_pair_same_record()
+    test_deceived_partner_sees_stable_records()
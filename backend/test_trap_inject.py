@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+import os
+
+os.environ.setdefault("EVENT_STORE_BACKEND", "memory")
+
+from app import app
+from honeytokens import injector
+
+
+def test_trap_types_must_be_strings():
+    client = app.test_client()
+    headers = {"X-API-Key": "SECRET123"}
+    bad = [{"documents": ["a@b.com"], "trap_types": [["email"]]},
+           {"documents": ["a@b.com"], "trap_types": [{"t": 1}]},
+           {"documents": ["a@b.com"], "trap_types": "email"}]
+    for body in bad:
+        response = client.post("/trap_inject/batch", json=body, headers=headers)
+        assert response.status_code == 400, (body, response.status_code)
+    response = client.post("/trap_inject", json={"document": "a@b.com", "trap_type": ["email"]}, headers=headers)
+    assert response.status_code == 400
+    print("✅ Unhashable trap types are rejected with 400")
+
+
+def test_batch_uses_worker_pool():
+    documents = [f"contact user{i}@example.com or 555 123 {i:04d}" for i in range(injector.INJECT_INLINE_MAX * 4)]
+    workers = injector.INJECT_WORKERS
+    injector.INJECT_WORKERS = max(workers, 2)
+    try:
+        injected = injector.inject_batch(documents, ["email"])
+    finally:
+        injector.INJECT_WORKERS = workers
+    assert len(injected) == len(documents)
+    assert all("@example.com" not in redacted for redacted, _ in injected)
+    print(f"✅ Pool redacted {len(injected)} documents")
+
+
+if __name__ == "__main__":
+    test_trap_types_must_be_strings()
+    test_batch_uses_worker_pool()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import base64
+import importlib
+import multiprocessing
+import os
+import tempfile
+
+import watermarking.generator as generator
+
+
+def _reload(**env):
+    saved = {key: os.environ.get(key) for key in env}
+    os.environ.update({key: value for key, value in env.items() if value is not None})
+    for key, value in env.items():
+        if value is None:
+            os.environ.pop(key, None)
+    try:
+        return importlib.reload(generator)
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def test_round_trip_and_tamper():
+    gen = _reload(WATERMARK_KEY="test-key", WATERMARK_KEY_EPOCH="3", WATERMARK_RETIRED_KEYS=None)
+    token = gen.generate_watermark("partner1", "2025-01-01T10:00:00+05:30", "user1")
+    assert token.startswith("wm2.")
+    assert gen.decode_watermark(token) == {"partner": "partner1", "user": "user1",
+                                           "timestamp": "2025-01-01T04:30:00+00:00"}
+    raw = bytearray(base64.urlsafe_b64decode(token[4:] + "=" * (-len(token[4:]) % 4)))
+    for i in (0, 1, len(raw) // 2, len(raw) - 1):
+        forged = bytearray(raw)
+        forged[i] ^= 1
+        forged = "wm2." + base64.urlsafe_b64encode(bytes(forged)).rstrip(b"=").decode()
+        assert gen.decode_watermark(forged) is None, i
+    assert gen.decode_watermark(token[:-4]) is None
+    assert gen.decode_watermark("wm2.") is None
+    print("✅ Keyed watermark round-trips; flipped bits and truncation are rejected")
+
+
+def test_rotation_keeps_old_tokens():
+    old = _reload(WATERMARK_KEY="old-key", WATERMARK_KEY_EPOCH="0", WATERMARK_RETIRED_KEYS=None)
+    token = old.generate_watermark("partner1", "2025-01-01T00:00:00", "user1")
+    new = _reload(WATERMARK_KEY="new-key", WATERMARK_KEY_EPOCH="1", WATERMARK_RETIRED_KEYS="0:old-key")
+    assert new.decode_watermark(token)["partner"] == "partner1"
+    assert new.decode_watermark(new.generate_watermark("p2", "2025-01-01T00:00:00", "u2"))["partner"] == "p2"
+    dropped = _reload(WATERMARK_KEY="new-key", WATERMARK_KEY_EPOCH="1", WATERMARK_RETIRED_KEYS=None)
+    assert dropped.decode_watermark(token) is None
+    print("✅ Tokens sealed before a key rotation still decode while the old key is retired, not removed")
+
+
+def _worker_key(path, queue):
+    os.environ.pop("WATERMARK_KEY", None)
+    os.environ["WATERMARK_KEY_FILE"] = path
+    gen = importlib.reload(generator)
+    queue.put(gen._load_key())
+
+
+def test_key_file_race_and_empty_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "watermark.key")
+        queue = multiprocessing.get_context("fork").Queue()
+        workers = [multiprocessing.get_context("fork").Process(target=_worker_key, args=(path, queue)) for _ in range(8)]
+        for worker in workers:
+            worker.start()
+        keys = {queue.get(timeout=30) for _ in workers}
+        for worker in workers:
+            worker.join()
+        assert len(keys) == 1 and b"" not in keys, keys
+        print("✅ Workers racing to create the key file all read the same non-empty key")
+
+        open(path, "w").close()
+        gen = _reload(WATERMARK_KEY=None, WATERMARK_KEY_FILE=path)
+        try:
+            gen.generate_watermark("p", "2025-01-01T00:00:00", "u")
+            raise AssertionError("signed with an empty key")
+        except RuntimeError:
+            pass
+        print("✅ An empty key file is refused")
+    _reload()
+
+
+if __name__ == "__main__":
+    test_round_trip_and_tamper()
+    test_rotation_keeps_old_tokens()
+    test_key_file_race_and_empty_file()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+import requests
+import json
+
+def test_watermark_verify():
+    base_url = "http://localhost:5000"
+    headers = {"X-API-Key": "SECRET123"}
+
+    # Mint a watermark through a normal partner request
+    try:
+        partner_request = {
+            "partner_id": "partner1",
+            "region": "IN",
+            "requested_users": ["user1", "user2"],
+            "purpose": "watermark_trace_test"
+        }
+        response = requests.post(f"{base_url}/partner_request_data", json=partner_request, headers=headers)
+        print(f"✅ Partner request: {response.status_code}")
+        watermarks = [r["watermark"] for r in response.json().values() if r.get("watermark")]
+        print(f"📊 Minted {len(watermarks)} watermarks")
+    except Exception as e:
+        print(f"❌ Partner request failed: {e}")
+        return
+
+    # Single lookup
+    try:
+        for watermark in watermarks[:1]:
+            response = requests.post(f"{base_url}/verify_watermark", json={"watermark": watermark})
+            print(f"✅ Verify watermark: {response.status_code} {response.json()}")
+    except Exception as e:
+        print(f"❌ Verify watermark failed: {e}")
+
+    # Batch lookup with one unknown hash mixed in
+    try:
+        batch = watermarks + ["0" * 64]
+        response = requests.post(f"{base_url}/verify_watermarks", json={"watermarks": batch})
+        print(f"✅ Batch verify: {response.status_code}")
+        if response.status_code == 200:
+            data = response.json()
+            print(f"📊 Checked {data['checked']}, matched {data['matched']}")
+        else:
+            print(f"❌ Error: {response.text}")
+    except Exception as e:
+        print(f"❌ Batch verify failed: {e}")
+
+if __name__ == "__main__":
+    test_watermark_verify()
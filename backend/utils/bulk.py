@@ -0,0 +1,189 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, UTC
+from uuid import uuid4
+
+# Worker threads shared by every bulk request
+BULK_WORKERS = int(os.environ.get("BULK_WORKERS", str(min(8, (os.cpu_count() or 1) + 4))))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=BULK_WORKERS, thread_name_prefix="bulk")
+    return _executor
+
+
+def group_by_partner(requests_list):
+    """
+    Group bulk entries by partner_id, keeping both partner order and each
+    partner's entry order. Entries without a partner or users are dropped.
+    """
+    groups = {}
+    for req in requests_list:
+        partner_id = req.get('partner_id')
+        if not partner_id or not req.get('users'):
+            continue
+        groups.setdefault(partner_id, []).append(req)
+    return groups
+
+
+def run_by_partner(groups, process_partner, on_result=None):
+    """
+    Run process_partner(partner_id, entries) for every group. Different
+    partners run in parallel; one partner's entries always run in order on
+    a single worker, so its risk updates happen in the sequential order.
+    on_result(partner_id, result) is called as each partner finishes.
+    Returns {partner_id: result} in group order.
+    """
+    if len(groups) <= 1:
+        results = {}
+        for partner_id, entries in groups.items():
+            results[partner_id] = process_partner(partner_id, entries)
+            if on_result:
+                on_result(partner_id, results[partner_id])
+        return results
+    executor = _get_executor()
+    futures = {executor.submit(process_partner, partner_id, entries): partner_id
+               for partner_id, entries in groups.items()}
+    done = {}
+    for future in as_completed(futures):
+        partner_id = futures[future]
+        done[partner_id] = future.result()
+        if on_result:
+            on_result(partner_id, done[partner_id])
+    return {partner_id: done[partner_id] for partner_id in groups}
+
+
+# --- Asynchronous bulk jobs ---
+# Jobs run on their own small pool so a job waiting on partner tasks never
+# occupies a slot the partner tasks need
+JOB_WORKERS = int(os.environ.get("BULK_JOB_WORKERS", "2"))
+# Finished jobs are kept for polling until either cap is passed, oldest dropped first:
+# the number of jobs, and the per-user results they hold between them
+MAX_RETAINED_JOBS = int(os.environ.get("BULK_MAX_RETAINED_JOBS", "100"))
+MAX_RETAINED_RESULTS = int(os.environ.get("BULK_MAX_RETAINED_RESULTS", "100000"))
+# Seconds a result stream waits for a partner to finish before writing a heartbeat line
+BULK_STREAM_HEARTBEAT = float(os.environ.get("BULK_STREAM_HEARTBEAT", "15"))
+
+
+class BulkJob:
+    """One submitted bulk request; results accumulate per partner as they finish."""
+
+    def __init__(self, groups):
+        self.id = uuid4().hex
+        self.status = "queued"
+        self.error = None
+        self.created_at = datetime.now(UTC).isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.total_partners = len(groups)
+        self.total_users = sum(len(req.get('users', [])) for entries in groups.values() for req in entries)
+        self.processed_users = 0
+        self.results = []  # [(partner_id, response)] in completion order
+        self.result_count = 0  # per-user results held in self.results
+        self._groups = groups
+        self._changed = threading.Condition()
+
+    def _add_result(self, partner_id, response):
+        with self._changed:
+            self.results.append((partner_id, response))
+            self.result_count += len(response) if isinstance(response, (dict, list)) else 1
+            self.processed_users += sum(len(req.get('users', [])) for req in self._groups[partner_id])
+            self._changed.notify_all()
+
+    def _finish(self, status, error=None):
+        with self._changed:
+            self.status = status
+            self.error = error
+            self.finished_at = datetime.now(UTC).isoformat()
+            self._groups = None
+            self._changed.notify_all()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def progress(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "total_partners": self.total_partners,
+            "completed_partners": len(self.results),
+            "total_users": self.total_users,
+            "processed_users": self.processed_users,
+        }
+
+    def results_page(self, cursor=0, limit=50):
+        """Partner results after `cursor` (a count of results already read)."""
+        page = self.results[cursor:cursor + limit]
+        return [{"partner_id": partner_id, "results": response} for partner_id, response in page], cursor + len(page)
+
+    def wait_for_results(self, cursor, timeout):
+        """
+        Block until there are results past cursor, the job finishes, or
+        timeout elapses. Returns False when it timed out with nothing new.
+        """
+        with self._changed:
+            if len(self.results) <= cursor and not self.finished:
+                self._changed.wait(timeout)
+            return len(self.results) > cursor or self.finished
+
+
+class BulkJobRegistry:
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def submit(self, groups, process_partner):
+        job = BulkJob(groups)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="bulk-job")
+            self._jobs[job.id] = job
+            self._evict()
+        self._executor.submit(self._run, job, process_partner)
+        return job
+
+    def _run(self, job, process_partner):
+        job.status = "running"
+        job.started_at = datetime.now(UTC).isoformat()
+        try:
+            run_by_partner(job._groups, process_partner, job._add_result)
+        except Exception as e:
+            job._finish("failed", str(e))
+        else:
+            job._finish("done")
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        # Drop the oldest finished jobs while more than MAX_RETAINED_JOBS are
+        # held or their results add up to more than MAX_RETAINED_RESULTS.
+        # Running jobs are never dropped; they count once finished.
+        jobs = len(self._jobs)
+        results = sum(job.result_count for job in self._jobs.values())
+        for job_id, job in list(self._jobs.items()):
+            if jobs <= MAX_RETAINED_JOBS and results <= MAX_RETAINED_RESULTS:
+                return
+            if job.finished:
+                del self._jobs[job_id]
+                jobs -= 1
+                results -= job.result_count
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+
+bulk_jobs = BulkJobRegistry()
@@ -0,0 +1,66 @@
+import math
+import os
+import random
+import threading
+from time import sleep
+
+# Simulated latency for synthetic (deception mode) responses.
+# The old per-user sleep(randint(1, 2)) held a worker for up to 2s per user;
+# now each request draws one delay that grows with the users requested,
+# approaches MAX_REQUEST_DELAY without ever reaching it, and is jittered, so
+# neither a constant ceiling nor a zero delay gives deception mode away.
+DELAY_PER_USER = (1.0, 2.0)  # seconds
+MAX_REQUEST_DELAY = 2.0  # seconds, per request
+DELAY_JITTER = (0.6, 1.0)  # fraction of the curve's value actually slept
+# Requests one partner may have sitting in a simulated delay at once, and
+# the limit over all partners, which bounds the threads delays can hold.
+# Past either, the response is served without a delay, as a real one is.
+DECEPTION_MAX_DELAYED = int(os.environ.get("DECEPTION_MAX_DELAYED", "2"))
+DECEPTION_MAX_DELAYED_TOTAL = int(os.environ.get("DECEPTION_MAX_DELAYED_TOTAL", "16"))
+
+_delayed = {}  # partner_id: requests currently delayed
+_delayed_lock = threading.Lock()
+
+
+def deception_delay(user_count):
+    """Return the simulated latency (seconds) for a synthetic response covering user_count users."""
+    if user_count <= 0:
+        return 0.0
+    low, high = DELAY_PER_USER
+    linear = random.uniform(low, high) * user_count
+    # Saturating curve: ~linear for one or two users, bounded for many
+    curve = MAX_REQUEST_DELAY * (1 - math.exp(-linear / MAX_REQUEST_DELAY))
+    return curve * random.uniform(*DELAY_JITTER)
+
+
+def _take_slot(partner_id):
+    with _delayed_lock:
+        if _delayed.get(partner_id, 0) >= DECEPTION_MAX_DELAYED or sum(_delayed.values()) >= DECEPTION_MAX_DELAYED_TOTAL:
+            return False
+        _delayed[partner_id] = _delayed.get(partner_id, 0) + 1
+        return True
+
+
+def _release_slot(partner_id):
+    with _delayed_lock:
+        if _delayed[partner_id] == 1:
+            del _delayed[partner_id]
+        else:
+            _delayed[partner_id] -= 1
+
+
+def simulate_latency(partner_id, user_count):
+    """
+    Apply the deception delay once for the whole request and return it.
+    When partner_id already has DECEPTION_MAX_DELAYED requests delayed, or
+    DECEPTION_MAX_DELAYED_TOTAL are delayed overall, returns 0.0 at once:
+    the request is answered like any other, never refused.
+    """
+    if not _take_slot(partner_id):
+        return 0.0
+    try:
+        delay = deception_delay(user_count)
+        sleep(delay)
+        return delay
+    finally:
+        _release_slot(partner_id)
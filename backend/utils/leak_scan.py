@@ -0,0 +1,301 @@
+import atexit
+import codecs
+import json
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from honeytokens.recipients import RECIPIENT_TRAP_PATTERN
+from honeytokens.scanner import HoneytokenScanner
+from utils.pools import pool_context
+from watermarking.bloom import BloomFilter
+from watermarking.generator import LEGACY_WATERMARK_PATTERN, WATERMARK_MAX_LENGTH, WATERMARK_PATTERN, decode_watermark
+
+# Worker processes shared by every scan; a dump that fits in one chunk is scanned in-process
+LEAK_SCAN_WORKERS = int(os.environ.get("LEAK_SCAN_WORKERS", str(os.cpu_count() or 1)))
+# Bytes read from the upload per chunk
+LEAK_SCAN_CHUNK = int(os.environ.get("LEAK_SCAN_CHUNK", str(1024 * 1024)))
+# Chunks queued or running at once; the reader waits beyond this, so memory
+# stays at about (in flight + 1) chunks however large the dump is
+LEAK_SCAN_IN_FLIGHT = int(os.environ.get("LEAK_SCAN_IN_FLIGHT", str(2 * LEAK_SCAN_WORKERS)))
+# Chunks are cut at the last line break. A line longer than this is cut
+# anyway, repeating the last LEAK_SCAN_OVERLAP characters so a value on the
+# cut is still seen whole in the next chunk; that takes the longest keyed
+# watermark (two 255-byte ids) as well as the shorter hashes and traps.
+LEAK_SCAN_MAX_CARRY = 64 * 1024
+LEAK_SCAN_OVERLAP = max(256, WATERMARK_MAX_LENGTH)
+# Matched values listed per partner, and unattributed traps listed, in a report (counts cover all of them)
+LEAK_SCAN_EXAMPLES = 10
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Matchers reach the pool as snapshot files, one per kind, rewritten only
+# when the set behind them changes. Workers load each file once and keep it
+# until a task names a newer one, so the automaton is never rebuilt per scan.
+_snapshots = {}  # kind: current _Snapshot
+_snapshot_lock = threading.Lock()
+
+# Per-worker cache: kind: (snapshot path, matcher)
+_matchers = {}
+
+
+class ChunkHits:
+    """Candidates found in one chunk. Sets, so a value repeated in the chunk is listed once."""
+
+    def __init__(self):
+        self.legacy = set()  # 64-hex values the bloom filter may have issued
+        self.keyed = {}  # keyed watermark: decoded {partner, user, timestamp}
+        self.traps = set()  # known honeytoken values
+        self.recipients = set()  # values in a recipient trap format, not yet resolved
+        self.candidates = 0  # watermark-shaped strings seen
+
+
+class LeakReport:
+    """
+    Distinct hits per partner, fed one chunk at a time. Only values that
+    resolved to a partner or a known trap are remembered, and every list
+    returned is capped, so the report stays small however many candidates
+    the dump holds.
+    """
+
+    def __init__(self, examples=LEAK_SCAN_EXAMPLES):
+        self.examples = examples
+        self.candidates = 0
+        self.partners = {}
+        self.unattributed = 0
+        self.unattributed_traps = []
+        self.truncated = False
+        self._seen = set()
+
+    def _first_sighting(self, value):
+        if value in self._seen:
+            return False
+        self._seen.add(value)
+        return True
+
+    def attribute(self, partner_id, kind, value, user_id=None):
+        if not self._first_sighting(value):
+            return
+        entry = self.partners.setdefault(partner_id, {"watermarks": 0, "traps": 0, "users": set(), "examples": []})
+        entry[kind] += 1
+        if user_id is not None:
+            entry["users"].add(user_id)
+        if len(entry["examples"]) < self.examples:
+            entry["examples"].append(value)
+        else:
+            self.truncated = True
+
+    def unattributed_trap(self, value):
+        if not self._first_sighting(value):
+            return
+        self.unattributed += 1
+        if len(self.unattributed_traps) < self.examples:
+            self.unattributed_traps.append(value)
+        else:
+            self.truncated = True
+
+    def to_dict(self):
+        partners = {partner_id: {**entry, "users": sorted(entry["users"])} for partner_id, entry in self.partners.items()}
+        return {
+            "candidates": self.candidates,
+            "matched": sum(entry["watermarks"] + entry["traps"] for entry in partners.values()) + self.unattributed,
+            "partners": partners,
+            "unattributed": self.unattributed,
+            "unattributed_traps": self.unattributed_traps,
+            "truncated": self.truncated,
+        }
+
+
+def _scan(text, skip, scanner, bloom):
+    # Matches ending within the first skip characters were already seen at
+    # the end of the previous chunk
+    hits = ChunkHits()
+    for match in LEGACY_WATERMARK_PATTERN.finditer(text):
+        if match.end() <= skip:
+            continue
+        hits.candidates += 1
+        if match.group(0) in bloom:
+            hits.legacy.add(match.group(0))
+    for match in WATERMARK_PATTERN.finditer(text):
+        if match.end() <= skip:
+            continue
+        hits.candidates += 1
+        token = match.group(0)
+        if token not in hits.keyed:
+            record = decode_watermark(token)
+            if record is not None:
+                hits.keyed[token] = record
+    if len(scanner):
+        hits.traps = scanner.scan(text, skip)
+    hits.recipients = {match.group(0) for match in RECIPIENT_TRAP_PATTERN.finditer(text) if match.end() > skip}
+    return hits
+
+
+class _Snapshot:
+    """A matcher written to a file for the pool; removed once replaced and no scan still uses it."""
+
+    def __init__(self, kind, generation, path):
+        self.kind = kind
+        self.generation = generation
+        self.path = path
+        self.users = 0
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def _acquire_snapshot(kind, generation, dump):
+    with _snapshot_lock:
+        current = _snapshots.get(kind)
+        if current is None or current.generation != generation:
+            fd, path = tempfile.mkstemp(prefix=f"leak-scan-{kind}-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(dump())
+            if current is not None and not current.users:
+                _remove(current.path)
+            current = _snapshots[kind] = _Snapshot(kind, generation, path)
+        current.users += 1
+        return current
+
+
+def _release_snapshot(snapshot):
+    with _snapshot_lock:
+        snapshot.users -= 1
+        if not snapshot.users and _snapshots.get(snapshot.kind) is not snapshot:
+            _remove(snapshot.path)
+
+
+@atexit.register
+def _remove_snapshots():
+    with _snapshot_lock:
+        for snapshot in _snapshots.values():
+            _remove(snapshot.path)
+        _snapshots.clear()
+
+
+def _load_matcher(kind, path):
+    cached = _matchers.get(kind)
+    if cached is not None and cached[0] == path:
+        return cached[1]
+    with open(path, "rb") as f:
+        data = f.read()
+    if kind == "scanner":
+        matcher = HoneytokenScanner(json.loads(data))
+    else:
+        matcher = BloomFilter.from_bytes(data)
+    _matchers[kind] = (path, matcher)
+    return matcher
+
+
+def _scan_in_worker(scanner_path, bloom_path, text, skip):
+    return _scan(text, skip, _load_matcher("scanner", scanner_path), _load_matcher("bloom", bloom_path))
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=LEAK_SCAN_WORKERS, mp_context=pool_context())
+    return _pool
+
+
+def _discard_pool(pool):
+    # A worker died; the next scan starts a fresh pool
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def start_pool():
+    """Create the worker pool up front; workers start with the first multi-chunk scan."""
+    if LEAK_SCAN_WORKERS > 1:
+        _get_pool()
+
+
+def iter_chunks(stream, chunk_size=LEAK_SCAN_CHUNK):
+    """
+    Decode a byte stream into (text, skip) chunks cut at line breaks, where
+    the first skip characters of text repeat the end of the previous chunk.
+    """
+    # surrogateescape: stray non-UTF-8 bytes are carried through instead of failing the scan
+    decoder = codecs.getincrementaldecoder("utf-8")("surrogateescape")
+    carry = ""
+    seen = 0  # leading characters of carry already yielded
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        text = carry + decoder.decode(data)
+        cut = text.rfind("\n") + 1
+        if cut:
+            yield text[:cut], min(seen, cut)
+            carry, seen = text[cut:], max(0, seen - cut)
+        elif len(text) > LEAK_SCAN_MAX_CARRY:
+            yield text, seen
+            carry, seen = text[-LEAK_SCAN_OVERLAP:], LEAK_SCAN_OVERLAP
+        else:
+            carry = text
+    carry += decoder.decode(b"", final=True)
+    if len(carry) > seen:
+        yield carry, seen
+
+
+def scan_chunks(chunks, scanner, bloom, on_hits):
+    """
+    Find every watermark, known honeytoken and recipient trap candidate in
+    (text, skip) chunks, calling on_hits with each chunk's ChunkHits in this
+    thread. The first chunk is scanned here with scanner and bloom; later
+    ones go to the shared pool, whose workers load the same matchers from
+    snapshots refreshed whenever scanner or bloom has grown.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return
+    second = next(chunks, None)
+    if second is None or LEAK_SCAN_WORKERS <= 1:
+        on_hits(_scan(*first, scanner, bloom))
+        for chunk in ([] if second is None else [second, *chunks]):
+            on_hits(_scan(*chunk, scanner, bloom))
+        return
+    # Sizes are read before the snapshot is written, so a snapshot never holds less than its generation says
+    scanner_snapshot = _acquire_snapshot(
+        "scanner", (id(scanner), len(scanner)), lambda: json.dumps(scanner.patterns()).encode("utf-8"))
+    bloom_snapshot = _acquire_snapshot("bloom", (id(bloom), len(bloom)), bloom.to_bytes)
+    pool = _get_pool()
+    in_flight = deque()
+    try:
+        in_flight.append(pool.submit(_scan_in_worker, scanner_snapshot.path, bloom_snapshot.path, *second))
+        on_hits(_scan(*first, scanner, bloom))
+        for chunk in chunks:
+            if len(in_flight) >= LEAK_SCAN_IN_FLIGHT:
+                on_hits(in_flight.popleft().result())
+            in_flight.append(pool.submit(_scan_in_worker, scanner_snapshot.path, bloom_snapshot.path, *chunk))
+        while in_flight:
+            on_hits(in_flight.popleft().result())
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    finally:
+        # A failed scan leaves nothing running against snapshots about to be removed
+        for future in in_flight:
+            future.cancel()
+        for future in in_flight:
+            if not future.cancelled():
+                try:
+                    future.result()
+                except Exception:
+                    pass
+        _release_snapshot(scanner_snapshot)
+        _release_snapshot(bloom_snapshot)
@@ -0,0 +1,16 @@
+import multiprocessing
+
+# Process pools start their workers from a forkserver: a clean,
+# single-threaded process that has imported only these modules. A worker is
+# then never a fork of the threaded Flask server, with locks other threads
+# held at the time. Platforms without forkserver (Windows) spawn instead.
+POOL_PRELOAD = ["honeytokens.injector", "utils.leak_scan"]
+
+
+def pool_context():
+    """multiprocessing context for ProcessPoolExecutor(mp_context=...)."""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(POOL_PRELOAD)
+        return context
+    return multiprocessing.get_context("spawn")
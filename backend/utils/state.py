@@ -0,0 +1,28 @@
+import os
+import threading
+from zlib import crc32
+
+# Lock shards per keyspace. Two keys only contend when they hash to the same shard.
+STATE_SHARDS = int(os.environ.get("STATE_SHARDS", "64"))
+
+
+class ShardedLocks:
+    """
+    A fixed set of re-entrant locks, picked by hashing the key.
+    Use `with partner_locks(partner_id):` around every read-modify-write of
+    that partner's state. Work on different partners runs in parallel. Work
+    on the same partner is serialized, so updates are never lost.
+
+    Lock order: when both are needed, take the partner lock before the user lock.
+    """
+
+    def __init__(self, shards=STATE_SHARDS):
+        self._locks = [threading.RLock() for _ in range(shards)]
+
+    def __call__(self, key):
+        # crc32 rather than hash(): stable across processes and runs
+        return self._locks[crc32(str(key).encode()) % len(self._locks)]
+
+
+partner_locks = ShardedLocks()
+user_locks = ShardedLocks()
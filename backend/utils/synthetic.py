@@ -1,13 +1,144 @@
-from faker import Faker
-from uuid import uuid4
-
-fake = Faker()
-
-def generate_synthetic_data(partner_id=None):
-    return {
-        "name": fake.name(),
-        "email": fake.email(),  # Could be a honeytoken
-        "phone": fake.phone_number(),
-        "region": fake.country(),
-        "record_id": str(uuid4())
-    } 
\ No newline at end of file
+import hashlib
+import os
+import threading
+from collections import deque
+from uuid import UUID
+
+# Faker costs noticeable startup time; by default it is imported on first use.
+# Set SYNTHETIC_LAZY_FAKER=0 to import it (and warm the pool) at startup instead.
+LAZY_FAKER = os.environ.get("SYNTHETIC_LAZY_FAKER", "1") != "0"
+
+TABLE_SIZE = 4096  # rows per column in the deterministic table
+CHUNK_SIZE = 256  # rows generated per Faker batch
+TABLE_SEED = 20250629  # table contents are identical across restarts
+QUEUE_LOW_WATER = 256  # refill the unkeyed queue below this many records
+QUEUE_TARGET = 1024
+
+FIELDS = ("name", "email", "phone", "region")
+
+_faker = None
+_faker_lock = threading.Lock()
+
+
+def _get_faker():
+    global _faker
+    if _faker is None:
+        with _faker_lock:
+            if _faker is None:
+                from faker import Faker
+                _faker = Faker()
+    return _faker
+
+
+def _generate_columns(n, seed=None):
+    fake = _get_faker()
+    with _faker_lock:
+        # Always reseed so a seeded table chunk never leaks into random draws
+        fake.seed_instance(seed)
+        return (
+            [fake.name() for _ in range(n)],
+            [fake.email() for _ in range(n)],  # Could be a honeytoken
+            [fake.phone_number() for _ in range(n)],
+            [fake.country() for _ in range(n)],
+        )
+
+
+def generate_synthetic_batch(n, seed=None):
+    """Generate n synthetic records at once, one Faker pass per field."""
+    columns = _generate_columns(n, seed)
+    ids = os.urandom(16 * n)
+    return [
+        {
+            "name": name,
+            "email": email,
+            "phone": phone,
+            "region": region,
+            "record_id": str(UUID(bytes=ids[16 * i:16 * i + 16], version=4)),
+        }
+        for i, (name, email, phone, region) in enumerate(zip(*columns))
+    ]
+
+
+class SyntheticPool:
+    """
+    Pre-generated synthetic records for the deception path.
+    Keyed draws (partner_id, user_id) come from a fixed table built from a
+    constant seed, so the same pair always gets the same fake record.
+    Unkeyed draws pop from a queue that a background thread keeps topped up.
+    """
+
+    def __init__(self, table_size=TABLE_SIZE, chunk_size=CHUNK_SIZE, seed=TABLE_SEED):
+        self.table_size = table_size
+        self.chunk_size = chunk_size
+        self.seed = seed
+        self._chunks = [None] * -(-table_size // chunk_size)
+        self._chunk_lock = threading.Lock()
+        self._queue = deque()
+        self._refill = threading.Event()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def _chunk(self, index):
+        chunk = self._chunks[index]
+        if chunk is None:
+            with self._chunk_lock:
+                chunk = self._chunks[index]
+                if chunk is None:
+                    # Chunk contents depend only on the seed and index, so it
+                    # does not matter whether the worker or a request builds it
+                    chunk = _generate_columns(self.chunk_size, self.seed + index)
+                    self._chunks[index] = chunk
+        return chunk
+
+    def _cell(self, field, row):
+        return self._chunk(row // self.chunk_size)[field][row % self.chunk_size]
+
+    def record_for(self, partner_id, user_id):
+        self.start()
+        digest = hashlib.sha256(f"{partner_id}|{user_id}".encode()).digest()
+        record = {}
+        for field, name in enumerate(FIELDS):
+            row = int.from_bytes(digest[4 * field:4 * field + 4], "big") % self.table_size
+            record[name] = self._cell(field, row)
+        record["record_id"] = str(UUID(bytes=digest[16:32], version=4))
+        return record
+
+    def take(self):
+        self.start()
+        try:
+            record = self._queue.popleft()
+        except IndexError:
+            record = generate_synthetic_batch(1)[0]
+        if len(self._queue) < QUEUE_LOW_WATER:
+            self._refill.set()
+        return record
+
+    def start(self):
+        """Start the background refill thread (idempotent)."""
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="synthetic-pool", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        for index in range(len(self._chunks)):
+            self._chunk(index)
+        while True:
+            while len(self._queue) < QUEUE_TARGET:
+                self._queue.extend(generate_synthetic_batch(self.chunk_size))
+            self._refill.clear()
+            self._refill.wait()
+
+
+synthetic_pool = SyntheticPool()
+if not LAZY_FAKER:
+    _get_faker()
+    synthetic_pool.start()
+
+
+def generate_synthetic_data(partner_id=None, user_id=None):
+    if partner_id is not None and user_id is not None:
+        return synthetic_pool.record_for(partner_id, user_id)
+    return synthetic_pool.take()
@@ -0,0 +1,186 @@
+import atexit
+import hashlib
+import logging
+import math
+import os
+import struct
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: snapshots from concurrent workers are not merged
+    fcntl = None
+
+# Sized for this many watermarks at this false-positive rate; past capacity
+# the filter keeps working but false positives climb
+WATERMARK_BLOOM_CAPACITY = int(os.environ.get("WATERMARK_BLOOM_CAPACITY", "1000000"))
+WATERMARK_BLOOM_ERROR = float(os.environ.get("WATERMARK_BLOOM_ERROR", "0.001"))
+WATERMARK_BLOOM_PATH = os.environ.get(
+    "WATERMARK_BLOOM_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "watermarks.bloom"),
+)
+# Seconds between snapshots while watermarks are being added; 0 only saves at exit
+WATERMARK_BLOOM_SNAPSHOT_INTERVAL = float(os.environ.get("WATERMARK_BLOOM_SNAPSHOT_INTERVAL", "60"))
+
+_MAGIC = b"WMBF"
+_HEADER = struct.Struct(">4sBQBQ")  # magic, version, bits, hashes, added
+_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Set membership with no false negatives: `value in bloom` is False only
+    for values that were never added. Bit positions come from one BLAKE2b
+    digest split into two 64-bit halves (double hashing).
+    """
+
+    def __init__(self, capacity=WATERMARK_BLOOM_CAPACITY, error_rate=WATERMARK_BLOOM_ERROR, bits=None, hashes=None):
+        if bits is None:
+            bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        if hashes is None:
+            hashes = max(1, round(bits / max(capacity, 1) * math.log(2)))
+        self.bits = bits
+        self.hashes = hashes
+        self.added = 0
+        self._array = bytearray((bits + 7) // 8)
+        self._lock = threading.Lock()  # bit updates are read-modify-write
+
+    def _hashes(self, value):
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+    def add(self, value):
+        h1, h2 = self._hashes(value)
+        bits, array = self.bits, self._array
+        with self._lock:
+            for i in range(self.hashes):
+                position = (h1 + i * h2) % bits
+                array[position >> 3] |= 1 << (position & 7)
+            self.added += 1
+
+    def __contains__(self, value):
+        # Stops at the first clear bit, so most misses probe only one or two
+        h1, h2 = self._hashes(value)
+        bits, array = self.bits, self._array
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % bits
+            if not array[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def to_bytes(self):
+        with self._lock:
+            return _HEADER.pack(_MAGIC, _VERSION, self.bits, self.hashes, self.added) + bytes(self._array)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Rebuild a filter from to_bytes(); raises ValueError on a malformed snapshot."""
+        if len(data) < _HEADER.size:
+            raise ValueError("truncated bloom snapshot")
+        magic, version, bits, hashes, added = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION or len(data) - _HEADER.size != (bits + 7) // 8:
+            raise ValueError("not a bloom snapshot")
+        bloom = cls(bits=bits, hashes=hashes)
+        bloom._array[:] = data[_HEADER.size:]
+        bloom.added = added
+        return bloom
+
+    def __len__(self):
+        return self.added
+
+
+class WatermarkBloom(BloomFilter):
+    """
+    Bloom filter over every legacy watermark issued, snapshotted to path so
+    it survives restarts. A snapshot ORs in the bits already on disk, so
+    workers sharing the file never drop each other's watermarks, and is
+    written to a fresh temp file and renamed, so a crash never leaves a torn
+    file behind.
+    """
+
+    def __init__(self, path=WATERMARK_BLOOM_PATH, snapshot_interval=WATERMARK_BLOOM_SNAPSHOT_INTERVAL, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self._saved_added = 0
+        self._saved_at = time.monotonic()
+        self._save_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path=WATERMARK_BLOOM_PATH, **kwargs):
+        """Load the snapshot at path if it matches the configured size, else start empty."""
+        bloom = cls(path, **kwargs)
+        loaded = bloom._load()
+        if loaded is not None:
+            bloom._array[:] = loaded._array
+            bloom.added = bloom._saved_added = loaded.added
+        return bloom
+
+    def _load(self):
+        """The snapshot on disk if it has this filter's geometry, else None."""
+        try:
+            with open(self.path, "rb") as f:
+                loaded = BloomFilter.from_bytes(f.read())
+        except (OSError, ValueError):
+            return None
+        if (loaded.bits, loaded.hashes) != (self.bits, self.hashes):
+            return None
+        return loaded
+
+    def add(self, value):
+        super().add(value)
+        if self.snapshot_interval and time.monotonic() - self._saved_at >= self.snapshot_interval:
+            # A request thread never waits on, or fails because of, a snapshot
+            if self._save_lock.acquire(blocking=False):
+                try:
+                    self._save()
+                finally:
+                    self._save_lock.release()
+
+    def save(self):
+        """Write a snapshot if anything was added since the last one. Failures are logged, not raised."""
+        with self._save_lock:
+            self._save()
+
+    def _save(self):
+        self._saved_at = time.monotonic()
+        added = self.added
+        if added == self._saved_added:
+            return
+        try:
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            with open(self.path + ".lock", "a") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                on_disk = self._load()
+                if on_disk is not None:
+                    self._merge(on_disk)
+                added = self.added
+                fd, tmp = tempfile.mkstemp(dir=directory, prefix=".watermarks-", suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        f.write(self.to_bytes())
+                    os.replace(tmp, self.path)
+                except BaseException:
+                    os.unlink(tmp)
+                    raise
+        except Exception:
+            logger.exception("Watermark bloom snapshot to %s failed", self.path)
+            return
+        self._saved_added = added
+
+    def _merge(self, other):
+        with self._lock:
+            size = len(self._array)
+            merged = int.from_bytes(self._array, "little") | int.from_bytes(other._array, "little")
+            self._array[:] = merged.to_bytes(size, "little")
+            self.added = max(self.added, other.added)
+
+
+watermark_bloom = WatermarkBloom.open()
+atexit.register(watermark_bloom.save)
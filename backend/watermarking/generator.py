@@ -1,9 +1,225 @@
+import base64
 import hashlib
+import hmac
+import os
+import re
+import secrets
+import struct
+import tempfile
+from datetime import datetime, timedelta, UTC
+from functools import lru_cache
+
+# Watermarks are keyed tokens: "wm2." + base64url(epoch | nonce | ciphertext | tag).
+# The ciphertext is the attribution payload (partner id, user id, issue time)
+# XORed with an HMAC-SHA256 keystream, and the tag is a truncated HMAC over
+# everything before it. Whoever holds the key reads attribution straight out
+# of a leaked token; nobody else can forge one or see who it belongs to.
+WATERMARK_KEY = os.environ.get("WATERMARK_KEY")
+# The epoch byte names the key a token was sealed with. To rotate, move the
+# old key into WATERMARK_RETIRED_KEYS ("epoch:key,epoch:key") and set a new
+# WATERMARK_KEY with the next epoch; tokens already issued keep decoding.
+WATERMARK_KEY_EPOCH = int(os.environ.get("WATERMARK_KEY_EPOCH", "0"))
+WATERMARK_RETIRED_KEYS = os.environ.get("WATERMARK_RETIRED_KEYS", "")
+# Used when WATERMARK_KEY is unset: created on first use and shared by every
+# process on the host, so tokens stay verifiable across restarts
+WATERMARK_KEY_FILE = os.environ.get(
+    "WATERMARK_KEY_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "watermark.key"),
+)
+WATERMARK_PREFIX = "wm2."
+# "wm1." tokens predate key epochs; they were sealed with the epoch 0 key
+V1_PREFIX = "wm1."
+WATERMARK_PATTERN = re.compile(r'\bwm[12]\.[A-Za-z0-9_-]{43,}')
+# Legacy format: SHA-256 hex of 'partner|timestamp|user', traced via the index
+LEGACY_WATERMARK_PATTERN = re.compile(r'\b[0-9a-f]{64}\b')
+
+if not 0 <= WATERMARK_KEY_EPOCH <= 255:
+    raise ValueError("WATERMARK_KEY_EPOCH must be between 0 and 255")
+
+VERSION = 1
+NONCE_BYTES = 8
+TAG_BYTES = 16
+FLAG_AWARE = 1  # timestamp carried a UTC offset
+_EPOCH = datetime(1970, 1, 1)
+_HEADER = struct.Struct(">BBq")  # version, flags, microseconds since the Unix epoch
+_MIN_TOKEN_BYTES = NONCE_BYTES + _HEADER.size + 2 + TAG_BYTES
+MAX_ID_BYTES = 255  # per partner or user id, so its length fits one byte
+# Longest token generate_watermark can emit: both ids at MAX_ID_BYTES.
+# Scanners that cut text into chunks overlap them by at least this much.
+WATERMARK_MAX_LENGTH = len(WATERMARK_PREFIX) + -(-(1 + _MIN_TOKEN_BYTES + 2 * MAX_ID_BYTES) * 4 // 3)
+
+
+def _read_key_file():
+    with open(WATERMARK_KEY_FILE, "r", encoding="utf-8") as f:
+        key = f.read().strip()
+    if not key:
+        raise RuntimeError(f"{WATERMARK_KEY_FILE} is empty; delete it or set WATERMARK_KEY")
+    return key.encode("utf-8")
+
+
+def _load_key():
+    if WATERMARK_KEY:
+        return WATERMARK_KEY.encode("utf-8")
+    try:
+        return _read_key_file()
+    except FileNotFoundError:
+        pass
+    # Write the key in full to a private temp file, then link it into place:
+    # the key file appears complete or not at all, and if several processes
+    # race, the first link wins and everyone reads that key
+    directory = os.path.dirname(WATERMARK_KEY_FILE) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".watermark-key-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(secrets.token_hex(32))
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.link(tmp, WATERMARK_KEY_FILE)
+        except FileExistsError:
+            pass
+    finally:
+        os.unlink(tmp)
+    return _read_key_file()
+
+
+def _retired_keys():
+    keys = {}
+    for entry in WATERMARK_RETIRED_KEYS.split(","):
+        epoch, sep, key = entry.strip().partition(":")
+        if not entry.strip():
+            continue
+        if not sep or not epoch.isdigit() or not key or int(epoch) > 255:
+            raise ValueError("WATERMARK_RETIRED_KEYS entries must be epoch:key")
+        keys[int(epoch)] = key.encode("utf-8")
+    return keys
+
+
+@lru_cache(maxsize=None)
+def _keys(epoch=WATERMARK_KEY_EPOCH):
+    """
+    (encryption HMAC, MAC HMAC) keyed with subkeys of the epoch's master key,
+    or None for an epoch with no key configured; callers copy().
+    """
+    if epoch == WATERMARK_KEY_EPOCH:
+        master = _load_key()
+    else:
+        master = _retired_keys().get(epoch)
+        if master is None:
+            return None
+    enc_key = hmac.new(master, b"watermark-enc", hashlib.sha256).digest()
+    mac_key = hmac.new(master, b"watermark-mac", hashlib.sha256).digest()
+    return hmac.new(enc_key, digestmod=hashlib.sha256), hmac.new(mac_key, digestmod=hashlib.sha256)
+
+
+def is_keyed_watermark(value):
+    """True for strings in a keyed token format (current or pre-epoch), valid or not."""
+    return isinstance(value, str) and value.startswith((WATERMARK_PREFIX, V1_PREFIX))
+
+
+def _keystream(enc, nonce, length):
+    blocks = []
+    for counter in range((length + 31) // 32):
+        block = enc.copy()
+        block.update(nonce + counter.to_bytes(4, "big"))
+        blocks.append(block.digest())
+    return b"".join(blocks)[:length]
+
+
+def _xor(data, stream):
+    return (int.from_bytes(data, "big") ^ int.from_bytes(stream, "big")).to_bytes(len(data), "big")
+
+
+def _pack_id(value):
+    raw = str(value).encode("utf-8")
+    if len(raw) > MAX_ID_BYTES:
+        raise ValueError(f"partner and user ids must be at most {MAX_ID_BYTES} bytes")
+    return bytes([len(raw)]) + raw
+
+
+def _epoch_micros(timestamp):
+    """ISO timestamp -> (microseconds since the Unix epoch, flags); naive values are UTC."""
+    moment = datetime.fromisoformat(timestamp)
+    if moment.tzinfo is None:
+        return (moment - _EPOCH) // timedelta(microseconds=1), 0
+    return (moment.astimezone(UTC).replace(tzinfo=None) - _EPOCH) // timedelta(microseconds=1), FLAG_AWARE
+
+
+def _seal(partner_id, timestamp, user_id, enc, mac):
+    micros, flags = _epoch_micros(timestamp)
+    payload = _HEADER.pack(VERSION, flags, micros) + _pack_id(partner_id) + _pack_id(user_id)
+    nonce = secrets.token_bytes(NONCE_BYTES)
+    body = bytes([WATERMARK_KEY_EPOCH]) + nonce + _xor(payload, _keystream(enc, nonce, len(payload)))
+    tag = mac.copy()
+    tag.update(body)
+    return WATERMARK_PREFIX + base64.urlsafe_b64encode(body + tag.digest()[:TAG_BYTES]).rstrip(b"=").decode("ascii")
+
 
 def generate_watermark(partner_id, timestamp, user_id):
     """
-    Generate a SHA-256 watermark for partner-specific data tracking.
-    Combines partner_id, timestamp, and user_id to create a unique hash.
+    Generate a keyed watermark for partner-specific data tracking.
+    partner_id, user_id and the ISO timestamp are sealed into the token, so
+    decode_watermark recovers them without any stored history.
+    Raises ValueError for a timestamp that is not ISO 8601.
+    """
+    enc, mac = _keys()
+    return _seal(partner_id, timestamp, user_id, enc, mac)
+
+
+def generate_watermarks(grants):
+    """
+    Batch form of generate_watermark.
+    Takes (partner_id, timestamp, user_id) tuples and returns their watermarks in order.
+    """
+    enc, mac = _keys()
+    return [_seal(partner_id, timestamp, user_id, enc, mac) for partner_id, timestamp, user_id in grants]
+
+
+def decode_watermark(watermark):
+    """
+    Return {partner, user, timestamp} sealed in a keyed watermark, else None.
+    Cost depends only on the token's length; the tag is checked in constant
+    time before anything in the payload is read.
     """
-    combined = f"{partner_id}|{timestamp}|{user_id}".encode('utf-8')
-    return hashlib.sha256(combined).hexdigest() 
\ No newline at end of file
+    if not is_keyed_watermark(watermark):
+        return None
+    encoded = watermark[len(WATERMARK_PREFIX):]
+    try:
+        raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+    except ValueError:
+        return None
+    if watermark.startswith(V1_PREFIX):
+        epoch, sealed = 0, raw
+    elif raw:
+        epoch, sealed = raw[0], raw[1:]
+    else:
+        return None
+    if len(sealed) < _MIN_TOKEN_BYTES:
+        return None
+    keys = _keys(epoch)
+    if keys is None:
+        return None
+    enc, mac = keys
+    body, tag = raw[:-TAG_BYTES], raw[-TAG_BYTES:]
+    expected = mac.copy()
+    expected.update(body)
+    if not hmac.compare_digest(expected.digest()[:TAG_BYTES], tag):
+        return None
+    nonce, ciphertext = sealed[:NONCE_BYTES], sealed[NONCE_BYTES:-TAG_BYTES]
+    payload = _xor(ciphertext, _keystream(enc, nonce, len(ciphertext)))
+    version, flags, micros = _HEADER.unpack_from(payload)
+    if version != VERSION:
+        return None
+    fields = []
+    offset = _HEADER.size
+    for _ in range(2):
+        if offset >= len(payload):
+            return None
+        length = payload[offset]
+        fields.append(payload[offset + 1:offset + 1 + length].decode("utf-8"))
+        offset += 1 + length
+    moment = _EPOCH + timedelta(microseconds=micros)
+    if flags & FLAG_AWARE:
+        moment = moment.replace(tzinfo=UTC)
+    return {"partner": fields[0], "user": fields[1], "timestamp": moment.isoformat()}
@@ -0,0 +1,39 @@
+from watermarking.generator import is_keyed_watermark
+
+
+def _legacy_watermark(record):
+    # Keyed watermarks decode on their own; only legacy hashes are indexed
+    watermark = record.get("watermark")
+    return watermark if watermark and not is_keyed_watermark(watermark) else None
+
+
+class WatermarkIndex:
+    """
+    Hash-keyed index of every legacy watermark minted for a partner data
+    grant. Lets /verify_watermark resolve a leaked hash with a single index
+    lookup instead of re-hashing the whole access log. The index lives in
+    the event store next to the grants in `log`, so nothing is rebuilt on
+    startup and every worker sees every other worker's grants.
+    """
+
+    def __init__(self, log):
+        self._log = log
+        log.add_index("watermark", key=_legacy_watermark)
+
+    def lookup(self, watermark):
+        """Return {partner, user, timestamp} for a known watermark, else None."""
+        found = self._log.find("watermark", watermark)
+        if not found:
+            return None
+        record = found[0]
+        return {"partner": record["partner"], "user": record["user"], "timestamp": record["timestamp"]}
+
+    def values(self):
+        """Every indexed watermark, read a page at a time."""
+        return self._log.indexed_values("watermark")
+
+    def __contains__(self, watermark):
+        return self._log.count_where("watermark", watermark) > 0
+
+    def __len__(self):
+        return self._log.count_indexed("watermark")
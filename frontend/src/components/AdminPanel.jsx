@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import { getWithAuth, postWithAuth, getTrapLogs, getRestrictedPartners, getRiskScoreTraits, getPartnerTraits } from './api.js';
+import { getWithAuth, postWithAuth, getTrapLogs, getRestrictedPartners, getRiskScoreTraits, getPartnerTraits, subscribeEvents, appendUnique } from './api.js';
 import UserAccessLogViewer from './UserAccessLogViewer.jsx';
 import WatermarkTracePanel from './WatermarkTracePanel';
 import WatermarkDecodeLogTable from './WatermarkDecodeLogTable';
@@ -43,22 +43,40 @@ function AdminPanel({ addLog }) {
   const [userTrapLogs, setUserTrapLogs] = useState([]);
   const [userRestrictedPartners, setUserRestrictedPartners] = useState([]);
 
-  // Move fetchAlerts out of useEffect
+  // Move fetchAlerts out of useEffect. Returns the stream cursor of the fetched
+  // list; alerts already shown (e.g. pushed during a refresh) are kept
   const fetchAlerts = async () => {
     setLoading(true);
     setError('');
+    let streamCursor = null;
     try {
       const { ok, data } = await getWithAuth('/alerts/admin');
-      if (ok) setAlerts(data);
-      else setError('Failed to fetch admin alerts');
+      if (ok) {
+        setAlerts((prev) => appendUnique(data.items, Array.isArray(prev) ? prev : []));
+        streamCursor = data.stream_cursor;
+      } else setError('Failed to fetch admin alerts');
     } catch (err) {
       setError('Network error');
     }
     setLoading(false);
+    return streamCursor;
   };
 
+  // Alerts raised after the initial fetch arrive over the event stream, which
+  // starts where the fetched list ends
   useEffect(() => {
-    fetchAlerts();
+    let cancelled = false;
+    let unsubscribe = () => {};
+    fetchAlerts().then((streamCursor) => {
+      if (cancelled) return;
+      unsubscribe = subscribeEvents('admin', {
+        alert: (a) => setAlerts((prev) => appendUnique(Array.isArray(prev) ? prev : [], [a])),
+      }, streamCursor);
+    });
+    return () => {
+      cancelled = true;
+      unsubscribe();
+    };
   }, []);
 
   // Fetch trap logs and restricted partners for selected user
@@ -96,7 +114,7 @@ function AdminPanel({ addLog }) {
     if (!trapLogsOpen) {
       setTrapLogsLoading(true);
       const { ok, data } = await getTrapLogs();
-      if (ok) setTrapLogs(data);
+      if (ok) setTrapLogs(data.items);
       setTrapLogsLoading(false);
     }
   };
@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import { getWithAuth, postWithAuth, getConsent, updateConsent, requestAdminAction } from './api.js';
+import { getWithAuth, postWithAuth, getConsent, updateConsent, requestAdminAction, subscribeEvents, earliestCursor, appendUnique } from './api.js';
 
 function ConsentDashboard() {
   const [selectedUser, setSelectedUser] = useState('user1');
@@ -14,10 +14,16 @@ function ConsentDashboard() {
   const [trapLogs, setTrapLogs] = useState([]);
   const [restrictedPartners, setRestrictedPartners] = useState([]);
 
+  // Lists are fetched once; later notifications and alerts are pushed by the
+  // server, starting from where the fetched lists end
   useEffect(() => {
+    let cancelled = false;
+    let unsubscribe = () => {};
     async function fetchData() {
       setLoading(true);
       setError('');
+      setNotifications([]);
+      setAlerts([]);
       try {
         const [notRes, alertRes, trapRes, restrictRes] = await Promise.all([
           getWithAuth(`/user_notifications?user_id=${selectedUser}`),
@@ -25,16 +31,25 @@ function ConsentDashboard() {
           getWithAuth(`/user_trap_logs/${selectedUser}`),
           getWithAuth(`/user_restricted_partners/${selectedUser}`)
         ]);
-        setNotifications(notRes.ok ? notRes.data : []);
-        setAlerts(alertRes.ok ? alertRes.data : []);
+        if (cancelled) return;
+        setNotifications(notRes.ok ? notRes.data.items : []);
+        setAlerts(alertRes.ok ? alertRes.data.items : []);
         setTrapLogs(trapRes.ok ? trapRes.data : []);
         setRestrictedPartners(restrictRes.ok ? restrictRes.data : []);
+        unsubscribe = subscribeEvents(selectedUser, {
+          notification: (n) => setNotifications((prev) => appendUnique(prev, [n])),
+          alert: (a) => setAlerts((prev) => appendUnique(prev, [a])),
+        }, earliestCursor(notRes.data?.stream_cursor, alertRes.data?.stream_cursor));
       } catch (err) {
         setError('Network error');
       }
       setLoading(false);
     }
     fetchData();
+    return () => {
+      cancelled = true;
+      unsubscribe();
+    };
   }, [selectedUser]);
 
   useEffect(() => {
@@ -109,8 +124,8 @@ function ConsentDashboard() {
       {alerts.length > 0 && (
         <div style={{ marginBottom: 24 }}>
           <h4 style={{ color: '#be185d' }}>Alerts</h4>
-          {alerts.map((a, i) => (
-            <div key={i} style={{ background: '#fef2f2', borderLeft: '5px solid #be185d', borderRadius: 8, padding: '1em', margin: '1em 0', boxShadow: '0 1px 4px #e0e7ef' }}>
+          {alerts.map((a) => (
+            <div key={a.event_id} style={{ background: '#fef2f2', borderLeft: '5px solid #be185d', borderRadius: 8, padding: '1em', margin: '1em 0', boxShadow: '0 1px 4px #e0e7ef' }}>
               <div style={{ fontWeight: 600 }}>{a.message}</div>
               <div style={{ color: '#888', fontSize: '0.95em' }}>Partner: {a.partner} | Risk: {a.risk_score || a.risk}</div>
               <button
@@ -125,8 +140,8 @@ function ConsentDashboard() {
         </div>
       )}
       {notifications.length === 0 && !loading && <div style={{ color: '#888' }}>No notifications yet.</div>}
-      {notifications.map((n, i) => (
-        <div key={i} style={{ background: (n.type === 'high_risk' || n.type === 'trap_hit') ? '#fef2f2' : '#f0fdf4', borderLeft: (n.type === 'high_risk' || n.type === 'trap_hit') ? '5px solid #be185d' : '5px solid #22c55e', borderRadius: 8, padding: '1em', margin: '1em 0', boxShadow: '0 1px 4px #e0e7ef' }}>
+      {notifications.map((n) => (
+        <div key={n.event_id} style={{ background: (n.type === 'high_risk' || n.type === 'trap_hit') ? '#fef2f2' : '#f0fdf4', borderLeft: (n.type === 'high_risk' || n.type === 'trap_hit') ? '5px solid #be185d' : '5px solid #22c55e', borderRadius: 8, padding: '1em', margin: '1em 0', boxShadow: '0 1px 4px #e0e7ef' }}>
           <div style={{ fontWeight: 600 }}>{n.message}</div>
           <div style={{ color: '#888', fontSize: '0.95em' }}>{n.timestamp}</div>
           {(n.type === 'high_risk' || n.type === 'trap_hit') && (
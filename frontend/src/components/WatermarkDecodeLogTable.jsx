@@ -5,7 +5,7 @@ export default function WatermarkDecodeLogTable() {
   const [logs, setLogs] = useState([]);
 
   useEffect(() => {
-    axios.get('http://localhost:5000/decode_log').then(res => setLogs(res.data));
+    axios.get('http://localhost:5000/decode_log').then(res => setLogs(res.data.items));
   }, []);
 
   const minHash = (hash) => {
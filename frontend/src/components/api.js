@@ -43,6 +43,49 @@ export async function postWithAuth(endpoint, body) {
   }
 }
 
+// Server-sent events: new notifications/alerts for a user (or 'admin') as they happen.
+// handlers maps event type ('notification', 'alert', 'risk_alert') to a callback.
+// after is the stream_cursor of a list fetched first: everything committed since
+// that fetch is sent, so nothing falls between the list and the stream.
+// Returns a function that closes the stream.
+export function subscribeEvents(userId, handlers, after) {
+  const query = after ? `?last_event_id=${encodeURIComponent(after)}` : '';
+  const source = new EventSource(`${BASE_URL}/events/${encodeURIComponent(userId)}${query}`);
+  Object.entries(handlers).forEach(([type, handler]) => {
+    source.addEventListener(type, (e) => handler(JSON.parse(e.data)));
+  });
+  return () => source.close();
+}
+
+// Earliest of several stream cursors ("log:position,..."), log by log, so a
+// stream opened from it covers the gaps after every one of the fetches
+export function earliestCursor(...cursors) {
+  const positions = {};
+  cursors.filter(Boolean).forEach((cursor) => {
+    cursor.split(',').forEach((part) => {
+      const [name, position] = part.split(':');
+      if (name && position !== undefined) {
+        positions[name] = Math.min(positions[name] ?? Infinity, Number(position));
+      }
+    });
+  });
+  return Object.entries(positions).map(([name, position]) => `${name}:${position}`).join(',');
+}
+
+// items appended to list, skipping any whose event_id is already there: a
+// record committed while a list was fetched arrives over the stream as well
+export function appendUnique(list, items) {
+  const seen = new Set(list.map((item) => item.event_id));
+  return [...list, ...items.filter((item) => !seen.has(item.event_id) && seen.add(item.event_id))];
+}
+
+// Whole log as an NDJSON blob, streamed by the export endpoint
+export async function exportLog(logName) {
+  const res = await fetch(`${BASE_URL}/export/${logName}`, { headers: { 'X-API-Key': API_KEY } });
+  if (!res.ok) throw new Error(`HTTP ${res.status}`);
+  return res.blob();
+}
+
 export async function getConsent(userId) {
   return getWithAuth(`/get_consent/${userId}`);
 }
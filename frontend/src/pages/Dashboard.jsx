@@ -10,6 +10,7 @@ import AdminPanel from '../components/AdminPanel.jsx';
 import PartnerTestPanel from '../components/PartnerTestPanel.jsx';
 import TrapInjector from '../components/TrapInjector.jsx';
 import PartnerDashboard from '../components/PartnerDashboard.jsx';
+import { exportLog } from '../components/api.js';
 import { AdminErrorBoundary } from '../components/AdminPanel.jsx';
 
 function Dashboard() {
@@ -47,13 +48,12 @@ function Dashboard() {
 
   const downloadLogs = async () => {
     try {
-      const res = await fetch('http://localhost:5000/access_log');
-      const data = await res.json();
-      const blob = new Blob([JSON.stringify(data, null, 2)], { type: 'application/json' });
+      // The full log is streamed by the export endpoint; /access_log only returns a page
+      const blob = await exportLog('access_log');
       const url = URL.createObjectURL(blob);
       const a = document.createElement('a');
       a.href = url;
-      a.download = 'access_log.json';
+      a.download = 'access_log.ndjson';
       document.body.appendChild(a);
       a.click();
       document.body.removeChild(a);